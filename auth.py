@@ -3,21 +3,46 @@ Authentication ve Authorization modülü
 Flask-Login entegrasyonu
 """
 
+import logging
+import os
+import threading
+import time
+from datetime import datetime
 from flask_login import UserMixin, LoginManager
+from sqlalchemy import update
 from database import SessionLocal, User, UserTenant
 from hashlib import sha256
+from cache_utils import TTLCache
+
+logger = logging.getLogger(__name__)
 
 login_manager = LoginManager()
 login_manager.login_view = 'login'
 login_manager.login_message = 'Lütfen giriş yapın.'
 login_manager.login_message_category = 'info'
 
+# load_user her request'te çalışır: kullanıcı kısa süre bellekte tutulur
+# Cache'teki kayıtlar her request'te users.auth_version ile doğrulanır (rol/üyelik değişikliği tüm worker'larda hemen geçerli)
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+# last_login kullanıcı başına en fazla bu aralıkla yazılır (her request'te commit yok)
+LAST_LOGIN_WRITE_INTERVAL = float(os.environ.get('LAST_LOGIN_WRITE_INTERVAL', 300))
+
+_user_cache = TTLCache(USER_CACHE_TTL, maxsize=10000)
+_last_login_written = {}  # user_id -> son yazma zamanı (time.monotonic())
+_last_login_lock = threading.Lock()
+
+# Kullanıcının erişebildiği tenant id'leri: user_id -> (auth_version, frozenset)
+# Üyelik değişince users.auth_version artar, eski sürümle yüklenmiş kayıt hiçbir worker'da kullanılmaz
+TENANT_ACCESS_CACHE_TTL = float(os.environ.get('TENANT_ACCESS_CACHE_TTL', 300))
+_tenant_access_cache = TTLCache(TENANT_ACCESS_CACHE_TTL, maxsize=10000)
+
 class UserAuth(UserMixin):
     """Flask-Login için User sınıfı"""
-    def __init__(self, user_id, username, role):
+    def __init__(self, user_id, username, role, auth_version=None):
         self.id = user_id
         self.username = username
         self.role = role
+        self.auth_version = auth_version
         self.is_super_admin = (role == 'super_admin')
     
     def can_access_tenant(self, tenant_id):
@@ -25,33 +50,107 @@ class UserAuth(UserMixin):
         if self.is_super_admin:
             return True
         
-        db = SessionLocal()
-        try:
-            user_tenant = db.query(UserTenant).filter_by(
-                user_id=self.id,
-                tenant_id=tenant_id
-            ).first()
-            return user_tenant is not None
-        finally:
-            db.close()
+        return tenant_id in get_user_tenant_ids(self.id, self.auth_version)
+
+def get_auth_version(user_id):
+    """Kullanıcının güncel auth_version'ı (kullanıcı silindiyse None)"""
+    db = SessionLocal()
+    try:
+        return db.query(User.auth_version).filter_by(id=user_id).scalar()
+    finally:
+        db.close()
+
+def get_user_tenant_ids(user_id, auth_version=None):
+    """Kullanıcının üye olduğu tenant id'leri (frozenset, auth_version'ı tutan cache kaydından)
+    
+    auth_version verilmezse database'den okunur (request içinde load_user'ın okuduğu sürüm verilir).
+    """
+    if auth_version is None:
+        auth_version = get_auth_version(user_id)
+    entry = _tenant_access_cache.get(user_id)
+    if entry is not None and entry[0] == auth_version:
+        return entry[1]
+    
+    db = SessionLocal()
+    try:
+        tenant_ids = frozenset(row.tenant_id for row in db.query(UserTenant.tenant_id).filter_by(user_id=user_id))
+    finally:
+        db.close()
+    # Sürüm sorgudan önce okundu: sorgu sırasında üyelik değişirse sürüm artmıştır, kayıt bir sonraki okumada yenilenir
+    _tenant_access_cache.set(user_id, (auth_version, tenant_ids))
+    return tenant_ids
+
+def invalidate_tenant_access(user_id=None):
+    """Tenant üyelikleri değişti: kullanıcının (None ise herkesin) auth_version'ını artır, tüm worker'larda geçersiz olur"""
+    db = SessionLocal()
+    try:
+        query = update(User).values(auth_version=User.auth_version + 1)
+        if user_id is not None:
+            query = query.where(User.id == user_id)
+        db.execute(query.execution_options(synchronize_session=False))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if user_id is None:
+        _tenant_access_cache.clear()
+        _user_cache.clear()
+    else:
+        _tenant_access_cache.pop(user_id)
+        _user_cache.pop(user_id)
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Kullanıcıyı session'dan yükle"""
+    """Kullanıcıyı session'dan yükle (cache'teki kayıt sadece auth_version değişmediyse kullanılır)"""
+    user_id = int(user_id)
+    user = _user_cache.get(user_id)
     db = SessionLocal()
     try:
-        user = db.query(User).filter_by(id=int(user_id)).first()
-        if user:
-            # Son giriş zamanını güncelle
-            from datetime import datetime
-            user.last_login = datetime.utcnow()
-            db.commit()
-            
-            return UserAuth(user.id, user.username, user.role)
-        return None
+        if user is not None:
+            # Cache'te: sadece sürüm okunur (başka bir worker'da rol/üyelik değiştiyse veya kullanıcı silindiyse yeniden yüklenir)
+            auth_version = db.query(User.auth_version).filter_by(id=user_id).scalar()
+            if auth_version != user.auth_version:
+                _user_cache.pop(user_id)
+                user = None
+        if user is None:
+            record = db.query(User.id, User.username, User.role, User.auth_version).filter_by(id=user_id).first()
+            if not record:
+                return None
+            user = UserAuth(record.id, record.username, record.role, record.auth_version)
+            _user_cache.set(user_id, user)
+    finally:
+        db.close()
+    
+    touch_last_login(user_id)
+    return user
+
+def touch_last_login(user_id, force=False):
+    """Son giriş zamanını güncelle (kullanıcı başına en fazla LAST_LOGIN_WRITE_INTERVAL'da bir yazılır)"""
+    now = time.monotonic()
+    with _last_login_lock:
+        last_written = _last_login_written.get(user_id)
+        if not force and last_written is not None and now - last_written < LAST_LOGIN_WRITE_INTERVAL:
+            return
+        _last_login_written[user_id] = now
+    
+    db = SessionLocal()
+    try:
+        db.query(User).filter_by(id=user_id).update({'last_login': datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"last_login güncellenemedi (kullanıcı {user_id}): {e}")
     finally:
         db.close()
 
+def invalidate_user(user_id):
+    """Kullanıcı güncellendi/silindi: auth_version'ı artır (diğer worker'lar da sonraki request'te database'den yükler)"""
+    with _last_login_lock:
+        _last_login_written.pop(user_id, None)
+    invalidate_tenant_access(user_id)
+
 def verify_password(username, password):
     """Kullanıcı adı ve şifre doğrula"""
     db = SessionLocal()
@@ -63,7 +162,8 @@ def verify_password(username, password):
         ).first()
         
         if user:
-            return UserAuth(user.id, user.username, user.role)
+            touch_last_login(user.id, force=True)
+            return UserAuth(user.id, user.username, user.role, user.auth_version)
         return None
     finally:
         db.close()
@@ -86,9 +186,6 @@ def require_tenant_access(tenant_id_param='tenant_id'):
     from functools import wraps
     from flask import abort, request
     from flask_login import current_user
-    import logging
-    
-    logger = logging.getLogger(__name__)
     
     def decorator(f):
         @wraps(f)
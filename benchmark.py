@@ -0,0 +1,159 @@
+"""
+Performans Ölçüm Scripti
+Kullanım: python benchmark.py [matcher|results-index]
+"""
+
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def _random_word(rng, min_len=4, max_len=12):
+    """Rastgele küçük harfli kelime üret"""
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_len, max_len)))
+
+def _legacy_find(patterns, text):
+    """analyze_message'daki eski döngü"""
+    found = []
+    for pattern in patterns:
+        if pattern and pattern in text:
+            found.append(pattern)
+    return found
+
+def _time_per_message(func, messages, repeat):
+    """Mesaj başına ortalama süreyi (mikrosaniye) ölç"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(messages) * 1e6
+
+def bench_matcher(pattern_counts=(10, 100, 1000), message_count=2000, repeat=3):
+    """KeywordMatcher ile eski `in` döngüsünü karşılaştır"""
+    from keyword_matcher import KeywordMatcher
+
+    rng = random.Random(42)
+    vocabulary = [_random_word(rng) for _ in range(5000)]
+
+    print(f"{'desen':>6} | {'eski döngü':>12} | {'otomat':>12} | {'otomatik':>12} | {'hız (otomat)':>12}")
+    print("-" * 68)
+    for count in pattern_counts:
+        patterns = rng.sample(vocabulary, count)
+        messages = []
+        for _ in range(message_count):
+            words = [rng.choice(vocabulary) for _ in range(rng.randint(20, 80))]
+            # Mesajların bir kısmına gerçek eşleşme ekle
+            if rng.random() < 0.2:
+                words.insert(rng.randrange(len(words)), rng.choice(patterns))
+            messages.append(' '.join(words))
+
+        automaton = KeywordMatcher(patterns, min_patterns=0)
+        auto = KeywordMatcher(patterns)
+
+        # Sonuçlar birebir aynı olmalı
+        for message in messages:
+            expected = _legacy_find(patterns, message)
+            assert automaton.find_all(message) == expected
+            assert auto.find_all(message) == expected
+
+        legacy_us = _time_per_message(lambda m: _legacy_find(patterns, m), messages, repeat)
+        automaton_us = _time_per_message(automaton.find_all, messages, repeat)
+        auto_us = _time_per_message(auto.find_all, messages, repeat)
+        print(f"{count:>6} | {legacy_us:>9.1f} µs | {automaton_us:>9.1f} µs | {auto_us:>9.1f} µs | {legacy_us / automaton_us:>11.1f}x")
+
+def _time_query(conn, stmt, repeat):
+    """Sorgunun en iyi süresini (milisaniye) ölç"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(stmt).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def bench_results_index(row_count=1_000_000, tenant_count=10, repeat=5):
+    """results sorgularını ix_results_tenant_timestamp index'i olmadan ve varken ölç (SQLite)"""
+    from sqlalchemy import create_engine, select, func, text
+    from database import Base, Result
+
+    rng = random.Random(42)
+    now = datetime(2025, 1, 1)
+    tenant_id = 3
+    thirty_days_ago = now - timedelta(days=30)
+
+    queries = {
+        # get_tenant_results / export_results: tarih aralığı + timestamp desc
+        'son 30 gün, 1000 satır': select(Result).where(
+            Result.tenant_id == tenant_id, Result.timestamp >= thirty_days_ago
+        ).order_by(Result.timestamp.desc()).limit(1000),
+        # get_results_api: filtresiz son 100 sonuç
+        'son 100 sonuç': select(Result).where(
+            Result.tenant_id == tenant_id
+        ).order_by(Result.timestamp.desc()).limit(100),
+        # Dashboard: son 7 günün sayısı
+        'son 7 gün sayısı': select(func.count()).select_from(Result).where(
+            Result.tenant_id == tenant_id, Result.timestamp >= now - timedelta(days=7)
+        ),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Result.__table__.create(engine)
+
+        print(f"{row_count} satır oluşturuluyor ({tenant_count} tenant, 365 gün)...")
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_results_tenant_timestamp"))
+            chunk = []
+            for i in range(row_count):
+                chunk.append({
+                    'tenant_id': rng.randint(1, tenant_count),
+                    'timestamp': now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                    'group_id': -1000 - rng.randint(1, 50),
+                    'message_id': i,
+                    'message_text': 'bonus mesaj',
+                    'found_keywords': ['bonus'],
+                    'found_links': [],
+                    'views_count': rng.randint(0, 1000),
+                })
+                if len(chunk) == 50_000:
+                    conn.execute(Result.__table__.insert(), chunk)
+                    chunk = []
+            if chunk:
+                conn.execute(Result.__table__.insert(), chunk)
+            conn.execute(text("ANALYZE"))
+
+        with engine.connect() as conn:
+            before = {name: _time_query(conn, stmt, repeat) for name, stmt in queries.items()}
+
+        with engine.begin() as conn:
+            conn.execute(text("CREATE INDEX ix_results_tenant_timestamp ON results (tenant_id, timestamp DESC, id DESC)"))
+            conn.execute(text("ANALYZE"))
+
+        with engine.connect() as conn:
+            after = {name: _time_query(conn, stmt, repeat) for name, stmt in queries.items()}
+        engine.dispose()
+
+    print(f"{'sorgu':>24} | {'index yok':>11} | {'index var':>11} | {'hız':>8}")
+    print("-" * 64)
+    for name in queries:
+        print(f"{name:>24} | {before[name]:>8.1f} ms | {after[name]:>8.1f} ms | {before[name] / after[name]:>7.1f}x")
+
+BENCHMARKS = {
+    'matcher': bench_matcher,
+    'results-index': bench_results_index,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Bilinmeyen benchmark: {name} (seçenekler: {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        print(f"\n=== {name} ===")
+        BENCHMARKS[name]()
@@ -3,7 +3,7 @@ PostgreSQL Database Models and Connection
 SQLAlchemy ORM kullanarak database yönetimi
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, BigInteger, text
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, BigInteger, Index, text, func, literal_column, select, table, column
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -43,6 +43,8 @@ class User(Base):
     role = Column(String(20), nullable=False, default='admin')  # 'admin' veya 'super_admin'
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login = Column(DateTime, nullable=True)
+    # Rol/üyelik değişince artar: worker'ların bellekteki kullanıcı ve tenant erişim cache'leri bununla doğrulanır
+    auth_version = Column(Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     tenants = relationship('UserTenant', back_populates='user', cascade='all, delete-orphan')
@@ -62,6 +64,10 @@ class Tenant(Base):
     user_tenants = relationship('UserTenant', back_populates='tenant', cascade='all, delete-orphan')
     results = relationship('Result', back_populates='tenant', cascade='all, delete-orphan')
     statistics = relationship('MessageStatistics', back_populates='tenant', cascade='all, delete-orphan')
+    checkpoints = relationship('ScanCheckpoint', back_populates='tenant', cascade='all, delete-orphan')
+    scan_state = relationship('ScanState', back_populates='tenant', uselist=False, cascade='all, delete-orphan')
+    scan_log_lines = relationship('ScanLogLine', back_populates='tenant', cascade='all, delete-orphan')
+    session_lease = relationship('TelegramSessionLease', back_populates='tenant', uselist=False, cascade='all, delete-orphan')
 
 class UserTenant(Base):
     __tablename__ = 'user_tenants'
@@ -112,6 +118,10 @@ class TenantConfig(Base):
 
 class Result(Base):
     __tablename__ = 'results'
+    __table_args__ = (
+        # Mesaj başına tek satır (tarayıcıdaki upsert bu index'e dayanır)
+        Index('ix_results_tenant_group_message', 'tenant_id', 'group_id', 'message_id', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
@@ -140,9 +150,43 @@ class Result(Base):
     
     # Relationships
     tenant = relationship('Tenant', back_populates='results')
+    # passive_deletes: silinen sonucun eşleşmeleri yüklenmez (ON DELETE CASCADE / toplu silme)
+    matches = relationship('ResultMatch', back_populates='result', cascade='all, delete-orphan', passive_deletes=True)
+
+# Sonuç listeleri/export: tenant_id filtresi + timestamp'e göre yeniden eskiye sıralama
+# id sonda: keyset cursor'ı (timestamp, id) < (ts, id) index aralığı olarak okunur
+Index('ix_results_tenant_timestamp', Result.tenant_id, Result.timestamp.desc(), Result.id.desc())
+
+class ResultMatch(Base):
+    """Sonuçta bulunan her kelime/link için bir satır (found_keywords/found_links JSON'unun normalize hali)"""
+    __tablename__ = 'result_matches'
+    __table_args__ = (
+        # Terim bazında zaman serisi: tenant + tür + terim + tarih aralığı
+        Index('ix_result_matches_term_time', 'tenant_id', 'kind', 'term', 'timestamp'),
+        # Tarih aralığındaki en çok geçen terimler
+        Index('ix_result_matches_kind_time', 'tenant_id', 'kind', 'timestamp'),
+        Index('ix_result_matches_result', 'result_id'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    result_id = Column(Integer, ForeignKey('results.id', ondelete='CASCADE'), nullable=False)
+    tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
+    kind = Column(String(10), nullable=False)  # 'keyword' veya 'link'
+    term = Column(String(500), nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # Result.timestamp kopyası (join'siz zaman serisi)
+    
+    # Relationships
+    result = relationship('Result', back_populates='matches')
+
+# ResultMatch.kind değerleri ve Result'taki karşılık gelen JSON kolonları
+MATCH_KINDS = {'keyword': 'found_keywords', 'link': 'found_links'}
 
 class MessageStatistics(Base):
     __tablename__ = 'message_statistics'
+    __table_args__ = (
+        # Gün başına tek satır (tarayıcıdaki upsert bu index'e dayanır)
+        Index('ix_message_statistics_tenant_date', 'tenant_id', 'date', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
@@ -167,6 +211,117 @@ class MessageStatistics(Base):
     # Relationships
     tenant = relationship('Tenant', back_populates='statistics')
 
+class ScanCheckpoint(Base):
+    __tablename__ = 'scan_checkpoints'
+    __table_args__ = (
+        Index('ix_scan_checkpoints_tenant_group', 'tenant_id', 'group_id', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
+    group_id = Column(BigInteger, nullable=False)
+    
+    # İşlenmiş en yüksek mesaj (sonraki tarama min_id olarak kullanır)
+    last_message_id = Column(BigInteger, nullable=False, default=0)
+    last_message_date = Column(DateTime, nullable=True)
+    
+    # Kesintisiz taranmış aralığın başlangıcı (UTC)
+    covered_from = Column(DateTime, nullable=True)
+    
+    # Tarandığı andaki kelime/link listesinin özeti; değiştiyse checkpoint geçersiz (geçmiş yeniden taranır)
+    config_hash = Column(String(64), nullable=True)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    tenant = relationship('Tenant', back_populates='checkpoints')
+
+class ScanState(Base):
+    """Tenant'ın çalışan/son taraması (worker'lar ve sunucular arası paylaşılan durum + lease)"""
+    __tablename__ = 'scan_states'
+    
+    tenant_id = Column(Integer, ForeignKey('tenants.id'), primary_key=True)
+    owner = Column(String(200), nullable=True)  # taramayı başlatan process (host:pid:token)
+    running = Column(Boolean, nullable=False, default=False)
+    start_time = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    # Sahip heartbeat göndermeye devam ettikçe uzar; süresi dolan tarama ölü sayılır (UTC)
+    heartbeat_at = Column(DateTime, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    
+    last_seq = Column(BigInteger, nullable=False, default=0)  # son log satırının seq'i
+    progress = Column(JSON, nullable=True)
+    
+    # Relationships
+    tenant = relationship('Tenant', back_populates='scan_state')
+
+class TelegramSessionLease(Base):
+    """Tenant'ın Telegram session dosyasını kullanan web worker'ı (panel client'ı/giriş; worker'lar arası tek kullanıcı)"""
+    __tablename__ = 'telegram_session_leases'
+    
+    tenant_id = Column(Integer, ForeignKey('tenants.id'), primary_key=True)
+    owner = Column(String(200), nullable=True)  # host:pid:token
+    lease_expires_at = Column(DateTime, nullable=True)
+    wanted_at = Column(DateTime, nullable=True)  # başka bir worker session'ı bekliyor (sahibi boşta kalınca bırakır)
+    
+    # Relationships
+    tenant = relationship('Tenant', back_populates='session_lease')
+
+class ScanLogLine(Base):
+    """Son taramanın log satırları (tenant başına en fazla SCAN_LOG_CAPACITY satır tutulur)"""
+    __tablename__ = 'scan_log_lines'
+    __table_args__ = (
+        Index('ix_scan_log_lines_tenant_seq', 'tenant_id', 'seq', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
+    seq = Column(BigInteger, nullable=False)
+    line = Column(Text, nullable=False)
+    
+    # Relationships
+    tenant = relationship('Tenant', back_populates='scan_log_lines')
+
+# Tam metin arama: PostgreSQL'de tsvector GIN index'i, SQLite'ta FTS5 tablosu (trigger'larla senkron)
+RESULTS_FTS_INDEX = 'ix_results_message_text_fts'
+RESULTS_FTS_TABLE = 'results_fts'
+_RESULTS_FTS_SQLITE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(message_text, content='results', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS results_fts_ai AFTER INSERT ON results BEGIN "
+    "INSERT INTO results_fts(rowid, message_text) VALUES (new.id, new.message_text); END",
+    "CREATE TRIGGER IF NOT EXISTS results_fts_ad AFTER DELETE ON results BEGIN "
+    "INSERT INTO results_fts(results_fts, rowid, message_text) VALUES ('delete', old.id, old.message_text); END",
+    "CREATE TRIGGER IF NOT EXISTS results_fts_au AFTER UPDATE OF message_text ON results BEGIN "
+    "INSERT INTO results_fts(results_fts, rowid, message_text) VALUES ('delete', old.id, old.message_text); "
+    "INSERT INTO results_fts(rowid, message_text) VALUES (new.id, new.message_text); END",
+    # Tablo yeni oluşturulduysa mevcut satırları index'e al
+    "INSERT INTO results_fts(results_fts) VALUES ('rebuild')",
+)
+_results_fts_available = {}
+
+def _results_fts_enabled(bind):
+    """SQLite'ta results_fts tablosu var mı (engine başına bir kez bakılır)"""
+    key = str(bind.url)
+    if key not in _results_fts_available:
+        from sqlalchemy import inspect
+        _results_fts_available[key] = inspect(bind).has_table(RESULTS_FTS_TABLE)
+    return _results_fts_available[key]
+
+def result_search_clause(bind, search):
+    """Result.message_text için tam metin arama koşulu (index yoksa ILIKE)"""
+    dialect = bind.dialect.name
+    if dialect == 'postgresql':
+        # İfade, GIN index'indekiyle birebir aynı olmalı
+        document = func.to_tsvector(literal_column("'simple'::regconfig"), func.coalesce(Result.message_text, literal_column("''")))
+        return document.op('@@')(func.plainto_tsquery(literal_column("'simple'::regconfig"), search))
+    if dialect == 'sqlite' and _results_fts_enabled(bind):
+        # Her kelimeyi tırnakla: FTS5 operatörleri kullanıcı girdisinden yorumlanmasın
+        terms = ' '.join('"' + term.replace('"', '""') + '"' for term in search.split())
+        fts = table(RESULTS_FTS_TABLE, column('rowid'))
+        return Result.id.in_(select(fts.c.rowid).where(literal_column(RESULTS_FTS_TABLE).op('MATCH')(terms)))
+    return Result.message_text.ilike(f'%{search}%')
+
 # Database connection
 def get_database_url():
     """Database URL'ini environment variable'dan al"""
@@ -246,6 +401,11 @@ def get_engine():
         _engine = create_engine_instance()
     return _engine
 
+def dispose_engine(close=True):
+    """Bağlantı pool'unu boşalt; fork edilen child'da close=False: parent'ın bağlantılarını kapatmadan bırak (child kendi pool'unu açar)"""
+    if _engine is not None:
+        _engine.dispose(close=close)
+
 def get_session_local():
     """SessionLocal'ı al veya oluştur (lazy loading)"""
     global _SessionLocal
@@ -285,6 +445,248 @@ def migrate_database():
         # Kolon zaten varsa veya başka bir hata varsa devam et
         if 'already exists' not in str(e).lower() and 'duplicate' not in str(e).lower():
             print(f"⚠️  Migration hatası (devam ediliyor): {e}")
+    
+    migrate_message_statistics_unique(engine)
+    migrate_results_unique(engine)
+    migrate_results_timestamp_index(engine)
+    migrate_results_fulltext(engine)
+    migrate_result_matches(engine)
+    migrate_scan_checkpoints_config_hash(engine)
+    migrate_users_auth_version(engine)
+
+def migrate_message_statistics_unique(engine):
+    """message_statistics'teki (tenant_id, date) tekrarlarını birleştir ve unique index ekle"""
+    from sqlalchemy import inspect
+    
+    try:
+        inspector = inspect(engine)
+        indexes = [ix['name'] for ix in inspector.get_indexes('message_statistics')]
+        if 'ix_message_statistics_tenant_date' in indexes:
+            return
+        
+        SessionLocal = get_session_local()
+        db = SessionLocal()
+        try:
+            # Aynı gün için oluşmuş tekrar satırları ilk satırda topla
+            merged = {}
+            duplicates = 0
+            for stat in db.query(MessageStatistics).order_by(MessageStatistics.id.asc()).all():
+                key = (stat.tenant_id, stat.date)
+                target = merged.get(key)
+                if target is None:
+                    merged[key] = stat
+                    continue
+                for field in ('total_messages', 'total_matches', 'total_views', 'total_forwards', 'total_reactions'):
+                    setattr(target, field, (getattr(target, field) or 0) + (getattr(stat, field) or 0))
+                for field in ('keyword_stats', 'link_stats'):
+                    combined = dict(getattr(target, field) or {})
+                    for term, count in (getattr(stat, field) or {}).items():
+                        combined[term] = combined.get(term, 0) + count
+                    setattr(target, field, combined)
+                db.delete(stat)
+                duplicates += 1
+            db.commit()
+            if duplicates:
+                print(f"✅ message_statistics: {duplicates} tekrar satır birleştirildi")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_message_statistics_tenant_date "
+                "ON message_statistics (tenant_id, date)"
+            ))
+        print("✅ 'ix_message_statistics_tenant_date' index'i oluşturuldu!")
+    except Exception as e:
+        print(f"⚠️  message_statistics migration hatası (devam ediliyor): {e}")
+
+def rebuild_message_statistics(db, tenant_id):
+    """Tenant'ın günlük istatistiklerini results tablosundan yeniden hesapla (commit çağırana ait)"""
+    days = {}
+    rows = db.query(
+        Result.timestamp, Result.found_keywords, Result.found_links,
+        Result.views_count, Result.forwards_count, Result.reactions_count
+    ).filter(Result.tenant_id == tenant_id).yield_per(1000)
+    for timestamp, found_keywords, found_links, views, forwards, reactions in rows:
+        day = days.setdefault(timestamp.date(), {
+            'total_matches': 0, 'total_views': 0, 'total_forwards': 0, 'total_reactions': 0,
+            'keyword_stats': {}, 'link_stats': {}
+        })
+        day['total_matches'] += 1
+        day['total_views'] += views or 0
+        day['total_forwards'] += forwards or 0
+        day['total_reactions'] += reactions or 0
+        for keyword in (found_keywords or []):
+            day['keyword_stats'][keyword] = day['keyword_stats'].get(keyword, 0) + 1
+        for link in (found_links or []):
+            day['link_stats'][link] = day['link_stats'].get(link, 0) + 1
+    
+    db.query(MessageStatistics).filter_by(tenant_id=tenant_id).delete()
+    for date, day in days.items():
+        db.add(MessageStatistics(tenant_id=tenant_id, date=datetime.combine(date, datetime.min.time()),
+                                 total_messages=0, **day))
+
+def migrate_results_unique(engine):
+    """results'taki (tenant_id, group_id, message_id) tekrarlarını sil ve unique index ekle"""
+    from sqlalchemy import inspect
+    
+    try:
+        inspector = inspect(engine)
+        indexes = [ix['name'] for ix in inspector.get_indexes('results')]
+        if 'ix_results_tenant_group_message' in indexes:
+            return
+        
+        with engine.begin() as conn:
+            # Aynı mesaj için tekrar yazılmış satırlardan ilkini (en küçük id) tut
+            deleted = conn.execute(text(
+                "DELETE FROM results WHERE id NOT IN ("
+                "SELECT MIN(id) FROM results GROUP BY tenant_id, group_id, message_id)"
+            )).rowcount
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_results_tenant_group_message "
+                "ON results (tenant_id, group_id, message_id)"
+            ))
+        if deleted:
+            print(f"✅ results: {deleted} tekrar satır silindi")
+            # Tekrarlar günlük özetleri de şişirmişti: kalan sonuçlardan yeniden hesapla
+            SessionLocal = get_session_local()
+            db = SessionLocal()
+            try:
+                tenant_ids = [row[0] for row in db.query(Result.tenant_id).distinct()]
+                for tenant_id in tenant_ids:
+                    rebuild_message_statistics(db, tenant_id)
+                db.commit()
+                print(f"✅ message_statistics: {len(tenant_ids)} tenant için yeniden hesaplandı")
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        print("✅ 'ix_results_tenant_group_message' index'i oluşturuldu!")
+    except Exception as e:
+        print(f"⚠️  results migration hatası (devam ediliyor): {e}")
+
+def migrate_results_timestamp_index(engine):
+    """Mevcut results tablosuna (tenant_id, timestamp DESC, id DESC) index'ini ekle (id'siz eski hali yeniden oluşturulur)"""
+    from sqlalchemy import inspect
+    
+    try:
+        inspector = inspect(engine)
+        indexes = {ix['name']: ix['column_names'] for ix in inspector.get_indexes('results')}
+        if indexes.get('ix_results_tenant_timestamp') == ['tenant_id', 'timestamp', 'id']:
+            return
+        
+        statements = [
+            "DROP INDEX IF EXISTS ix_results_tenant_timestamp",
+            "CREATE INDEX IF NOT EXISTS ix_results_tenant_timestamp ON results (tenant_id, timestamp DESC, id DESC)",
+        ]
+        if engine.dialect.name == 'postgresql':
+            # Büyük tabloda yazmaları kilitlememek için CONCURRENTLY (transaction dışında çalışmalı)
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                for sql in statements:
+                    conn.execute(text(sql.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)))
+        else:
+            with engine.begin() as conn:
+                for sql in statements:
+                    conn.execute(text(sql))
+        print("✅ 'ix_results_tenant_timestamp' index'i oluşturuldu!")
+    except Exception as e:
+        print(f"⚠️  results index migration hatası (devam ediliyor): {e}")
+
+def migrate_results_fulltext(engine):
+    """results.message_text için tam metin index'ini oluştur (PostgreSQL GIN / SQLite FTS5)"""
+    from sqlalchemy import inspect
+    
+    try:
+        inspector = inspect(engine)
+        if engine.dialect.name == 'postgresql':
+            indexes = [ix['name'] for ix in inspector.get_indexes('results')]
+            if RESULTS_FTS_INDEX in indexes:
+                return
+            # Büyük tabloda yazmaları kilitlememek için CONCURRENTLY (transaction dışında çalışmalı)
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {RESULTS_FTS_INDEX} ON results "
+                    "USING gin (to_tsvector('simple'::regconfig, coalesce(message_text, '')))"
+                ))
+            print(f"✅ '{RESULTS_FTS_INDEX}' index'i oluşturuldu!")
+        elif engine.dialect.name == 'sqlite':
+            if inspector.has_table(RESULTS_FTS_TABLE):
+                return
+            with engine.begin() as conn:
+                for statement in _RESULTS_FTS_SQLITE:
+                    conn.execute(text(statement))
+            _results_fts_available.pop(str(engine.url), None)
+            print(f"✅ '{RESULTS_FTS_TABLE}' FTS5 tablosu oluşturuldu!")
+    except Exception as e:
+        # FTS5 derlenmemiş SQLite'ta arama ILIKE ile çalışmaya devam eder
+        print(f"⚠️  Tam metin index migration hatası (devam ediliyor): {e}")
+
+# Mevcut sonuçların JSON dizilerini result_matches'e aç (tek INSERT ... SELECT)
+_RESULT_MATCHES_BACKFILL_SQL = {
+    'postgresql': (
+        "INSERT INTO result_matches (result_id, tenant_id, kind, term, timestamp) "
+        "SELECT DISTINCT r.id, r.tenant_id, :kind, LEFT(term.value, 500), r.timestamp "
+        "FROM results r, json_array_elements_text(r.{column}) AS term(value) "
+        "WHERE json_typeof(r.{column}) = 'array'"
+    ),
+    'sqlite': (
+        "INSERT INTO result_matches (result_id, tenant_id, kind, term, timestamp) "
+        "SELECT DISTINCT r.id, r.tenant_id, :kind, substr(term.value, 1, 500), r.timestamp "
+        "FROM results r, json_each(r.{column}) AS term "
+        "WHERE json_type(r.{column}) = 'array'"
+    ),
+}
+
+def migrate_result_matches(engine):
+    """result_matches boşsa mevcut sonuçların kelime/linklerini SQL ile doldur"""
+    try:
+        sql = _RESULT_MATCHES_BACKFILL_SQL.get(engine.dialect.name)
+        if not sql:
+            return
+        
+        with engine.begin() as conn:
+            has_matches = conn.execute(text("SELECT 1 FROM result_matches LIMIT 1")).first()
+            has_results = conn.execute(text("SELECT 1 FROM results LIMIT 1")).first()
+            if has_matches or not has_results:
+                return
+            inserted = 0
+            for kind, column in MATCH_KINDS.items():
+                inserted += conn.execute(text(sql.format(column=column)), {'kind': kind}).rowcount
+        print(f"✅ result_matches: {inserted} eşleşme mevcut sonuçlardan oluşturuldu")
+    except Exception as e:
+        print(f"⚠️  result_matches migration hatası (devam ediliyor): {e}")
+
+def migrate_scan_checkpoints_config_hash(engine):
+    """scan_checkpoints tablosuna config_hash kolonu ekle (eski checkpoint'ler hash'siz: bir kez tam tarama yapılır)"""
+    from sqlalchemy import inspect
+    try:
+        inspector = inspect(engine)
+        columns = [col['name'] for col in inspector.get_columns('scan_checkpoints')]
+        if 'config_hash' in columns:
+            return
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE scan_checkpoints ADD COLUMN config_hash VARCHAR(64)"))
+        print("✅ 'config_hash' kolonu 'scan_checkpoints' tablosuna eklendi!")
+    except Exception as e:
+        print(f"⚠️  scan_checkpoints migration hatası (devam ediliyor): {e}")
+
+def migrate_users_auth_version(engine):
+    """users tablosuna auth_version kolonu ekle (worker'lar arası auth cache doğrulaması)"""
+    from sqlalchemy import inspect
+    try:
+        inspector = inspect(engine)
+        columns = [col['name'] for col in inspector.get_columns('users')]
+        if 'auth_version' in columns:
+            return
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE users ADD COLUMN auth_version INTEGER NOT NULL DEFAULT 0"))
+        print("✅ 'auth_version' kolonu 'users' tablosuna eklendi!")
+    except Exception as e:
+        print(f"⚠️  users migration hatası (devam ediliyor): {e}")
 
 def init_db():
     """Database tablolarını oluştur ve migration yap"""
@@ -0,0 +1,98 @@
+"""
+Dialog İndeksi
+Tenant'ın Telegram grup/kanal listesinin bellekteki kopyası ve isim araması
+Arama Telegram'a gitmeden, isimlerdeki kelimelerin başlangıcı (prefix) ve kelime ortasında
+geçen aramalar için 3 harflik parçalar (n-gram) üzerinden yapılır
+"""
+
+import bisect
+import re
+import time
+
+_TOKEN_RE = re.compile(r'\w+')
+# Kelime ortası araması için parça uzunluğu (daha kısa aramalar n-gram index'ini kullanamaz)
+_NGRAM = 3
+
+def _tokens(text):
+    """İsmi küçük harfli kelimelere böl"""
+    return _TOKEN_RE.findall((text or '').lower())
+
+def _ngrams(text):
+    """Metnin _NGRAM uzunluğundaki tüm parçaları"""
+    return {text[i:i + _NGRAM] for i in range(len(text) - _NGRAM + 1)}
+
+class DialogIndex:
+    """Dialog listesinin anlık görüntüsü + kelime prefix index'i + n-gram index'i"""
+
+    def __init__(self, dialogs):
+        # dialogs: [{'id', 'name', 'unread', 'is_channel'}, ...] (Telegram'daki sırayla)
+        self.dialogs = list(dialogs)
+        self.created_at = time.time()
+        self._names = [(dialog['name'] or '').lower() for dialog in self.dialogs]
+
+        postings = {}  # kelime -> dialog sıraları
+        for position, name in enumerate(self._names):
+            for token in set(_tokens(name)):
+                postings.setdefault(token, []).append(position)
+        self._postings = postings
+        self._sorted_tokens = sorted(postings)
+
+        ngram_postings = {}  # n-gram -> dialog sıraları
+        for position, name in enumerate(self._names):
+            for gram in _ngrams(name):
+                ngram_postings.setdefault(gram, set()).add(position)
+        self._ngram_postings = ngram_postings
+
+    def _prefix_positions(self, prefix):
+        """prefix ile başlayan kelimeleri içeren dialog sıraları"""
+        positions = set()
+        start = bisect.bisect_left(self._sorted_tokens, prefix)
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            positions.update(self._postings[token])
+        return positions
+
+    def _substring_positions(self, query):
+        """İsminde query geçen dialog sıraları (n-gram'larını içeren adaylar doğrulanır)"""
+        candidates = None
+        # Az dialogda geçen parçalardan başla: aday kümesi hızla küçülür
+        for gram in sorted(_ngrams(query), key=lambda gram: len(self._ngram_postings.get(gram, ()))):
+            matched = self._ngram_postings.get(gram)
+            if not matched:
+                return set()
+            candidates = set(matched) if candidates is None else candidates & matched
+            if not candidates:
+                return set()
+        return {position for position in candidates if query in self._names[position]}
+
+    def search(self, query, limit=50):
+        """Aramadaki her kelime, isimdeki bir kelimenin başlangıcı olmalı; sonuç azsa isim içinde geçenler eklenir"""
+        query_tokens = _tokens(query)
+        if not query_tokens:
+            return []
+
+        positions = None
+        for token in query_tokens:
+            matched = self._prefix_positions(token)
+            positions = matched if positions is None else positions & matched
+            if not positions:
+                break
+        ordered = sorted(positions or ())[:limit]
+
+        if len(ordered) < limit:
+            # Kelime ortasında geçenler (eski substring araması ile aynı sonuçlar)
+            query_lower = query.strip().lower()
+            if len(query_lower) >= _NGRAM:
+                extra = self._substring_positions(query_lower)
+            elif not ordered:
+                # 1-2 harflik aramada n-gram yok: isimler sadece prefix eşleşmesi yoksa taranır
+                extra = {position for position, name in enumerate(self._names) if query_lower in name}
+            else:
+                extra = set()
+            ordered += sorted(extra - set(ordered))[:limit - len(ordered)]
+
+        return [self.dialogs[position] for position in ordered]
+
+    def __len__(self):
+        return len(self.dialogs)
@@ -0,0 +1,107 @@
+"""
+Çoklu Kelime Eşleştirici (Aho-Corasick)
+Anahtar kelime ve linkleri mesaj metninde tek geçişte bulur
+"""
+
+from collections import deque
+
+# Bu sayının altındaki desen listelerinde basit `in` taraması daha hızlı
+# (her `in` C seviyesinde çalışır, otomat ise karakter başına Python döngüsü)
+# Eşik değeri benchmark.py matcher çıktısına göre seçildi
+AHO_CORASICK_MIN_PATTERNS = 200
+
+class KeywordMatcher:
+    """Tenant config'i başına bir kez derlenen çoklu desen eşleştirici"""
+
+    def __init__(self, patterns, min_patterns=AHO_CORASICK_MIN_PATTERNS):
+        # Orijinal sıra (ve tekrarlar) korunur, boş desenler atlanır
+        self.patterns = [p for p in patterns if p]
+
+        # Aynı desen birden fazla kez verilmişse tek düğümde toplanır
+        self._unique = []
+        self._positions = []
+        index_by_pattern = {}
+        for position, pattern in enumerate(self.patterns):
+            uid = index_by_pattern.get(pattern)
+            if uid is None:
+                uid = len(self._unique)
+                index_by_pattern[pattern] = uid
+                self._unique.append(pattern)
+                self._positions.append([])
+            self._positions[uid].append(position)
+
+        self.use_automaton = len(self._unique) >= min_patterns
+        if self.use_automaton:
+            self._build()
+
+    def _build(self):
+        """Trie + failure linklerini oluştur"""
+        goto = [{}]
+        out = [[]]
+
+        for uid, pattern in enumerate(self._unique):
+            state = 0
+            for ch in pattern:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    out.append([])
+                state = next_state
+            out[state].append(uid)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(ch, 0)
+                fail[next_state] = target if target != next_state else 0
+                if out[fail[next_state]]:
+                    out[next_state] = out[next_state] + out[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+
+    def _find_unique(self, text):
+        """Metinde geçen benzersiz desenlerin id'lerini döndür"""
+        if not self.use_automaton:
+            return [uid for uid, pattern in enumerate(self._unique) if pattern in text]
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        total = len(self._unique)
+        hits = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+                if len(hits) == total:
+                    break
+        return hits
+
+    def find_all(self, text):
+        """Metinde geçen desenleri orijinal sırasıyla döndür (eski döngü ile aynı liste)"""
+        if not text or not self._unique:
+            return []
+        hits = self._find_unique(text)
+        if not hits:
+            return []
+        positions = sorted(position for uid in hits for position in self._positions[uid])
+        return [self.patterns[position] for position in positions]
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __bool__(self):
+        return bool(self.patterns)
@@ -0,0 +1,58 @@
+"""
+Telegram İstek Sınırlayıcı
+Aynı TelegramClient'ı paylaşan tüm tarama worker'ları için ortak FloodWait yönetimi
+"""
+
+import asyncio
+import os
+import time
+from telethon.errors import FloodWaitError
+
+# İki istek arasındaki minimum süre (saniye, tüm worker'lar için ortak)
+DEFAULT_MIN_INTERVAL = float(os.environ.get('TELEGRAM_MIN_REQUEST_INTERVAL', 0.05))
+
+class FloodWaitLimiter:
+    """FloodWait gelince tüm worker'ları birlikte bekleten ortak limiter"""
+
+    def __init__(self, min_interval=None, max_retries=3):
+        self.min_interval = DEFAULT_MIN_INTERVAL if min_interval is None else min_interval
+        self.max_retries = max_retries
+        self._resume_at = 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+        self.flood_waits = 0
+
+    def pause(self, seconds):
+        """FloodWait süresince tüm worker'ları durdur"""
+        resume_at = time.monotonic() + seconds
+        if resume_at > self._resume_at:
+            self._resume_at = resume_at
+            self.flood_waits += 1
+            print(f"    [BEKLEME] Telegram FloodWait: {seconds} saniye bekleniyor (tüm gruplar)")
+
+    async def wait(self):
+        """Bekleme süresi bitene ve sıradaki istek slotu gelene kadar bekle"""
+        while True:
+            delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        if self.min_interval:
+            async with self._lock:
+                now = time.monotonic()
+                slot = max(now, self._next_slot)
+                self._next_slot = slot + self.min_interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+
+    async def call(self, factory):
+        """factory() coroutine'ini sınır dahilinde çalıştır, FloodWait'te bekleyip tekrar dene"""
+        for attempt in range(self.max_retries + 1):
+            await self.wait()
+            try:
+                return await factory()
+            except FloodWaitError as e:
+                if attempt >= self.max_retries:
+                    raise
+                self.pause(e.seconds + 1)
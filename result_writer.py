@@ -0,0 +1,360 @@
+"""
+Tarama Sonuçları Yazıcı
+Result satırlarını bellekte toplayıp toplu upsert ile yazar (write-behind buffer)
+Günlük istatistikleri bellekte toplayıp gün başına tek upsert ile yazar
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+from sqlalchemy import insert, select, func, literal_column, bindparam
+from database import Result, ResultMatch, MessageStatistics, MATCH_KINDS
+
+# Varsayılan eşikler (environment variable ile değiştirilebilir)
+DEFAULT_BATCH_SIZE = int(os.environ.get('RESULT_BATCH_SIZE', 500))
+DEFAULT_FLUSH_INTERVAL = float(os.environ.get('RESULT_FLUSH_INTERVAL', 10))
+
+# Sonradan yenilenebilen etkileşim sayaçları
+ENGAGEMENT_FIELDS = ('views_count', 'forwards_count', 'reactions_count', 'reactions_detail', 'replies_count')
+
+# Var olan satırları ararken tek sorgudaki en fazla message_id sayısı (SQLite parametre sınırı)
+_LOOKUP_CHUNK_SIZE = 500
+
+class ResultWriter:
+    """Result satırlarını boyut veya süre eşiğinde toplu olarak yazan buffer"""
+
+    def __init__(self, db, tenant_id, batch_size=None, flush_interval=None, daily_stats=None):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.daily_stats = daily_stats
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else DEFAULT_FLUSH_INTERVAL
+
+        self._rows = []
+        self._pending_index = {}  # (group_id, message_id) -> buffer'daki satır
+        self._counter_updates = []  # Yazıldıktan sonra yenilenen satırlar
+        self._last_flush = time.monotonic()
+
+        # Tarama özeti için sayaçlar
+        self.rows_written = 0  # Yeni eklenen satırlar
+        self.rows_updated = 0  # Zaten kayıtlı olup sayaçları yenilenen satırlar
+        self.commit_count = 0
+
+    @property
+    def pending(self):
+        """Henüz yazılmamış satır sayısı"""
+        return len(self._rows)
+
+    def add(self, row):
+        """Satırı buffer'a ekle, eşik aşıldıysa yaz"""
+        key = (row['group_id'], row['message_id'])
+        pending = self._pending_index.get(key)
+        if pending is not None:
+            # Aynı mesaj buffer'da zaten var: tek satır olarak yazılsın
+            pending.update(row)
+            return
+        self._rows.append(row)
+        self._pending_index[key] = row
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+        else:
+            self.maybe_flush()
+
+    def refresh_counters(self, group_id, message_id, stats):
+        """Etkileşim sayaçlarını güncelle (buffer'daysa yerinde, yazıldıysa sonraki flush'ta UPDATE)
+
+        Satır hâlâ buffer'daysa True döner: günlük istatistiklere flush sırasında güncel değerlerle eklenir.
+        """
+        row = self._pending_index.get((group_id, message_id))
+        if row is not None:
+            for field in ENGAGEMENT_FIELDS:
+                row[field] = stats[field]
+            return True
+        update = {'b_tenant_id': self.tenant_id, 'b_group_id': group_id, 'b_message_id': message_id}
+        update.update({f'b_{field}': stats[field] for field in ENGAGEMENT_FIELDS})
+        self._counter_updates.append(update)
+        return False
+    
+    def maybe_flush(self):
+        """Süre eşiği dolduysa buffer'ı yaz"""
+        if self._rows and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Buffer'daki tüm satırları tek transaction'da yaz (kayıtlı mesajlarda sadece sayaçlar yenilenir)"""
+        self._last_flush = time.monotonic()
+        if not self._rows and not self._counter_updates:
+            return 0
+
+        rows = self._rows
+        updates = self._counter_updates
+        try:
+            # Hangi mesajların zaten kayıtlı olduğunu (ve eski sayaçlarını) öğren
+            existing = self._existing_counters(rows) if rows else {}
+            # SQLAlchemy 2.0: liste ile execute -> executemany (tek round-trip grubu)
+            if rows:
+                self._write_rows(rows, existing)
+                self._write_matches([row for row in rows if (row['group_id'], row['message_id']) not in existing])
+            if updates:
+                self.db.execute(self._counter_update_statement(), updates)
+            self.db.commit()
+        except Exception:
+            # Satırlar buffer'da kalır, bir sonraki flush'ta tekrar denenir
+            self.db.rollback()
+            raise
+
+        self._rows = []
+        self._pending_index = {}
+        self._counter_updates = []
+        new_rows = len(rows) - len(existing)
+        self.rows_written += new_rows
+        self.rows_updated += len(existing)
+        self.commit_count += 1
+        if self.daily_stats is not None:
+            self._record_daily_stats(rows, existing)
+        return new_rows
+
+    def _lookup(self, rows, *columns):
+        """Satırların database'deki karşılıklarını al: {(group_id, message_id): kayıt}"""
+        table = Result.__table__
+        by_group = {}
+        for row in rows:
+            by_group.setdefault(row['group_id'], []).append(row['message_id'])
+        
+        found = {}
+        for group_id, message_ids in by_group.items():
+            for i in range(0, len(message_ids), _LOOKUP_CHUNK_SIZE):
+                chunk = message_ids[i:i + _LOOKUP_CHUNK_SIZE]
+                records = self.db.execute(
+                    select(table.c.message_id, *[table.c[name] for name in columns])
+                    .where(table.c.tenant_id == self.tenant_id,
+                           table.c.group_id == group_id,
+                           table.c.message_id.in_(chunk))
+                )
+                for record in records:
+                    found[(group_id, record.message_id)] = record
+        return found
+    
+    def _existing_counters(self, rows):
+        """Buffer'daki mesajlardan database'de olanların sayaçlarını al"""
+        return self._lookup(rows, 'views_count', 'forwards_count', 'reactions_count')
+    
+    def _write_matches(self, new_rows):
+        """Yeni eklenen sonuçların kelime/linklerini result_matches'e yaz (sonuç başına terim bir kez)"""
+        if not new_rows:
+            return
+        ids = self._lookup(new_rows, 'id')
+        matches = []
+        for row in new_rows:
+            record = ids.get((row['group_id'], row['message_id']))
+            if record is None:
+                continue
+            for kind, column in MATCH_KINDS.items():
+                for term in dict.fromkeys(row.get(column) or []):
+                    matches.append({
+                        'result_id': record.id,
+                        'tenant_id': self.tenant_id,
+                        'kind': kind,
+                        'term': term[:500],
+                        'timestamp': row['timestamp']
+                    })
+        if matches:
+            self.db.execute(insert(ResultMatch), matches)
+
+    def _write_rows(self, rows, existing):
+        """Satırları upsert ile yaz: çakışmada (tenant_id, group_id, message_id) sadece sayaçları güncelle"""
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            stmt = dialect_insert(Result)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['tenant_id', 'group_id', 'message_id'],
+                set_={field: stmt.excluded[field] for field in ENGAGEMENT_FIELDS}
+            )
+            self.db.execute(stmt, rows)
+            return
+
+        # Upsert desteklemeyen database'ler: yenileri ekle, kayıtlıların sayaçlarını güncelle
+        new_rows = [row for row in rows if (row['group_id'], row['message_id']) not in existing]
+        if new_rows:
+            self.db.execute(insert(Result), new_rows)
+        updates = []
+        for row in rows:
+            if (row['group_id'], row['message_id']) in existing:
+                update = {'b_tenant_id': self.tenant_id, 'b_group_id': row['group_id'], 'b_message_id': row['message_id']}
+                update.update({f'b_{field}': row[field] for field in ENGAGEMENT_FIELDS})
+                updates.append(update)
+        if updates:
+            self.db.execute(self._counter_update_statement(), updates)
+
+    def _record_daily_stats(self, rows, existing):
+        """Yeni satırları günlük istatistiklere ekle, kayıtlı olanların sadece sayaç farkını yansıt"""
+        for row in rows:
+            date = row['timestamp'].date()
+            previous = existing.get((row['group_id'], row['message_id']))
+            if previous is None:
+                self.daily_stats.add(date, row['found_keywords'], row['found_links'], row)
+            else:
+                self.daily_stats.adjust(
+                    date,
+                    row['views_count'] - (previous.views_count or 0),
+                    row['forwards_count'] - (previous.forwards_count or 0),
+                    row['reactions_count'] - (previous.reactions_count or 0)
+                )
+
+    def _counter_update_statement(self):
+        """(tenant_id, group_id, message_id) ile sayaçları güncelleyen executemany UPDATE"""
+        table = Result.__table__
+        return table.update().where(
+            table.c.tenant_id == bindparam('b_tenant_id'),
+            table.c.group_id == bindparam('b_group_id'),
+            table.c.message_id == bindparam('b_message_id')
+        ).values({field: bindparam(f'b_{field}') for field in ENGAGEMENT_FIELDS})
+
+    def close(self):
+        """Kapanışta kalan satırları yaz"""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[HATA] Bekleyen {len(self._rows)} sonuç yazılamadı: {e}")
+
+# JSON sayaç sözlüklerini ({"kelime": 3}) SQL tarafında toplayarak birleştir
+_JSON_MERGE_SQL = {
+    'postgresql': (
+        "(SELECT COALESCE(json_object_agg(merged.key, merged.total), '{{}}'::json) FROM ("
+        "SELECT key, SUM((value #>> '{{}}')::bigint) AS total FROM ("
+        "SELECT * FROM json_each(COALESCE(message_statistics.{column}, '{{}}'::json)) "
+        "UNION ALL SELECT * FROM json_each(excluded.{column})"
+        ") AS entries GROUP BY key) AS merged)"
+    ),
+    'sqlite': (
+        "(SELECT COALESCE(json_group_object(key, total), '{{}}') FROM ("
+        "SELECT key, SUM(value) AS total FROM ("
+        "SELECT key, value FROM json_each(COALESCE(message_statistics.{column}, '{{}}')) "
+        "UNION ALL SELECT key, value FROM json_each(excluded.{column})"
+        ") GROUP BY key))"
+    ),
+}
+
+_COUNTER_FIELDS = ('total_messages', 'total_matches', 'total_views', 'total_forwards', 'total_reactions')
+
+class DailyStatsAggregator:
+    """Tarama boyunca günlük istatistikleri bellekte toplar, gün başına tek upsert ile yazar"""
+
+    def __init__(self, db, tenant_id):
+        self.db = db
+        self.tenant_id = tenant_id
+        self._days = {}
+
+    @property
+    def pending(self):
+        """Henüz yazılmamış gün sayısı"""
+        return len(self._days)
+
+    def _day(self, date):
+        """Günün sayaç sözlüğünü al veya oluştur"""
+        day = self._days.get(date)
+        if day is None:
+            day = {field: 0 for field in _COUNTER_FIELDS}
+            day['keyword_stats'] = {}
+            day['link_stats'] = {}
+            self._days[date] = day
+        return day
+
+    def add(self, date, found_keywords, found_links, stats):
+        """Bir eşleşmeyi ilgili günün sayaçlarına ekle"""
+        day = self._day(date)
+        day['total_matches'] += 1
+        day['total_views'] += stats['views_count']
+        day['total_forwards'] += stats['forwards_count']
+        day['total_reactions'] += stats['reactions_count']
+        for keyword in found_keywords:
+            day['keyword_stats'][keyword] = day['keyword_stats'].get(keyword, 0) + 1
+        for link in found_links:
+            day['link_stats'][link] = day['link_stats'].get(link, 0) + 1
+
+    def adjust(self, date, views_delta, forwards_delta, reactions_delta):
+        """Sonradan yenilenen sayaçların farkını ilgili güne ekle"""
+        day = self._day(date)
+        day['total_views'] += views_delta
+        day['total_forwards'] += forwards_delta
+        day['total_reactions'] += reactions_delta
+
+    def flush(self):
+        """Biriken günleri tek transaction'da yaz (gün başına bir upsert)"""
+        if not self._days:
+            return 0
+
+        dialect = self.db.get_bind().dialect.name
+        try:
+            for date, day in self._days.items():
+                date_start = datetime.combine(date, datetime.min.time()).replace(tzinfo=timezone.utc)
+                if dialect in _JSON_MERGE_SQL:
+                    self._upsert(dialect, date_start, day)
+                else:
+                    self._merge_orm(date_start, day)
+            self.db.commit()
+        except Exception:
+            # Sayaçlar bellekte kalır, bir sonraki flush'ta tekrar denenir
+            self.db.rollback()
+            raise
+
+        written = len(self._days)
+        self._days = {}
+        return written
+
+    def _upsert(self, dialect, date_start, day):
+        """INSERT ... ON CONFLICT (tenant_id, date) DO UPDATE ile sayaçları ekle"""
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        table = MessageStatistics.__table__
+        now = datetime.utcnow()
+        stmt = dialect_insert(table).values(
+            tenant_id=self.tenant_id,
+            date=date_start,
+            keyword_stats=day['keyword_stats'],
+            link_stats=day['link_stats'],
+            created_at=now,
+            updated_at=now,
+            **{field: day[field] for field in _COUNTER_FIELDS}
+        )
+        update_values = {
+            field: func.coalesce(table.c[field], 0) + stmt.excluded[field]
+            for field in _COUNTER_FIELDS
+        }
+        for column in ('keyword_stats', 'link_stats'):
+            update_values[column] = literal_column(_JSON_MERGE_SQL[dialect].format(column=column))
+        update_values['updated_at'] = stmt.excluded.updated_at
+
+        self.db.execute(stmt.on_conflict_do_update(
+            index_elements=['tenant_id', 'date'],
+            set_=update_values
+        ))
+
+    def _merge_orm(self, date_start, day):
+        """Upsert desteklemeyen database'ler için satır kilidi ile oku-yaz"""
+        daily_stat = self.db.query(MessageStatistics).filter_by(
+            tenant_id=self.tenant_id,
+            date=date_start
+        ).with_for_update().first()
+
+        if not daily_stat:
+            daily_stat = MessageStatistics(tenant_id=self.tenant_id, date=date_start,
+                                           keyword_stats={}, link_stats={},
+                                           **{field: 0 for field in _COUNTER_FIELDS})
+            self.db.add(daily_stat)
+
+        for field in _COUNTER_FIELDS:
+            setattr(daily_stat, field, (getattr(daily_stat, field) or 0) + day[field])
+        for column in ('keyword_stats', 'link_stats'):
+            combined = dict(getattr(daily_stat, column) or {})
+            for term, count in day[column].items():
+                combined[term] = combined.get(term, 0) + count
+            setattr(daily_stat, column, combined)
+        daily_stat.updated_at = datetime.utcnow()
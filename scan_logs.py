@@ -0,0 +1,195 @@
+"""
+Tarama Logları
+Bot process'inin çıktı satırları (sıra numaralı, sabit kapasiteli ring buffer) ve satırlardan çıkarılan ilerleme durumu
+Okuyucular (SSE stream) yeni satır gelene kadar bekleyebilir; biten taramaların logları bir süre sonra diske yazılıp bellekten atılır
+"""
+
+import os
+import re
+import threading
+import time
+
+# Tenant başına bellekte tutulan en fazla log satırı
+DEFAULT_CAPACITY = int(os.environ.get('SCAN_LOG_CAPACITY', 1000))
+# Biten taramanın logları bu kadar saniye bellekte kalır, sonra diske yazılır
+DEFAULT_RETENTION = float(os.environ.get('SCAN_LOG_RETENTION', 600))
+DEFAULT_SPILL_DIR = os.environ.get('SCAN_LOG_DIR', os.path.join('tenants', '_scan_logs'))
+# Süresi dolan loglar en fazla bu aralıkla kontrol edilir
+_SWEEP_INTERVAL = 60
+
+# tg_monitor_tenant.py çıktısındaki ilerleme satırları
+_GROUPS_TOTAL_RE = re.compile(r'(\d+) seçili grupta geçmiş mesajlar taranıyor')
+_GROUP_START_RE = re.compile(r'\[TARAMA\] (.+?) taranıyor\.\.\.')
+_GROUP_PROGRESS_RE = re.compile(r'\[ILERLEME\] (.+): (\d+) mesaj taranıyor\.\.\. \((\d+) eşleşme\)')
+_GROUP_DONE_RE = re.compile(r'\[TAMAMLANDI\] (.+): (\d+) mesaj tarandı, (\d+) eşleşme bulundu')
+
+class ScanLog:
+    """Bir taramanın log satırları ve ilerleme durumu (thread-safe)
+
+    Satır seq numarası ring buffer'daki yerini belirler (seq % capacity): okurken kopyalama/kaydırma yok.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, first_seq=1):
+        self.capacity = capacity
+        self._buffer = [None] * capacity
+        self.last_seq = first_seq - 1
+        self._first_seq = first_seq
+        self.finished = False
+        self.finished_at = None
+        self.groups_total = 0
+        self.current_group = None
+        self._group_counts = {}  # grup adı -> (taranan mesaj, eşleşme)
+        self._groups_done = set()
+        self._cond = threading.Condition()
+
+    def append(self, line):
+        """Satırı ekle, ilerleme durumunu güncelle ve bekleyen okuyucuları uyandır"""
+        with self._cond:
+            seq = self.last_seq + 1
+            self._buffer[seq % self.capacity] = line
+            self.last_seq = seq
+            self._parse_progress(line)
+            self._cond.notify_all()
+        return seq
+
+    def finish(self):
+        """Tarama bitti: bekleyen okuyucuları uyandır"""
+        with self._cond:
+            self.finished = True
+            self.finished_at = time.monotonic()
+            self._cond.notify_all()
+
+    @property
+    def first_seq(self):
+        """Buffer'da hâlâ duran en eski satırın seq'i"""
+        return max(self._first_seq, self.last_seq - self.capacity + 1)
+
+    def since(self, seq, limit=None):
+        """seq'ten sonraki satırlar (üzerine yazılmış olanlar atlanır): [(seq, satır)]"""
+        with self._cond:
+            start = max(seq + 1, self.first_seq)
+            end = self.last_seq if limit is None else min(self.last_seq, start + limit - 1)
+            return [(s, self._buffer[s % self.capacity]) for s in range(start, end + 1)]
+
+    def tail(self, count):
+        """Son count satır: [(seq, satır)]"""
+        with self._cond:
+            return self.since(self.last_seq - count)
+
+    def __len__(self):
+        return self.last_seq - self.first_seq + 1
+
+    def wait(self, seq, timeout):
+        """seq'ten sonra satır gelene, tarama bitene veya timeout'a kadar bekle"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.last_seq > seq or self.finished, timeout)
+
+    def _parse_progress(self, line):
+        match = _GROUPS_TOTAL_RE.search(line)
+        if match:
+            self.groups_total = int(match.group(1))
+            return
+        match = _GROUP_START_RE.search(line)
+        if match:
+            self.current_group = match.group(1)
+            return
+        match = _GROUP_PROGRESS_RE.search(line) or _GROUP_DONE_RE.search(line)
+        if match:
+            group_name = match.group(1)
+            self._group_counts[group_name] = (int(match.group(2)), int(match.group(3)))
+            if '[TAMAMLANDI]' in line:
+                self._groups_done.add(group_name)
+
+    @property
+    def progress(self):
+        """Taranan mesaj, eşleşme ve grup sayıları"""
+        with self._cond:
+            return {
+                'groups_total': self.groups_total,
+                'groups_done': len(self._groups_done),
+                'current_group': self.current_group,
+                'messages_scanned': sum(count[0] for count in self._group_counts.values()),
+                'matches': sum(count[1] for count in self._group_counts.values()),
+                'last_seq': self.last_seq,
+                'finished': self.finished
+            }
+
+class ScanLogStore:
+    """Tenant başına son taramanın ScanLog'u; biten taramalar süre dolunca diske yazılıp bellekten atılır"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, retention=DEFAULT_RETENTION, spill_dir=DEFAULT_SPILL_DIR):
+        self.capacity = capacity
+        self.retention = retention
+        self.spill_dir = spill_dir
+        self._logs = {}  # tenant_id -> ScanLog
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def start(self, tenant_id):
+        """Yeni tarama için boş log oluştur (seq numaraları önceki taramadan, diske yazıldıysa dosyadan devam eder)"""
+        self._sweep()
+        with self._lock:
+            previous = self._logs.get(tenant_id) or self._load(tenant_id)
+            last_seq = previous.last_seq if previous else 0
+            scan_log = ScanLog(self.capacity, first_seq=last_seq + 1)
+            self._logs[tenant_id] = scan_log
+            return scan_log
+
+    def get(self, tenant_id):
+        """Tenant'ın son tarama logu (bellekte yoksa diskten; yeniden başlatma sonrası da), hiç tarama yoksa None"""
+        self._sweep()
+        with self._lock:
+            scan_log = self._logs.get(tenant_id)
+            if scan_log is None:
+                scan_log = self._load(tenant_id)
+                if scan_log is not None:
+                    self._logs[tenant_id] = scan_log
+            return scan_log
+
+    def remove(self, tenant_id):
+        """Tenant silindi: bellekteki ve diskteki logu sil"""
+        with self._lock:
+            self._logs.pop(tenant_id, None)
+            try:
+                os.remove(self._path(tenant_id))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[UYARI] Tarama logu silinemedi (tenant {tenant_id}): {e}")
+
+    def _path(self, tenant_id):
+        return os.path.join(self.spill_dir, f'{tenant_id}.log')
+
+    def _sweep(self):
+        """Süresi dolan biten taramaların loglarını diske yaz ve bellekten at"""
+        now = time.monotonic()
+        if now - self._last_sweep < min(_SWEEP_INTERVAL, self.retention):
+            return
+        self._last_sweep = now
+        with self._lock:
+            expired = [tenant_id for tenant_id, scan_log in self._logs.items()
+                       if scan_log.finished and now - scan_log.finished_at >= self.retention]
+            for tenant_id in expired:
+                self._spill(tenant_id, self._logs.pop(tenant_id))
+
+    def _spill(self, tenant_id, scan_log):
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self._path(tenant_id), 'w', encoding='utf-8') as f:
+                f.write(f'{scan_log.first_seq}\n')
+                for _, line in scan_log.since(0):
+                    f.write(line + '\n')
+        except OSError as e:
+            print(f"[UYARI] Tarama logu diske yazılamadı (tenant {tenant_id}): {e}")
+
+    def _load(self, tenant_id):
+        try:
+            with open(self._path(tenant_id), encoding='utf-8') as f:
+                first_seq = int(f.readline())
+                scan_log = ScanLog(self.capacity, first_seq=first_seq)
+                for line in f:
+                    scan_log.append(line.rstrip('\n'))
+        except (OSError, ValueError):
+            return None
+        scan_log.finish()
+        return scan_log
@@ -0,0 +1,909 @@
+"""
+Tarama Durumu
+Tenant başına çalışan tarama (bot process'i), durum ve log kayıtları
+SCAN_STATE_BACKEND ile seçilir: 'database' (varsayılan) ve 'redis' worker'lar/sunucular arasında paylaşılır, 'memory' sadece tek process için doğrudur
+Paylaşılan store'larda tenant başına tek tarama lease ile garanti edilir; lease'i hem taramayı başlatan web worker'ı
+hem de tarama process'inin kendisi yeniler, ikisi de heartbeat göndermezse lease düşer
+Panelin Telegram client'ı ve giriş akışı da session dosyasını ayrı bir lease ile (TelegramSessionLease) tek worker'a ayırır
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, insert, delete, or_
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal, ScanState, ScanLogLine, TelegramSessionLease as SessionLeaseRow
+from scan_logs import ScanLog, ScanLogStore, DEFAULT_CAPACITY
+
+SCAN_STATE_BACKEND = os.environ.get('SCAN_STATE_BACKEND', 'database')
+SCAN_STATE_REDIS_URL = os.environ.get('SCAN_STATE_REDIS_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+SCAN_STATE_REDIS_PREFIX = os.environ.get('SCAN_STATE_REDIS_PREFIX', 'tgmonitor:scan')
+# Sahibi bu kadar saniye heartbeat göndermeyen tarama ölü sayılır (başka worker yeni tarama başlatabilir)
+SCAN_STATE_LEASE_TTL = float(os.environ.get('SCAN_STATE_LEASE_TTL', 60))
+# Lease en fazla bu aralıkla yenilenir
+SCAN_STATE_HEARTBEAT = float(os.environ.get('SCAN_STATE_HEARTBEAT', 10))
+# Yeni log satırları ve ilerleme bu aralıkla store'a yazılır
+SCAN_STATE_FLUSH_INTERVAL = float(os.environ.get('SCAN_STATE_FLUSH_INTERVAL', 1))
+# Process'teki log izleyicisi (tenant başına tek thread, SSE bağlantıları onu bekler) database'i bu aralıkla okur
+SCAN_STATE_POLL_INTERVAL = float(os.environ.get('SCAN_STATE_POLL_INTERVAL', 1))
+# Tarama process'ine lease sahibini bildiren environment variable
+SCAN_STATE_OWNER_ENV = 'SCAN_STATE_OWNER'
+
+class MemoryScanStateStore:
+    """Process içi tarama durumu (worker'lar arasında paylaşılmaz)"""
+
+    # Birden fazla worker/sunucu aynı durumu görebilir mi?
+    shared = False
+
+    def __init__(self, logs=None):
+        self.logs = logs or ScanLogStore()
+        self._statuses = {}  # tenant_id -> {'running', 'start_time'}
+        self._processes = {}  # tenant_id -> subprocess.Popen
+        self._lock = threading.Lock()
+
+    def try_start(self, tenant_id):
+        """Tenant için taramayı ayır; zaten çalışan tarama varsa False"""
+        with self._lock:
+            if self._is_running(tenant_id):
+                return False
+            self._statuses[tenant_id] = {
+                'running': True,
+                'start_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            self._processes.pop(tenant_id, None)
+            return True
+
+    def attach(self, tenant_id, process):
+        """Başlatılan bot process'ini kaydet, logların yazılacağı ScanLog'u döndür"""
+        with self._lock:
+            self._processes[tenant_id] = process
+        return self.logs.start(tenant_id)
+
+    def finish(self, tenant_id):
+        """Tarama bitti (veya başlatılamadı)"""
+        with self._lock:
+            status = self._statuses.get(tenant_id)
+            if status:
+                status['running'] = False
+        scan_log = self.logs.get(tenant_id)
+        if scan_log is not None and not scan_log.finished:
+            scan_log.finish()
+
+    def status(self, tenant_id):
+        """{'running', 'start_time'} (process bittiyse running=False)"""
+        with self._lock:
+            running = self._is_running(tenant_id)
+            status = dict(self._statuses.get(tenant_id, {}))
+        status['running'] = running
+        return status
+
+    def log(self, tenant_id):
+        """Tenant'ın son tarama logu (ScanLog) veya None"""
+        return self.logs.get(tenant_id)
+
+    def renew_lease(self, tenant_id, owner):
+        """Process içi store'da lease yok"""
+        return True
+
+    def acquire_session(self, tenant_id):
+        """Tek process: session her zaman bu process'te"""
+        return True
+
+    def renew_session(self, tenant_id):
+        return True
+
+    def release_session(self, tenant_id):
+        pass
+
+    def remove(self, tenant_id):
+        """Tenant silindi: durumunu ve loglarını (diskteki dahil) sil"""
+        with self._lock:
+            self._statuses.pop(tenant_id, None)
+            self._processes.pop(tenant_id, None)
+        self.logs.remove(tenant_id)
+
+    def _is_running(self, tenant_id):
+        status = self._statuses.get(tenant_id)
+        if not status or not status.get('running'):
+            return False
+        process = self._processes.get(tenant_id)
+        if process is not None and process.poll() is not None:
+            status['running'] = False
+            return False
+        return True
+
+class _RunLog(ScanLog):
+    """Bu process'te çalışan taramanın logu: satırlar ayrıca store'a yazılmak üzere biriktirilir"""
+
+    def __init__(self, capacity, first_seq):
+        super().__init__(capacity, first_seq)
+        self._pending = []  # [(seq, satır)]
+        self._pending_lock = threading.Lock()
+
+    def append(self, line):
+        with self._pending_lock:
+            seq = super().append(line)
+            self._pending.append((seq, line))
+        return seq
+
+    def take_pending(self):
+        """Henüz yazılmamış satırları al"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+            return pending
+
+    def restore_pending(self, lines):
+        """Yazılamayan satırları sonraki flush için geri koy"""
+        with self._pending_lock:
+            self._pending[:0] = lines
+
+class _ScanRun:
+    """Bu process'in sahip olduğu tarama"""
+
+    def __init__(self, process, log):
+        self.process = process
+        self.log = log
+        self.flush_lock = threading.Lock()  # aynı taramanın flush'ları sırayla
+        self.last_heartbeat = time.monotonic()
+
+class _LogFollower:
+    """Bu process'te bir tenant'ın paylaşılan tarama logunu izleyen tek thread
+
+    Yeni satırları yerel bir ScanLog'a kopyalar; SSE bağlantıları onun Condition'ını bekler (bağlantı başına sorgu yok).
+    Bekleyen kalmayınca heartbeat süresi sonra durur, sonraki wait() ile yeniden başlar.
+    """
+
+    def __init__(self, store, tenant_id):
+        self.store = store
+        self.tenant_id = tenant_id
+        self.state = None  # son okunan durum (log'daki satırlar en az state['last_seq']'e kadar)
+        self.log = None  # yerel ScanLog
+        self._waiters = 0
+        self._last_used = time.monotonic()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        """Thread çalışıyor mu (çalışmıyorsa yerel kopya eski olabilir)"""
+        return self._thread is not None
+
+    def wait(self, seq, timeout):
+        """seq'ten sonra satır gelene, tarama bitene veya timeout'a kadar bekle"""
+        with self._lock:
+            self._waiters += 1
+            if self._thread is None:
+                # Önce abone olunur: ilk okumadan sonra yapılan yazmaların bildirimi kaçmaz
+                subscription = self.store._subscribe(self.tenant_id)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"[UYARI] Tarama logu okunamadı (tenant {self.tenant_id}): {e}")
+                self._thread = threading.Thread(target=self._run, args=(subscription,),
+                                                name=f'scan-log-{self.tenant_id}', daemon=True)
+                self._thread.start()
+            log = self.log
+        try:
+            if log is None:
+                time.sleep(min(self.store.poll_interval, timeout))
+                return False
+            return log.wait(seq, timeout)
+        finally:
+            with self._lock:
+                self._waiters -= 1
+                self._last_used = time.monotonic()
+
+    def refresh(self):
+        """Store'daki yeni satırları ve durumu yerel ScanLog'a al"""
+        state = self.store._read_state(self.tenant_id)
+        if state is None:
+            return
+        log = self.log
+        if log is None or self.state is None or state['start_time'] != self.state['start_time'] or (log.finished and state['running']):
+            log = self._reload(state)
+        elif state['last_seq'] > log.last_seq:
+            lines = self.store._read_lines(self.tenant_id, log.last_seq)
+            if lines and lines[0][0] != log.last_seq + 1:
+                # Kapasiteden fazla geride kalındı: kalan satırlarla baştan yükle
+                log = self._reload(state)
+            else:
+                for _, line in lines:
+                    log.append(line)
+        self.state = state
+        if not state['running'] and log.last_seq >= state['last_seq'] and not log.finished:
+            log.finish()
+
+    def _reload(self, state):
+        lines = self.store._read_lines(self.tenant_id, state['last_seq'] - self.store.capacity)
+        log = ScanLog(self.store.capacity, first_seq=lines[0][0] if lines else state['last_seq'] + 1)
+        for _, line in lines:
+            log.append(line)
+        previous, self.log = self.log, log
+        if previous is not None and not previous.finished:
+            previous.finish()  # eski kopyayı bekleyenler uyansın
+        return log
+
+    def _run(self, subscription):
+        try:
+            while True:
+                with self._lock:
+                    if not self._waiters and time.monotonic() - self._last_used >= self.store.heartbeat:
+                        self._thread = None
+                        return
+                try:
+                    self.store._wait_for_change(subscription)
+                    self.refresh()
+                except Exception as e:
+                    print(f"[UYARI] Tarama logu okunamadı (tenant {self.tenant_id}): {e}")
+                    time.sleep(self.store.poll_interval)
+        finally:
+            self.store._unsubscribe(subscription)
+
+class SharedScanLogView:
+    """Paylaşılan store'daki tarama logu (ScanLog'un okuma arayüzü)
+
+    wait() process'teki tek _LogFollower'ı bekler; follower çalışırken since() onun yerel kopyasından okur.
+    """
+
+    def __init__(self, store, tenant_id, state):
+        self.store = store
+        self.tenant_id = tenant_id
+        self._state = state
+        self._follower = store._follower(tenant_id)
+
+    def _refresh(self):
+        state = self.store._read_state(self.tenant_id)
+        if state is not None:
+            self._state = state
+
+    @property
+    def last_seq(self):
+        return self._state['last_seq']
+
+    @property
+    def finished(self):
+        return not self._state['running']
+
+    @property
+    def progress(self):
+        progress = dict(self._state['progress'] or {})
+        progress['last_seq'] = self.last_seq
+        progress['finished'] = self.finished
+        return progress
+
+    def since(self, seq, limit=None):
+        """seq'ten sonraki satırlar: [(seq, satır)]"""
+        follower = self._follower
+        # Önce durum, sonra log: log'daki satırlar durumdaki last_seq'ten geride kalmaz
+        state, log = follower.state, follower.log
+        if follower.active and state is not None and log is not None and seq >= log.first_seq - 1:
+            self._state = state
+            return log.since(seq, limit)
+        self._refresh()
+        return self.store._read_lines(self.tenant_id, seq, limit)
+
+    def tail(self, count):
+        """Son count satır: [(seq, satır)]"""
+        self._refresh()
+        return self.store._read_lines(self.tenant_id, self.last_seq - count)
+
+    def wait(self, seq, timeout):
+        """seq'ten sonra satır gelene, tarama bitene veya timeout'a kadar bekle"""
+        changed = self._follower.wait(seq, timeout)
+        if self._follower.state is not None:
+            self._state = self._follower.state
+        return changed
+
+class SharedScanStateStore:
+    """Worker'lar/sunucular arası paylaşılan tarama durumu (backend'ler _acquire/_write/_read_* metodlarını uygular)
+
+    Taramayı başlatan process lease'in sahibidir: logları ve ilerlemeyi arka plan thread'inde yazar, lease'i yeniler.
+    Tarama process'i de aynı sahip adına lease'i yeniler (start_lease_heartbeat): worker ölürse bot bitene kadar lease düşmez.
+    """
+
+    shared = True
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, lease_ttl=SCAN_STATE_LEASE_TTL, heartbeat=SCAN_STATE_HEARTBEAT,
+                 flush_interval=SCAN_STATE_FLUSH_INTERVAL, poll_interval=SCAN_STATE_POLL_INTERVAL):
+        self.capacity = capacity
+        self.lease_ttl = lease_ttl
+        self.heartbeat = heartbeat
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self._token = uuid.uuid4().hex[:8]
+        self._runs = {}  # tenant_id -> _ScanRun (bu process'te çalışan taramalar)
+        self._followers = {}  # tenant_id -> _LogFollower (başka process'teki taramaların logları)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def owner(self):
+        """Lease sahibi kimliği (fork sonrası pid değişir)"""
+        return f'{socket.gethostname()}:{os.getpid()}:{self._token}'
+
+    def try_start(self, tenant_id):
+        """Lease'i al; başka bir process'te çalışan (lease'i dolmamış) tarama varsa False"""
+        return self._acquire(tenant_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+    def attach(self, tenant_id, process):
+        """Başlatılan bot process'ini kaydet, logların yazılacağı ScanLog'u döndür"""
+        run = _ScanRun(process, _RunLog(self.capacity, self._last_seq(tenant_id) + 1))
+        with self._lock:
+            self._runs[tenant_id] = run
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name='scan-state', daemon=True)
+                self._thread.start()
+        return run.log
+
+    def finish(self, tenant_id):
+        """Tarama bitti (veya başlatılamadı): kalan satırları yaz ve lease'i bırak"""
+        with self._lock:
+            run = self._runs.pop(tenant_id, None)
+        if run is None:
+            self._write(tenant_id, [], None, finished=True)
+            return
+        run.log.finish()
+        with run.flush_lock:
+            self._write(tenant_id, run.log.take_pending(), run.log.progress, finished=True)
+
+    def status(self, tenant_id):
+        """{'running', 'start_time', 'heartbeat_at'} (lease'i dolan tarama running=False)"""
+        state = self._read_state(tenant_id)
+        if state is None:
+            return {'running': False}
+        return {
+            'running': state['running'],
+            'start_time': state['start_time'],
+            'heartbeat_at': state['heartbeat_at']
+        }
+
+    def log(self, tenant_id):
+        """Tenant'ın son tarama logu veya None (tarama bu process'teyse yerel ScanLog'u)"""
+        with self._lock:
+            run = self._runs.get(tenant_id)
+        if run is not None:
+            return run.log
+        state = self._read_state(tenant_id)
+        if state is None:
+            return None
+        return SharedScanLogView(self, tenant_id, state)
+
+    def renew_lease(self, tenant_id, owner):
+        """Tarama process'inden lease yenileme (owner: taramayı başlatan worker); lease başkasına geçtiyse False"""
+        return self._renew_lease(tenant_id, owner)
+
+    def acquire_session(self, tenant_id):
+        """Telegram session lease'ini al (boşsa, süresi dolduysa veya zaten bizdeyse); alınamazsa sahibinden bırakmasını iste, False"""
+        return self._acquire_session(tenant_id)
+
+    def renew_session(self, tenant_id):
+        """Session lease'ini yenile; kaybedildiyse veya başka bir worker bekliyorsa False (boşta kalınca bırakılmalı)"""
+        return self._renew_session(tenant_id)
+
+    def release_session(self, tenant_id):
+        """Session lease'ini bırak (sadece bizdeyse)"""
+        self._release_session(tenant_id)
+
+    def remove(self, tenant_id):
+        """Tenant silindi: paylaşılan durumu ve logları sil"""
+        with self._lock:
+            self._runs.pop(tenant_id, None)
+            self._followers.pop(tenant_id, None)
+        self._remove(tenant_id)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                if not self._runs:
+                    self._thread = None
+                    return
+                runs = list(self._runs.items())
+            for tenant_id, run in runs:
+                try:
+                    self._flush(tenant_id, run)
+                except Exception as e:
+                    print(f"[UYARI] Tarama durumu yazılamadı (tenant {tenant_id}): {e}")
+
+    def _flush(self, tenant_id, run):
+        """Yeni satırları/ilerlemeyi yaz; satır yoksa da heartbeat aralığında lease'i yenile"""
+        with run.flush_lock:
+            if run.log.finished:
+                return
+            lines = run.log.take_pending()
+            now = time.monotonic()
+            if not lines and now - run.last_heartbeat < self.heartbeat:
+                return
+            try:
+                owned = self._write(tenant_id, lines, run.log.progress)
+            except Exception:
+                run.log.restore_pending(lines)
+                raise
+            run.last_heartbeat = now
+        if not owned:
+            # Heartbeat gecikti, lease başka bir process'e geçti: aynı session ile iki tarama çalışmasın
+            print(f"[UYARI] Tenant {tenant_id} tarama lease'i kaybedildi, bot durduruluyor")
+            with self._lock:
+                if self._runs.get(tenant_id) is run:
+                    del self._runs[tenant_id]
+            run.process.terminate()
+
+    def _lease_expires_at(self):
+        return datetime.utcnow() + timedelta(seconds=self.lease_ttl)
+
+    def _follower(self, tenant_id):
+        with self._lock:
+            follower = self._followers.get(tenant_id)
+            if follower is None:
+                follower = self._followers[tenant_id] = _LogFollower(self, tenant_id)
+            return follower
+
+    def _subscribe(self, tenant_id):
+        """Değişiklik bildirimi aboneliği (backend desteklemiyorsa None: follower poll_interval ile okur)"""
+        return None
+
+    def _wait_for_change(self, subscription):
+        time.sleep(self.poll_interval)
+
+    def _unsubscribe(self, subscription):
+        pass
+
+class DatabaseScanStateStore(SharedScanStateStore):
+    """scan_states (tenant başına lease satırı) ve scan_log_lines (son capacity satır) tabloları"""
+
+    def _acquire(self, tenant_id, start_time):
+        now = datetime.utcnow()
+        values = {
+            'owner': self.owner,
+            'running': True,
+            'start_time': datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S'),
+            'finished_at': None,
+            'heartbeat_at': now,
+            'lease_expires_at': self._lease_expires_at(),
+            'progress': None
+        }
+        db = SessionLocal()
+        try:
+            # Koşullu UPDATE: aynı anda iki worker deneyse de sadece biri satırı günceller
+            acquired = db.execute(
+                update(ScanState)
+                .where(ScanState.tenant_id == tenant_id,
+                       or_(ScanState.running == False, ScanState.lease_expires_at < now))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+            if not acquired:
+                if db.get(ScanState, tenant_id) is not None:
+                    db.rollback()
+                    return False
+                db.add(ScanState(tenant_id=tenant_id, last_seq=0, **values))
+            # Önceki taramanın logları (seq numaraları kaldığı yerden devam eder)
+            db.execute(delete(ScanLogLine).where(ScanLogLine.tenant_id == tenant_id))
+            db.commit()
+            return True
+        except IntegrityError:
+            # Satırı aynı anda başka bir worker ekledi
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def _last_seq(self, tenant_id):
+        db = SessionLocal()
+        try:
+            return db.execute(select(ScanState.last_seq).where(ScanState.tenant_id == tenant_id)).scalar() or 0
+        finally:
+            db.close()
+
+    def _write(self, tenant_id, lines, progress, finished=False):
+        """Satırları ekle, durumu güncelle, lease'i yenile (bitti ise bırak); lease artık bizde değilse False"""
+        now = datetime.utcnow()
+        values = {'heartbeat_at': now, 'lease_expires_at': self._lease_expires_at(), 'progress': progress}
+        if lines:
+            values['last_seq'] = lines[-1][0]
+        if finished:
+            values.update(running=False, finished_at=now, lease_expires_at=now)
+        db = SessionLocal()
+        try:
+            owned = db.execute(
+                update(ScanState)
+                .where(ScanState.tenant_id == tenant_id, ScanState.owner == self.owner, ScanState.running == True)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+            if not owned:
+                db.rollback()
+                return False
+            if lines:
+                db.execute(insert(ScanLogLine), [
+                    {'tenant_id': tenant_id, 'seq': seq, 'line': line} for seq, line in lines
+                ])
+                db.execute(delete(ScanLogLine).where(
+                    ScanLogLine.tenant_id == tenant_id,
+                    ScanLogLine.seq <= lines[-1][0] - self.capacity
+                ))
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _read_state(self, tenant_id):
+        db = SessionLocal()
+        try:
+            state = db.get(ScanState, tenant_id)
+            if state is None:
+                return None
+            return {
+                'running': bool(state.running and state.lease_expires_at and state.lease_expires_at >= datetime.utcnow()),
+                'start_time': state.start_time.strftime('%Y-%m-%d %H:%M:%S') if state.start_time else None,
+                'heartbeat_at': state.heartbeat_at.isoformat() if state.heartbeat_at else None,
+                'last_seq': state.last_seq or 0,
+                'progress': state.progress
+            }
+        finally:
+            db.close()
+
+    def _renew_lease(self, tenant_id, owner):
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            renewed = db.execute(
+                update(ScanState)
+                .where(ScanState.tenant_id == tenant_id, ScanState.owner == owner, ScanState.running == True)
+                .values(heartbeat_at=now, lease_expires_at=self._lease_expires_at())
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+            db.commit()
+            return renewed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _acquire_session(self, tenant_id):
+        now = datetime.utcnow()
+        values = {'owner': self.owner, 'lease_expires_at': self._lease_expires_at(), 'wanted_at': None}
+        db = SessionLocal()
+        try:
+            acquired = db.execute(
+                update(SessionLeaseRow)
+                .where(SessionLeaseRow.tenant_id == tenant_id,
+                       or_(SessionLeaseRow.owner == self.owner, SessionLeaseRow.owner.is_(None),
+                           SessionLeaseRow.lease_expires_at < now))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+            if not acquired:
+                if db.get(SessionLeaseRow, tenant_id) is None:
+                    db.add(SessionLeaseRow(tenant_id=tenant_id, **values))
+                else:
+                    # Sahibi boşta kalınca bıraksın
+                    db.execute(
+                        update(SessionLeaseRow)
+                        .where(SessionLeaseRow.tenant_id == tenant_id)
+                        .values(wanted_at=now)
+                        .execution_options(synchronize_session=False)
+                    )
+                    db.commit()
+                    return False
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def _renew_session(self, tenant_id):
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            owned = db.execute(
+                update(SessionLeaseRow)
+                .where(SessionLeaseRow.tenant_id == tenant_id, SessionLeaseRow.owner == self.owner)
+                .values(lease_expires_at=self._lease_expires_at())
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+            wanted_at = None
+            if owned:
+                wanted_at = db.execute(select(SessionLeaseRow.wanted_at).where(SessionLeaseRow.tenant_id == tenant_id)).scalar()
+            db.commit()
+            # Bekleyen worker vazgeçtiyse isteği lease süresi sonunda eskir
+            return owned and not (wanted_at and wanted_at >= now - timedelta(seconds=self.lease_ttl))
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _release_session(self, tenant_id):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(SessionLeaseRow)
+                .where(SessionLeaseRow.tenant_id == tenant_id, SessionLeaseRow.owner == self.owner)
+                .values(owner=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _remove(self, tenant_id):
+        db = SessionLocal()
+        try:
+            db.execute(delete(ScanLogLine).where(ScanLogLine.tenant_id == tenant_id))
+            db.execute(delete(ScanState).where(ScanState.tenant_id == tenant_id))
+            db.execute(delete(SessionLeaseRow).where(SessionLeaseRow.tenant_id == tenant_id))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _read_lines(self, tenant_id, after_seq, limit=None):
+        db = SessionLocal()
+        try:
+            query = (select(ScanLogLine.seq, ScanLogLine.line)
+                     .where(ScanLogLine.tenant_id == tenant_id, ScanLogLine.seq > after_seq)
+                     .order_by(ScanLogLine.seq))
+            if limit is not None:
+                query = query.limit(limit)
+            return [(seq, line) for seq, line in db.execute(query)]
+        finally:
+            db.close()
+
+class RedisScanStateStore(SharedScanStateStore):
+    """Redis (veya aynı komutları destekleyen bir client) üzerinde tarama durumu
+
+    client: decode_responses=True ile oluşturulmuş redis.Redis benzeri nesne
+    (set nx/px, get, delete, pexpire, hset mapping, hget, hgetall, rpush, ltrim, lrange, publish, pubsub).
+    Lease: {prefix}:{tenant}:lease (PX ile süreli), durum: {prefix}:{tenant}:state (hash), loglar: {prefix}:{tenant}:log (liste).
+    Session lease'i: {prefix}:{tenant}:session (PX ile süreli), bekleyen worker: {prefix}:{tenant}:session_wanted.
+    Her yazmada {prefix}:{tenant}:events kanalına yayın yapılır: okuyan process'ler polling yapmaz.
+    """
+
+    def __init__(self, client, prefix=SCAN_STATE_REDIS_PREFIX, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, tenant_id, name):
+        return f'{self.prefix}:{tenant_id}:{name}'
+
+    def _acquire(self, tenant_id, start_time):
+        if not self.client.set(self._key(tenant_id, 'lease'), self.owner, nx=True, px=int(self.lease_ttl * 1000)):
+            return False
+        self.client.delete(self._key(tenant_id, 'log'))
+        self.client.hset(self._key(tenant_id, 'state'), mapping={
+            'owner': self.owner,
+            'running': 1,
+            'start_time': start_time,
+            'heartbeat_at': datetime.utcnow().isoformat(),
+            'progress': ''
+        })
+        self.client.publish(self._key(tenant_id, 'events'), 'start')
+        return True
+
+    def _last_seq(self, tenant_id):
+        return int(self.client.hget(self._key(tenant_id, 'state'), 'last_seq') or 0)
+
+    def _write(self, tenant_id, lines, progress, finished=False):
+        lease_key = self._key(tenant_id, 'lease')
+        if self.client.get(lease_key) != self.owner:
+            return False
+        if finished:
+            self.client.delete(lease_key)
+        elif not self.client.pexpire(lease_key, int(self.lease_ttl * 1000)):
+            return False  # get ile pexpire arasında süresi doldu
+
+        mapping = {
+            'heartbeat_at': datetime.utcnow().isoformat(),
+            'progress': json.dumps(progress, ensure_ascii=False) if progress else ''
+        }
+        if lines:
+            log_key = self._key(tenant_id, 'log')
+            self.client.rpush(log_key, *[f'{seq}\t{line}' for seq, line in lines])
+            self.client.ltrim(log_key, -self.capacity, -1)
+            mapping['last_seq'] = lines[-1][0]
+        if finished:
+            mapping['running'] = 0
+        self.client.hset(self._key(tenant_id, 'state'), mapping=mapping)
+        self.client.publish(self._key(tenant_id, 'events'), mapping.get('last_seq', ''))
+        return True
+
+    def _read_state(self, tenant_id):
+        state = self.client.hgetall(self._key(tenant_id, 'state'))
+        if not state:
+            return None
+        running = state.get('running') == '1' and self.client.get(self._key(tenant_id, 'lease')) is not None
+        return {
+            'running': running,
+            'start_time': state.get('start_time'),
+            'heartbeat_at': state.get('heartbeat_at'),
+            'last_seq': int(state.get('last_seq') or 0),
+            'progress': json.loads(state['progress']) if state.get('progress') else None
+        }
+
+    def _subscribe(self, tenant_id):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._key(tenant_id, 'events'))
+        return pubsub
+
+    def _wait_for_change(self, subscription):
+        # Mesaj gelmezse de heartbeat aralığında okunur (yazmadan lease'i dolan tarama bitmiş sayılır)
+        if subscription.get_message(timeout=self.heartbeat) is not None:
+            while subscription.get_message(timeout=0) is not None:
+                pass
+
+    def _unsubscribe(self, subscription):
+        subscription.close()
+
+    def _renew_lease(self, tenant_id, owner):
+        lease_key = self._key(tenant_id, 'lease')
+        if self.client.get(lease_key) != owner:
+            return False
+        return bool(self.client.pexpire(lease_key, int(self.lease_ttl * 1000)))
+
+    def _acquire_session(self, tenant_id):
+        key = self._key(tenant_id, 'session')
+        px = int(self.lease_ttl * 1000)
+        if self.client.set(key, self.owner, nx=True, px=px) or (self.client.get(key) == self.owner and self.client.pexpire(key, px)):
+            self.client.delete(self._key(tenant_id, 'session_wanted'))
+            return True
+        # Sahibi boşta kalınca bıraksın (bekleyen vazgeçerse istek lease süresi sonunda düşer)
+        self.client.set(self._key(tenant_id, 'session_wanted'), self.owner, px=px)
+        return False
+
+    def _renew_session(self, tenant_id):
+        key = self._key(tenant_id, 'session')
+        if self.client.get(key) != self.owner or not self.client.pexpire(key, int(self.lease_ttl * 1000)):
+            return False
+        return self.client.get(self._key(tenant_id, 'session_wanted')) is None
+
+    def _release_session(self, tenant_id):
+        key = self._key(tenant_id, 'session')
+        if self.client.get(key) == self.owner:
+            self.client.delete(key)
+
+    def _remove(self, tenant_id):
+        self.client.delete(self._key(tenant_id, 'lease'), self._key(tenant_id, 'state'), self._key(tenant_id, 'log'),
+                           self._key(tenant_id, 'session'), self._key(tenant_id, 'session_wanted'))
+
+    def _read_lines(self, tenant_id, after_seq, limit=None):
+        lines = []
+        for entry in self.client.lrange(self._key(tenant_id, 'log'), 0, -1):
+            seq, line = entry.split('\t', 1)
+            if int(seq) > after_seq:
+                lines.append((int(seq), line))
+                if limit is not None and len(lines) >= limit:
+                    break
+        return lines
+
+class TelegramSessionLease:
+    """Web worker'ında tenant'ın Telegram session dosyasını kullanma hakkı (panelin client'ı ve giriş akışı)
+
+    Tarama çalışırken alınamaz; session başka bir worker'da açıksa sahibi boşta kalınca bırakana kadar beklenir.
+    Process içinde sayaçlıdır: store'daki lease son kullanıcı bırakınca bırakılır.
+    """
+
+    def __init__(self, store, heartbeat=SCAN_STATE_HEARTBEAT, poll_interval=SCAN_STATE_POLL_INTERVAL, wait_timeout=None):
+        self.store = store
+        self.heartbeat = heartbeat  # sahibi en fazla bu aralıkla yeniler ve bekleyen var mı bakar
+        self.poll_interval = poll_interval
+        self.wait_timeout = wait_timeout if wait_timeout is not None else 2 * heartbeat + poll_interval
+        self._holders = {}  # tenant_id -> bu process'teki kullanıcı sayısı
+        self._lock = threading.Lock()
+
+    def acquire(self, tenant_id):
+        """Session'ı bu process'e ayır; tarama çalışıyorsa veya başka worker bırakmazsa RuntimeError"""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                if self._holders.get(tenant_id):
+                    self._holders[tenant_id] += 1
+                    return
+                if self.store.acquire_session(tenant_id):
+                    # Lease alındıktan sonra bakılır: aynı anda başlayan tarama ya burada görülür ya da lease'i bekler
+                    if self.store.status(tenant_id).get('running'):
+                        self.store.release_session(tenant_id)
+                        raise RuntimeError('Tarama çalışırken Telegram işlemi yapılamaz, tarama bitince tekrar deneyin!')
+                    self._holders[tenant_id] = 1
+                    return
+            if time.monotonic() >= deadline:
+                raise RuntimeError('Telegram oturumu başka bir worker\'da kullanımda, biraz sonra tekrar deneyin!')
+            time.sleep(self.poll_interval)
+
+    def release(self, tenant_id):
+        """acquire() ile alınan kullanımı bırak"""
+        with self._lock:
+            count = self._holders.get(tenant_id, 0) - 1
+            if count > 0:
+                self._holders[tenant_id] = count
+                return
+            self._holders.pop(tenant_id, None)
+            try:
+                self.store.release_session(tenant_id)
+            except Exception as e:
+                print(f"[UYARI] Telegram session lease'i bırakılamadı (tenant {tenant_id}): {e}")
+
+    def renew(self, tenant_id):
+        """Açık client için lease'i yenile; False ise client boşta kalınca kapatılmalı (başka worker bekliyor/lease düştü)"""
+        return self.store.renew_session(tenant_id)
+
+    def wait_idle(self, tenant_id, timeout=None):
+        """Tarama başlamadan önce (tarama lease'i alınmışken): session'ı kullanan panel client'ı/giriş kalmayana kadar bekle"""
+        deadline = time.monotonic() + (self.wait_timeout if timeout is None else timeout)
+        while True:
+            with self._lock:
+                if not self._holders.get(tenant_id) and self.store.acquire_session(tenant_id):
+                    self.store.release_session(tenant_id)
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+def start_lease_heartbeat(tenant_id, owner=None, on_lost=None):
+    """Tarama process'inde: bot çalıştığı sürece lease'i yenile (başlatan web worker'ı ölse de ikinci tarama başlamaz)
+
+    owner verilmezse SCAN_STATE_OWNER'dan okunur; lease yoksa None, varsa durdurmak için threading.Event döner.
+    """
+    owner = owner or os.environ.get(SCAN_STATE_OWNER_ENV)
+    if not owner:
+        return None
+    store = create_scan_state_store()
+    if not store.shared:
+        return None
+
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(store.heartbeat):
+            try:
+                renewed = store.renew_lease(tenant_id, owner)
+            except Exception as e:
+                print(f"[UYARI] Tarama lease'i yenilenemedi: {e}")
+                continue
+            if not renewed:
+                print("[UYARI] Tarama lease'i başka bir process'e geçti, tarama durduruluyor")
+                if on_lost:
+                    on_lost()
+                return
+
+    threading.Thread(target=run, name='scan-lease', daemon=True).start()
+    return stop
+
+def _create_redis_client():
+    """SCAN_STATE_REDIS_URL için client; redis paketi yoksa None"""
+    try:
+        import redis
+    except ImportError:
+        return None
+    return redis.Redis.from_url(SCAN_STATE_REDIS_URL, decode_responses=True)
+
+def create_scan_state_store(backend=None, client=None):
+    """SCAN_STATE_BACKEND'e göre store oluştur (client: redis backend için hazır client)"""
+    backend = (backend or SCAN_STATE_BACKEND).lower()
+    if backend == 'memory':
+        return MemoryScanStateStore()
+    if backend == 'database':
+        return DatabaseScanStateStore()
+    if backend == 'redis':
+        client = client or _create_redis_client()
+        if client is None:
+            print("[UYARI] SCAN_STATE_BACKEND=redis için 'redis' paketi gerekli (pip install redis), database kullanılıyor")
+            return DatabaseScanStateStore()
+        return RedisScanStateStore(client)
+    raise ValueError(f"Bilinmeyen SCAN_STATE_BACKEND: {backend}")
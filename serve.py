@@ -0,0 +1,96 @@
+"""
+Production Sunucu
+Web panelini gunicorn (Linux) veya waitress (Windows / gunicorn yoksa) ile çalıştırır
+Kullanım: python serve.py  (WEB_WORKERS, WEB_THREADS, PORT environment variable'ları ile)
+"""
+
+import os
+import sys
+
+PORT = int(os.environ.get('PORT', 5000))
+HOST = os.environ.get('HOST', '0.0.0.0')
+# Process sayısı ve her process'teki thread sayısı (SSE stream'leri birer thread tutar)
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 1))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 8))
+# gthread veya gevent (gevent kurulu olmalı)
+WEB_WORKER_CLASS = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', 120))
+
+def init_database():
+    """Tabloları/migration'ları master process'te bir kez çalıştır (worker'lar tekrar yapmasın)"""
+    from database import init_db, create_super_admin, dispose_engine
+    try:
+        init_db()
+        create_super_admin()
+    except Exception as e:
+        print(f"⚠️  Database hatası (devam ediliyor): {e}")
+    finally:
+        # Master'ın açtığı bağlantılar kapatılsın, fork ile worker'lara geçmesin
+        dispose_engine()
+
+# Worker'lar arası paylaşım:
+# - auth cache'leri her request'te users.auth_version ile doğrulanır
+# - tarama durumu/logları ve Telegram session lease'i SCAN_STATE_BACKEND'de (database/redis)
+# - dialog_cache ve telegram_pool her worker'da ayrı; session dosyasını aynı anda tek worker açar (scan_state.TelegramSessionLease)
+def resolve_workers():
+    """WEB_WORKERS; SCAN_STATE_BACKEND=memory ile tarama durumu paylaşılamadığından birden fazla worker başlatılmaz"""
+    from scan_state import create_scan_state_store
+    if WEB_WORKERS > 1 and not create_scan_state_store().shared:
+        print(f"[HATA] SCAN_STATE_BACKEND=memory worker'lar arasında paylaşılmıyor: WEB_WORKERS={WEB_WORKERS} için "
+              f"SCAN_STATE_BACKEND=database veya redis kullanın. 1 worker ile devam ediliyor.")
+        return 1
+    return max(WEB_WORKERS, 1)
+
+def post_fork(server, worker):
+    """Worker fork edildikten sonra: parent'tan kalan DB bağlantılarını bırak"""
+    from database import dispose_engine
+    dispose_engine(close=False)
+
+def run_gunicorn(workers):
+    from gunicorn.app.base import BaseApplication
+
+    class PanelApplication(BaseApplication):
+        """web_panel_new:app (preload yok: log listener ve Telegram loop thread'leri her worker'da başlar)"""
+
+        def load_config(self):
+            self.cfg.set('bind', f'{HOST}:{PORT}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', WEB_THREADS)
+            self.cfg.set('worker_class', WEB_WORKER_CLASS)
+            self.cfg.set('timeout', WEB_TIMEOUT)
+            self.cfg.set('preload_app', False)
+            self.cfg.set('post_fork', post_fork)
+            self.cfg.set('accesslog', None)  # istek logu uygulamada (access logger)
+
+        def load(self):
+            from web_panel_new import app
+            return app
+
+    PanelApplication().run()
+
+def run_waitress():
+    from waitress import serve
+    from web_panel_new import app
+    serve(app, host=HOST, port=PORT, threads=WEB_THREADS)
+
+if __name__ == '__main__':
+    print("🔧 Database başlatılıyor...")
+    init_database()
+
+    workers = resolve_workers()
+    print("🌐 Web paneli başlatılıyor...")
+    print(f"📱 Port: {PORT}")
+    print(f"⚙️  Worker: {workers}, Thread: {WEB_THREADS}")
+
+    if sys.platform != 'win32':
+        try:
+            run_gunicorn(workers)
+            sys.exit(0)
+        except ImportError:
+            print("[UYARI] gunicorn kurulu değil, waitress deneniyor")
+    try:
+        run_waitress()
+    except ImportError:
+        print("[UYARI] gunicorn/waitress kurulu değil, Flask geliştirme sunucusu kullanılıyor")
+        from web_panel_new import app
+        app.run(debug=False, host=HOST, port=PORT, threaded=True)
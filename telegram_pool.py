@@ -0,0 +1,165 @@
+"""
+Telegram Client Havuzu
+Web panel için tenant başına tek, bağlı tutulan TelegramClient
+Client'lar arka plandaki tek bir asyncio loop thread'inde yaşar, boşta kalanlar kapatılır
+lease verilirse (scan_state.TelegramSessionLease) client açıkken tenant'ın session dosyası bu worker'a ayrılır
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from telethon import TelegramClient
+
+# Boşta kalan client bu kadar saniye sonra kapatılır
+DEFAULT_IDLE_TIMEOUT = float(os.environ.get('TELEGRAM_CLIENT_IDLE_TIMEOUT', 300))
+# Flask thread'i tek bir Telegram çağrısı için en fazla bu kadar bekler
+DEFAULT_CALL_TIMEOUT = float(os.environ.get('TELEGRAM_CALL_TIMEOUT', 60))
+
+class NotAuthorizedError(Exception):
+    """Tenant'ın Telegram session'ı yok veya geçersiz"""
+
+class TelegramClientPool:
+    """Tenant başına bağlı TelegramClient tutan havuz (thread-safe)"""
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT, call_timeout=DEFAULT_CALL_TIMEOUT, lease=None):
+        self.idle_timeout = idle_timeout
+        self.call_timeout = call_timeout
+        self.lease = lease  # acquire/release/renew(tenant_id) ve heartbeat (None: tek worker, lease yok)
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Aşağıdakiler sadece loop thread'inden kullanılır
+        self._clients = {}  # tenant_id -> (settings, client)
+        self._last_used = {}  # tenant_id -> time.monotonic()
+        self._active = {}  # tenant_id -> devam eden çağrı sayısı (bunlar kapatılmaz)
+        self._tenant_locks = {}  # tenant_id -> asyncio.Lock (aynı tenant için tek bağlantı kurulsun)
+
+    def _ensure_loop(self):
+        """Arka plan loop thread'ini ilk kullanımda başlat"""
+        with self._start_lock:
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.create_task(self._evict_idle_clients())
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name='telegram-pool', daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            return loop
+
+    def run(self, tenant_id, settings, func, timeout=None):
+        """func(client) coroutine'ini tenant'ın bağlı client'ı ile loop'ta çalıştır ve sonucunu döndür
+
+        settings: TelegramClient(session, api_id, api_hash) argümanları; değişirse client yeniden kurulur.
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._call(tenant_id, tuple(settings), func), loop)
+        try:
+            return future.result(timeout=timeout or self.call_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError('Telegram yanıt vermedi (zaman aşımı)!')
+
+    def release(self, tenant_id):
+        """Tenant'ın client'ını kapat (tarama/giriş session dosyasını kullanmadan önce)"""
+        loop = self._loop
+        if loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._close(tenant_id), loop)
+        try:
+            future.result(timeout=self.call_timeout)
+        except Exception as e:
+            print(f"[UYARI] Telegram client kapatılamadı (tenant {tenant_id}): {e}")
+
+    async def _call(self, tenant_id, settings, func):
+        client = await self._acquire(tenant_id, settings)
+        self._active[tenant_id] = self._active.get(tenant_id, 0) + 1
+        try:
+            return await func(client)
+        finally:
+            self._active[tenant_id] -= 1
+            self._last_used[tenant_id] = time.monotonic()
+
+    async def _acquire(self, tenant_id, settings):
+        """Bağlı client'ı döndür; yoksa, koptuysa veya ayarlar değiştiyse yeniden kur"""
+        lock = self._tenant_locks.setdefault(tenant_id, asyncio.Lock())
+        async with lock:
+            entry = self._clients.get(tenant_id)
+            if entry is not None:
+                current_settings, client = entry
+                if current_settings == settings and client.is_connected():
+                    return client
+                await self._close(tenant_id)
+
+            # Session dosyası başka bir worker'da açıksa o bırakana kadar beklenir (veritabanı çağrıları loop dışında)
+            loop = asyncio.get_running_loop()
+            if self.lease is not None:
+                await loop.run_in_executor(None, self.lease.acquire, tenant_id)
+            try:
+                client = TelegramClient(*settings)
+                await client.connect()
+                if not await client.is_user_authorized():
+                    await client.disconnect()
+                    raise NotAuthorizedError('Telegram girişi yapılmamış!')
+            except BaseException:
+                if self.lease is not None:
+                    await loop.run_in_executor(None, self.lease.release, tenant_id)
+                raise
+            self._clients[tenant_id] = (settings, client)
+            self._last_used[tenant_id] = time.monotonic()
+            return client
+
+    async def _close(self, tenant_id):
+        entry = self._clients.pop(tenant_id, None)
+        self._last_used.pop(tenant_id, None)
+        if entry is not None:
+            try:
+                await entry[1].disconnect()
+            except Exception:
+                pass
+            if self.lease is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.lease.release, tenant_id)
+
+    async def _renew_leases(self):
+        """Açık client'ların session lease'ini yenile; başka bir worker bekliyorsa veya lease düştüyse boştaki client'ı kapat"""
+        loop = asyncio.get_running_loop()
+        for tenant_id in list(self._clients):
+            try:
+                keep = await loop.run_in_executor(None, self.lease.renew, tenant_id)
+            except Exception as e:
+                print(f"[UYARI] Telegram session lease'i yenilenemedi (tenant {tenant_id}): {e}")
+                continue
+            if not keep and not self._active.get(tenant_id) and not self._tenant_locks[tenant_id].locked():
+                await self._close(tenant_id)
+
+    async def _evict_idle_clients(self):
+        """Belirli aralıklarla boşta kalan client'ları kapat (lease varsa onu da yenile)"""
+        interval = max(1.0, min(60.0, self.idle_timeout / 2))
+        if self.lease is not None:
+            interval = min(interval, self.lease.heartbeat)
+        while True:
+            await asyncio.sleep(interval)
+            if self.lease is not None:
+                await self._renew_leases()
+            now = time.monotonic()
+            idle = [tenant_id for tenant_id, last_used in self._last_used.items()
+                    if now - last_used >= self.idle_timeout]
+            for tenant_id in idle:
+                if self._active.get(tenant_id) or self._tenant_locks[tenant_id].locked():
+                    continue
+                await self._close(tenant_id)
+
+    def __len__(self):
+        return len(self._clients)
+
+# Web panelin paylaştığı havuz
+telegram_pool = TelegramClientPool()
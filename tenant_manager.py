@@ -8,7 +8,7 @@ import json
 import shutil
 import re
 from datetime import datetime
-from database import SessionLocal, Tenant, TenantConfig, UserTenant, User
+from database import SessionLocal, Tenant, TenantConfig, UserTenant, User, Result, ResultMatch, ScanLogLine
 
 def slugify(text):
     """Basit slugify fonksiyonu"""
@@ -78,6 +78,9 @@ def create_tenant(name, created_by_user_id=None):
             db.add(user_tenant)
         
         db.commit()
+        if created_by_user_id:
+            from auth import invalidate_tenant_access
+            invalidate_tenant_access(created_by_user_id)
         
         # Boş dosyaları oluştur
         with open(config.results_file_path, 'w', encoding='utf-8') as f:
@@ -212,9 +215,18 @@ def delete_tenant(tenant_id):
         if os.path.exists(tenant_dir):
             shutil.rmtree(tenant_dir)
         
-        # Database'den sil (cascade ile ilişkili kayıtlar da silinir)
+        # Büyük tablolar toplu silinir (cascade satır satır yüklerdi); SQLite ON DELETE CASCADE'i uygulamaz,
+        # bu yüzden eşleşmeler sonuçlardan önce açıkça silinir
+        db.query(ResultMatch).filter_by(tenant_id=tenant_id).delete(synchronize_session=False)
+        db.query(Result).filter_by(tenant_id=tenant_id).delete(synchronize_session=False)
+        db.query(ScanLogLine).filter_by(tenant_id=tenant_id).delete(synchronize_session=False)
+        
+        # Database'den sil (cascade ile kalan ilişkili kayıtlar da silinir)
         db.delete(tenant)
         db.commit()
+        
+        from auth import invalidate_tenant_access
+        invalidate_tenant_access()
         return True
     except Exception as e:
         db.rollback()
@@ -282,6 +294,9 @@ def add_user_to_tenant(user_id, tenant_id, role='owner'):
             db.add(user_tenant)
         
         db.commit()
+        
+        from auth import invalidate_tenant_access
+        invalidate_tenant_access(user_id)
         return True
     except Exception as e:
         db.rollback()
@@ -301,6 +316,9 @@ def remove_user_from_tenant(user_id, tenant_id):
         if user_tenant:
             db.delete(user_tenant)
             db.commit()
+            
+            from auth import invalidate_tenant_access
+            invalidate_tenant_access(user_id)
             return True
         return False
     except Exception as e:
@@ -0,0 +1,100 @@
+"""
+Test ortak fixture'ları
+Her test kendi geçici SQLite database'ini kullanır (DATABASE_URL)
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# Modüller repo kökünden import edilir (python tg_monitor_tenant.py ile aynı)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """Boş, migration'ları uygulanmış geçici database"""
+    import database
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(database, '_engine', None)
+    monkeypatch.setattr(database, '_SessionLocal', None)
+    database._results_fts_available.clear()
+    database.init_db()
+    yield database.get_engine()
+    database.dispose_engine()
+
+@pytest.fixture(scope='session')
+def web_panel(tmp_path_factory):
+    """web_panel_new modülü (import sırasında açılan app.log geçici dizine yazılır)"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('web_panel'))
+    try:
+        import web_panel_new
+    finally:
+        os.chdir(cwd)
+    return web_panel_new
+
+@pytest.fixture
+def client(web_panel, engine):
+    """Flask test client'ı (auth'un process içi cache'leri her testte boş başlar)"""
+    import auth
+    auth._user_cache.clear()
+    auth._tenant_access_cache.clear()
+    auth._last_login_written.clear()
+    web_panel.app.config['TESTING'] = True
+    return web_panel.app.test_client()
+
+@pytest.fixture
+def db(engine):
+    """Test database'ine açık session"""
+    from database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def tenant_id(db):
+    """Testler için bir tenant"""
+    from database import Tenant
+    tenant = Tenant(name='Test', slug='test')
+    db.add(tenant)
+    db.commit()
+    return tenant.id
+
+def make_user(db, username, role='admin', tenant_ids=()):
+    """Kullanıcı oluştur ve verilen tenant'lara üye yap (id döner)"""
+    from database import User, UserTenant
+    user = User(username=username, password_hash='-', role=role)
+    db.add(user)
+    db.flush()
+    for tenant_id in tenant_ids:
+        db.add(UserTenant(user_id=user.id, tenant_id=tenant_id))
+    db.commit()
+    return user.id
+
+def login(client, user_id):
+    """Test client'ını kullanıcı olarak giriş yapmış hale getir (Flask-Login session'ı)"""
+    with client.session_transaction() as flask_session:
+        flask_session['_user_id'] = str(user_id)
+        flask_session['_fresh'] = True
+
+def make_row(tenant_id, message_id, group_id=-1001, timestamp=None, keywords=('bonus',), links=(), views=10, text='bonus mesajı'):
+    """ResultWriter'a verilen satır (tg_monitor_tenant.py'deki ile aynı alanlar)"""
+    return {
+        'tenant_id': tenant_id,
+        'timestamp': timestamp or datetime(2025, 1, 1, 12, 0),
+        'group_id': group_id,
+        'group_name': 'Grup',
+        'message_id': message_id,
+        'sender_id': None,
+        'message_text': text,
+        'found_keywords': list(keywords),
+        'found_links': list(links),
+        'message_link': f'https://t.me/c/1/{message_id}',
+        'views_count': views,
+        'forwards_count': 0,
+        'reactions_count': 0,
+        'reactions_detail': None,
+        'replies_count': 0
+    }
@@ -0,0 +1,83 @@
+"""Tenant erişim cache'i: üyelik/tenant değişiklikleri bir sonraki request'te (başka worker'da yapılsa da) geçerli"""
+
+import pytest
+from sqlalchemy import update
+
+import tenant_manager
+from database import Tenant, User, UserTenant
+from conftest import make_user, login
+
+@pytest.fixture
+def member(client, db, tenant_id):
+    """Tenant'a üye admin olarak giriş yapmış client ve kullanıcı id'si"""
+    user_id = make_user(db, 'uye', tenant_ids=[tenant_id])
+    login(client, user_id)
+    return client, user_id
+
+@pytest.fixture
+def super_admin(web_panel, db):
+    """Ayrı bir süper admin client'ı (değişiklikleri yapan)"""
+    other = web_panel.app.test_client()
+    login(other, make_user(db, 'super', role='super_admin'))
+    return other
+
+def _scan_status(client, tenant_id):
+    return client.get(f'/api/admin/{tenant_id}/scan/status').status_code
+
+def _bump_auth_version(db, user_id=None):
+    """Başka bir worker'ın invalidate_tenant_access'i (bu process'in cache'ine dokunmadan)"""
+    query = update(User).values(auth_version=User.auth_version + 1)
+    if user_id is not None:
+        query = query.where(User.id == user_id)
+    db.execute(query)
+    db.commit()
+
+def test_revoked_membership_applies_on_next_request(member, super_admin, tenant_id):
+    client, user_id = member
+    assert _scan_status(client, tenant_id) == 200
+
+    response = super_admin.put(f'/api/super-admin/users/{user_id}/tenants', json={'tenant_ids': []})
+    assert response.get_json()['success']
+    assert _scan_status(client, tenant_id) == 403
+
+def test_removed_and_added_membership(member, db, tenant_id):
+    client, user_id = member
+    other_tenant = Tenant(name='Diğer', slug='diger')
+    db.add(other_tenant)
+    db.commit()
+    assert _scan_status(client, other_tenant.id) == 403
+
+    tenant_manager.add_user_to_tenant(user_id, other_tenant.id)
+    assert _scan_status(client, other_tenant.id) == 200
+
+    tenant_manager.remove_user_from_tenant(user_id, tenant_id)
+    assert _scan_status(client, tenant_id) == 403
+    assert _scan_status(client, other_tenant.id) == 200
+
+def test_deleted_tenant_is_not_accessible(member, super_admin, tenant_id, tmp_path, monkeypatch):
+    client, _ = member
+    monkeypatch.setattr(tenant_manager, 'TENANTS_DIR', str(tmp_path))
+    assert _scan_status(client, tenant_id) == 200
+
+    assert super_admin.delete(f'/api/super-admin/tenants/{tenant_id}').get_json()['success']
+    assert _scan_status(client, tenant_id) == 403
+
+def test_membership_change_in_other_worker(member, db, tenant_id):
+    client, user_id = member
+    assert _scan_status(client, tenant_id) == 200
+
+    # Üyelik başka bir worker'da silindi: bu process'in cache'i sadece auth_version'dan haberdar olur
+    db.query(UserTenant).filter_by(user_id=user_id).delete()
+    db.commit()
+    assert _scan_status(client, tenant_id) == 200
+    _bump_auth_version(db, user_id)
+    assert _scan_status(client, tenant_id) == 403
+
+def test_tenant_deleted_in_other_worker(member, db, tenant_id):
+    client, user_id = member
+    assert _scan_status(client, tenant_id) == 200
+
+    db.query(UserTenant).filter_by(tenant_id=tenant_id).delete()
+    db.commit()
+    _bump_auth_version(db)
+    assert _scan_status(client, tenant_id) == 403
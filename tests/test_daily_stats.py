@@ -0,0 +1,62 @@
+"""DailyStatsAggregator: gün başına upsert ve JSON sayaçlarının SQL tarafında birleştirilmesi"""
+
+from datetime import date, datetime, timezone
+
+from database import MessageStatistics
+from result_writer import DailyStatsAggregator
+
+STATS = {'views_count': 10, 'forwards_count': 1, 'reactions_count': 2}
+
+def _row(db, tenant_id, day):
+    db.expire_all()
+    start = datetime.combine(day, datetime.min.time()).replace(tzinfo=timezone.utc)
+    return db.query(MessageStatistics).filter_by(tenant_id=tenant_id, date=start).one()
+
+def test_flush_writes_one_row_per_day(db, tenant_id):
+    aggregator = DailyStatsAggregator(db, tenant_id)
+    aggregator.add(date(2025, 1, 1), ['bonus'], [], STATS)
+    aggregator.add(date(2025, 1, 1), ['bonus', 'bet'], ['t.me/x'], STATS)
+    aggregator.add(date(2025, 1, 2), ['bet'], [], STATS)
+    assert aggregator.flush() == 2
+    assert aggregator.pending == 0
+
+    first = _row(db, tenant_id, date(2025, 1, 1))
+    assert first.total_matches == 2
+    assert first.total_views == 20
+    assert first.keyword_stats == {'bonus': 2, 'bet': 1}
+    assert first.link_stats == {'t.me/x': 1}
+    assert db.query(MessageStatistics).count() == 2
+
+def test_second_flush_merges_json_counters(db, tenant_id):
+    aggregator = DailyStatsAggregator(db, tenant_id)
+    aggregator.add(date(2025, 1, 1), ['bonus', 'bet'], ['t.me/x'], STATS)
+    aggregator.flush()
+
+    # Sonraki tarama / grup: aynı güne yeni ve mevcut terimler
+    aggregator.add(date(2025, 1, 1), ['bonus', 'çevrim'], [], STATS)
+    aggregator.adjust(date(2025, 1, 1), 5, 0, -1)
+    aggregator.flush()
+
+    row = _row(db, tenant_id, date(2025, 1, 1))
+    assert row.total_matches == 2
+    assert row.total_views == 25
+    assert row.total_reactions == 3
+    assert row.keyword_stats == {'bonus': 2, 'bet': 1, 'çevrim': 1}
+    assert row.link_stats == {'t.me/x': 1}
+    assert db.query(MessageStatistics).count() == 1
+
+def test_orm_fallback_merges_like_sql(db, tenant_id):
+    aggregator = DailyStatsAggregator(db, tenant_id)
+    aggregator.add(date(2025, 1, 1), ['bonus'], ['t.me/x'], STATS)
+    aggregator.flush()
+
+    # Upsert desteklemeyen database yolu
+    aggregator.add(date(2025, 1, 1), ['bonus', 'bet'], [], STATS)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    aggregator._merge_orm(start, aggregator._days[date(2025, 1, 1)])
+    db.commit()
+
+    row = _row(db, tenant_id, date(2025, 1, 1))
+    assert row.total_matches == 2
+    assert row.keyword_stats == {'bonus': 2, 'bet': 1}
+    assert row.link_stats == {'t.me/x': 1}
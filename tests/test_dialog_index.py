@@ -0,0 +1,67 @@
+"""DialogIndex: kelime başı (prefix) araması ve n-gram ile kelime ortası araması"""
+
+import random
+
+from dialog_index import DialogIndex
+
+NAMES = ['Bonus Duyuru', 'Süper Bonuslar', 'Kripto Sohbet', 'Freebonus Kanalı', 'Spor Haberleri',
+         'bonusbet resmi', 'Sohbet Odası', None, 'Haber Merkezi']
+
+class NoScanList(list):
+    """Tüm isimler taranırsa testi düşürür (index'in doğrusal taramaya düşmediğini gösterir)"""
+
+    def __iter__(self):
+        raise AssertionError('isim listesi doğrusal tarandı')
+
+def _index(names):
+    return DialogIndex([{'id': i, 'name': name, 'unread': 0, 'is_channel': True} for i, name in enumerate(names)])
+
+def _ids(dialogs):
+    return [dialog['id'] for dialog in dialogs]
+
+def _reference(names, query, limit=50):
+    """Beklenen sıra: tüm kelimeleri prefix olarak içerenler, sonra isim içinde geçenler
+    (1-2 harflik aramada isim içinde geçenler sadece prefix eşleşmesi yoksa)"""
+    lowered = [(name or '').lower() for name in names]
+    words = query.lower().split()
+    prefix = [i for i, name in enumerate(lowered)
+              if all(any(token.startswith(word) for token in name.split()) for word in words)]
+    if prefix and len(query.strip()) < 3:
+        return prefix[:limit]
+    substring = [i for i, name in enumerate(lowered) if query.strip().lower() in name and i not in prefix]
+    return (prefix + substring)[:limit]
+
+def test_prefix_matches_come_first():
+    index = _index(NAMES)
+    assert _ids(index.search('bonus')) == [0, 1, 5, 3]
+    assert _ids(index.search('sohbet')) == [2, 6]
+    assert _ids(index.search('süper bon')) == [1]
+
+def test_substring_inside_words_uses_ngrams():
+    index = _index(NAMES)
+    index._names = NoScanList(index._names)
+    assert _ids(index.search('onusla')) == [1]
+    assert _ids(index.search('aber')) == [4, 8]
+    assert _ids(index.search('yok böyle')) == []
+
+def test_short_query_scans_names_only_without_prefix_hits():
+    index = _index(NAMES)
+    index._names = NoScanList(index._names)
+    assert _ids(index.search('ha')) == [4, 8]
+
+    index = _index(NAMES)
+    assert _ids(index.search('nu')) == [0, 1, 3, 5]
+
+def test_limit():
+    index = _index([f'Grup {i} bonus' for i in range(100)])
+    assert len(index.search('bonus', limit=10)) == 10
+    assert len(index.search('onu', limit=10)) == 10
+
+def test_matches_reference_on_random_names():
+    rng = random.Random(3)
+    words = ['bonus', 'bet', 'haber', 'spor', 'kanal', 'sohbet', 'kripto', 'resmi']
+    names = [' '.join(rng.choice(words) + rng.choice(['', 'lar', 'x']) for _ in range(rng.randint(1, 3)))
+             for _ in range(200)]
+    index = _index(names)
+    for query in ['bon', 'onus', 'ber', 'kanal', 'spor bon', 'lar', 'x', 'rx', 'bet k', 'et', 'sp']:
+        assert _ids(index.search(query)) == _reference(names, query), query
@@ -0,0 +1,41 @@
+"""KeywordMatcher: Aho-Corasick otomatı eski `in` döngüsü ile aynı sonucu vermeli"""
+
+import random
+
+import pytest
+
+from keyword_matcher import KeywordMatcher
+
+def naive_find_all(patterns, text):
+    """user-001 öncesi döngü"""
+    return [pattern for pattern in patterns if pattern and pattern in text]
+
+@pytest.mark.parametrize('min_patterns', [0, 1000])
+def test_matches_naive_loop(min_patterns):
+    patterns = ['he', 'she', 'his', 'hers', 'bonus', 'bonusbet', 'bet', 'e', 'he', '']
+    matcher = KeywordMatcher(patterns, min_patterns=min_patterns)
+    assert matcher.use_automaton == (min_patterns == 0)
+    for text in ['ushers', 'bonusbet kampanyası', 'hiçbiri yok', 'hehe', '']:
+        assert matcher.find_all(text) == naive_find_all(patterns, text)
+
+def test_overlapping_and_suffix_patterns():
+    matcher = KeywordMatcher(['abcd', 'bc', 'c', 'bcd', 'xabc'], min_patterns=0)
+    assert matcher.find_all('xabcd') == ['abcd', 'bc', 'c', 'bcd', 'xabc']
+
+def test_duplicates_keep_original_order():
+    matcher = KeywordMatcher(['link', 'a', 'link'], min_patterns=0)
+    assert matcher.find_all('bir link var') == ['link', 'a', 'link']
+
+def test_random_texts_match_naive_loop():
+    rng = random.Random(7)
+    alphabet = 'abcş'
+    patterns = [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(60)]
+    matcher = KeywordMatcher(patterns, min_patterns=0)
+    for _ in range(300):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert matcher.find_all(text) == naive_find_all(patterns, text)
+
+def test_empty_matcher():
+    matcher = KeywordMatcher(['', None], min_patterns=0)
+    assert not matcher
+    assert matcher.find_all('metin') == []
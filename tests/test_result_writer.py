@@ -0,0 +1,75 @@
+"""ResultWriter: toplu upsert, aynı mesajın tekrar yazılması ve result_matches"""
+
+from database import Result, ResultMatch
+from result_writer import ResultWriter, DailyStatsAggregator
+from conftest import make_row
+
+def test_flush_inserts_rows_and_matches(db, tenant_id):
+    writer = ResultWriter(db, tenant_id, batch_size=100, flush_interval=999)
+    writer.add(make_row(tenant_id, 1, keywords=['bonus', 'bet', 'bonus'], links=['t.me/x']))
+    writer.add(make_row(tenant_id, 2))
+    assert writer.pending == 2
+    assert writer.flush() == 2
+
+    assert db.query(Result).filter_by(tenant_id=tenant_id).count() == 2
+    terms = sorted((m.kind, m.term) for m in db.query(ResultMatch).all())
+    # Sonuç başına terim bir kez
+    assert terms == [('keyword', 'bet'), ('keyword', 'bonus'), ('keyword', 'bonus'), ('link', 't.me/x')]
+
+def test_rescanned_message_only_refreshes_counters(db, tenant_id):
+    writer = ResultWriter(db, tenant_id, batch_size=100, flush_interval=999)
+    writer.add(make_row(tenant_id, 1, views=10, text='ilk'))
+    writer.flush()
+
+    writer.add(make_row(tenant_id, 1, views=25, text='değişmiş metin'))
+    assert writer.flush() == 0
+    assert writer.rows_written == 1
+    assert writer.rows_updated == 1
+
+    result = db.query(Result).filter_by(tenant_id=tenant_id).one()
+    db.refresh(result)
+    assert result.views_count == 25
+    assert result.message_text == 'ilk'
+    # Tekrar yazılan mesajın eşleşmeleri çoğalmaz
+    assert db.query(ResultMatch).count() == 1
+
+def test_same_message_in_buffer_is_written_once(db, tenant_id):
+    writer = ResultWriter(db, tenant_id, batch_size=100, flush_interval=999)
+    writer.add(make_row(tenant_id, 1, views=1))
+    writer.add(make_row(tenant_id, 1, views=7))
+    assert writer.pending == 1
+    writer.flush()
+    assert db.query(Result).one().views_count == 7
+
+def test_batch_size_triggers_flush(db, tenant_id):
+    writer = ResultWriter(db, tenant_id, batch_size=3, flush_interval=999)
+    for message_id in range(7):
+        writer.add(make_row(tenant_id, message_id))
+    assert writer.commit_count == 2
+    assert writer.pending == 1
+    writer.close()
+    assert db.query(Result).count() == 7
+
+def test_refresh_counters_after_write(db, tenant_id):
+    writer = ResultWriter(db, tenant_id, batch_size=100, flush_interval=999)
+    writer.add(make_row(tenant_id, 1, views=3))
+    writer.flush()
+    stats = {'views_count': 50, 'forwards_count': 2, 'reactions_count': 1, 'reactions_detail': None, 'replies_count': 4}
+    assert writer.refresh_counters(-1001, 1, stats) is False
+    writer.flush()
+    result = db.query(Result).one()
+    db.refresh(result)
+    assert (result.views_count, result.forwards_count, result.replies_count) == (50, 2, 4)
+
+def test_daily_stats_count_only_new_rows_and_counter_deltas(db, tenant_id):
+    daily_stats = DailyStatsAggregator(db, tenant_id)
+    writer = ResultWriter(db, tenant_id, batch_size=100, flush_interval=999, daily_stats=daily_stats)
+    writer.add(make_row(tenant_id, 1, views=10))
+    writer.flush()
+    writer.add(make_row(tenant_id, 1, views=15))
+    writer.flush()
+
+    day = next(iter(daily_stats._days.values()))
+    assert day['total_matches'] == 1
+    assert day['total_views'] == 15
+    assert day['keyword_stats'] == {'bonus': 1}
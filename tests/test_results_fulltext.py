@@ -0,0 +1,78 @@
+"""SQLite FTS5 results_fts tablosu, trigger'ları ve result_search_clause"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+import database
+from database import Result, result_search_clause
+
+@pytest.fixture(autouse=True)
+def require_fts(engine):
+    if not database._results_fts_enabled(engine):
+        pytest.skip('SQLite FTS5 desteği yok')
+
+def _add(db, tenant_id, message_id, message_text):
+    result = Result(tenant_id=tenant_id, group_id=-1001, message_id=message_id, timestamp=datetime(2025, 1, 1),
+                    message_text=message_text, found_keywords=[], found_links=[])
+    db.add(result)
+    db.commit()
+    return result
+
+def _search(engine, db, search):
+    return sorted(r.message_id for r in db.query(Result).filter(result_search_clause(engine, search)))
+
+def test_insert_trigger_indexes_new_rows(engine, db, tenant_id):
+    _add(db, tenant_id, 1, 'Yeni bonus kampanyası başladı')
+    _add(db, tenant_id, 2, 'Bugün çekiliş var')
+
+    assert _search(engine, db, 'bonus') == [1]
+    assert _search(engine, db, 'çekiliş') == [2]
+    assert _search(engine, db, 'bonus kampanyası') == [1]
+    assert _search(engine, db, 'yok') == []
+
+def test_update_trigger_replaces_indexed_text(engine, db, tenant_id):
+    result = _add(db, tenant_id, 1, 'eski metin bonus')
+    result.message_text = 'yeni metin freespin'
+    db.commit()
+
+    assert _search(engine, db, 'bonus') == []
+    assert _search(engine, db, 'freespin') == [1]
+
+def test_delete_trigger_removes_rows(engine, db, tenant_id):
+    _add(db, tenant_id, 1, 'bonus bir')
+    _add(db, tenant_id, 2, 'bonus iki')
+    _add(db, tenant_id, 3, 'bonus üç')
+
+    db.delete(db.query(Result).filter_by(message_id=1).one())
+    db.commit()
+    # Bulk delete (tenant silme) de trigger'ı çalıştırır
+    db.query(Result).filter_by(message_id=2).delete(synchronize_session=False)
+    db.commit()
+
+    assert _search(engine, db, 'bonus') == [3]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM results_fts WHERE results_fts MATCH 'bonus'")).scalar() == 1
+
+def test_fts_operators_in_search_are_quoted(engine, db, tenant_id):
+    _add(db, tenant_id, 1, 'bonus OR çekiliş')
+
+    assert _search(engine, db, 'bonus OR') == [1]
+    assert _search(engine, db, 'NEAR(') == []
+    assert _search(engine, db, '"bonus') == [1]
+
+def test_migration_rebuilds_index_for_existing_rows(engine, db, tenant_id):
+    with engine.begin() as conn:
+        for name in ('results_fts_ai', 'results_fts_ad', 'results_fts_au'):
+            conn.execute(text(f'DROP TRIGGER {name}'))
+        conn.execute(text('DROP TABLE results_fts'))
+    database._results_fts_available.clear()
+    _add(db, tenant_id, 1, 'migration öncesi bonus')
+
+    # FTS tablosu yokken ILIKE'a düşer
+    assert _search(engine, db, 'bonus') == [1]
+
+    database.migrate_results_fulltext(engine)
+    assert database._results_fts_enabled(engine)
+    assert _search(engine, db, 'bonus') == [1]
@@ -0,0 +1,80 @@
+"""Sonuç API'lerinin keyset (timestamp, id) cursor sayfalaması"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import Result
+
+BASE = datetime(2025, 1, 1)
+
+def _add_results(db, tenant_id, count, start_message_id=0, base=BASE, step=timedelta(hours=1)):
+    # Her üç sonuç aynı timestamp'i paylaşır: id ile sıralama da test edilir
+    db.add_all([
+        Result(tenant_id=tenant_id, group_id=-1001, message_id=start_message_id + i,
+               timestamp=base + step * (i // 3), message_text=f'mesaj {i}',
+               found_keywords=[], found_links=[])
+        for i in range(count)
+    ])
+    db.commit()
+
+def _all_pages(web_panel, db, tenant_id, limit, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        results, cursor = web_panel.paginate_results(db, tenant_id, limit, cursor, **filters)
+        ids += [result.id for result in results]
+        pages += 1
+        if not cursor:
+            return ids, pages
+
+def test_pages_cover_all_rows_in_order(web_panel, db, tenant_id):
+    _add_results(db, tenant_id, 25)
+    expected = [r.id for r in db.query(Result).order_by(Result.timestamp.desc(), Result.id.desc())]
+
+    ids, pages = _all_pages(web_panel, db, tenant_id, 4)
+    assert ids == expected
+    assert pages == 7
+
+def test_exact_multiple_has_no_empty_last_page(web_panel, db, tenant_id):
+    _add_results(db, tenant_id, 8)
+    results, cursor = web_panel.paginate_results(db, tenant_id, 4)
+    results, cursor = web_panel.paginate_results(db, tenant_id, 4, cursor)
+    assert len(results) == 4
+    assert cursor is None
+
+def test_new_rows_do_not_shift_following_pages(web_panel, db, tenant_id):
+    _add_results(db, tenant_id, 12)
+    first, cursor = web_panel.paginate_results(db, tenant_id, 5)
+    # Sayfalar arasında taramadan daha yeni sonuçlar geldi
+    _add_results(db, tenant_id, 6, start_message_id=1000, base=BASE + timedelta(days=30))
+    second, _ = web_panel.paginate_results(db, tenant_id, 5, cursor)
+
+    expected = [r.id for r in db.query(Result).filter(Result.message_id < 1000)
+                .order_by(Result.timestamp.desc(), Result.id.desc())]
+    assert [r.id for r in first + second] == expected[:10]
+
+def test_date_filter_with_cursor(web_panel, db, tenant_id):
+    _add_results(db, tenant_id, 30, step=timedelta(days=1))
+    ids, _ = _all_pages(web_panel, db, tenant_id, 2, start_date='2025-01-03', end_date='2025-01-05')
+    timestamps = [db.get(Result, result_id).timestamp for result_id in ids]
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert len(ids) == len(set(ids)) == 12
+    assert all(datetime(2025, 1, 3) <= ts <= datetime(2025, 1, 6) for ts in timestamps)
+
+def test_other_tenants_rows_are_not_returned(web_panel, db, tenant_id):
+    from database import Tenant
+    other = Tenant(name='Diğer', slug='diger')
+    db.add(other)
+    db.commit()
+    _add_results(db, tenant_id, 5)
+    _add_results(db, other.id, 5)
+    ids, _ = _all_pages(web_panel, db, tenant_id, 2)
+    assert {db.get(Result, result_id).tenant_id for result_id in ids} == {tenant_id}
+    assert len(ids) == 5
+
+def test_cursor_round_trip_and_invalid_cursor(web_panel, db, tenant_id):
+    _add_results(db, tenant_id, 1)
+    result = db.query(Result).one()
+    assert web_panel._decode_cursor(web_panel._encode_cursor(result)) == (result.timestamp, result.id)
+    with pytest.raises(ValueError):
+        web_panel.paginate_results(db, tenant_id, 10, 'bozuk-cursor')
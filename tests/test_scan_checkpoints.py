@@ -0,0 +1,214 @@
+"""Grup checkpoint'leri: artımlı tarama (min_id), ayar değişikliği, kapsanan aralığın genişlemesi ve yarım kalan gruplar"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from telethon.errors import FloodWaitError
+
+import tg_monitor_tenant
+from database import Result, ScanCheckpoint, TenantConfig
+from rate_limiter import FloodWaitLimiter
+from tg_monitor_tenant import TelegramMonitorTenant
+
+GROUP_ID = -1001
+NOW = datetime.now(timezone.utc)
+
+class FakeMessage:
+    def __init__(self, message_id, date, text):
+        self.id = message_id
+        self.date = date
+        self.message = text
+        self.entities = None
+        self.media = None
+        self.sender_id = 42
+        self.views = 5
+        self.forwards = 0
+        self.replies = None
+        self.reactions = None
+
+class FakeClient:
+    """iter_messages'ı Telethon gibi uygular: yeniden eskiye, offset_date/offset_id'den önce, min_id'den sonra"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.calls = []
+        self.fail_after = None  # (kaç mesaj sonra, exception)
+
+    def add(self, message_id, days_ago, text='bonus var'):
+        self.messages.append(FakeMessage(message_id, NOW - timedelta(days=days_ago), text))
+
+    async def get_entity(self, chat_id):
+        raise ValueError('entity yok')
+
+    async def iter_messages(self, entity, offset_date=None, offset_id=0, min_id=0, reverse=False):
+        self.calls.append({'offset_id': offset_id, 'min_id': min_id})
+        yielded = 0
+        for message in sorted(self.messages, key=lambda m: m.id, reverse=True):
+            if offset_date and message.date >= offset_date:
+                continue
+            if offset_id and message.id >= offset_id:
+                continue
+            if message.id <= min_id:
+                break
+            if self.fail_after and yielded == self.fail_after[0]:
+                error, self.fail_after = self.fail_after[1], None
+                raise error
+            yielded += 1
+            yield message
+
+@pytest.fixture
+def client():
+    return FakeClient([])
+
+@pytest.fixture
+def make_monitor(db, tenant_id, tmp_path, client, monkeypatch):
+    """Sahte client ile TelegramMonitorTenant (ayarlar tenant config'inden okunur)"""
+    monkeypatch.setattr(tg_monitor_tenant, 'TelegramClient', lambda *args, **kwargs: client)
+    config = TenantConfig(tenant_id=tenant_id, api_id='1', search_keywords=['bonus'], search_links=[],
+                          session_file_path=str(tmp_path / 'session.session'),
+                          results_file_path=str(tmp_path / 'results.txt'))
+    config.set_api_hash('hash')
+    db.add(config)
+    db.commit()
+    monitors = []
+
+    def make(full_scan=False, keywords=None):
+        if keywords is not None:
+            config.search_keywords = keywords
+            db.commit()
+        monitor = TelegramMonitorTenant(tenant_id, full_scan=full_scan)
+        monitor.rate_limiter = FloodWaitLimiter(min_interval=0)
+        monitor.stats_refresh_mode = 'message'
+        monitors.append(monitor)
+        return monitor
+
+    yield make
+    for monitor in monitors:
+        monitor.db.close()
+
+def _scan(monitor, start_days_ago=7):
+    group_info = {'id': GROUP_ID, 'startDate': (NOW - timedelta(days=start_days_ago)).strftime('%Y-%m-%d')}
+    asyncio.run(monitor.scan_group(group_info))
+
+def _checkpoint(db, tenant_id):
+    db.expire_all()
+    return db.query(ScanCheckpoint).filter_by(tenant_id=tenant_id, group_id=GROUP_ID).one_or_none()
+
+def _scanned_ids(monitor):
+    return sorted(result.message_id for result in monitor.db.query(Result).all())
+
+def test_rescan_reads_only_new_messages(make_monitor, client, db, tenant_id):
+    for message_id in range(1, 6):
+        client.add(message_id, days_ago=6 - message_id)
+    first = make_monitor()
+    _scan(first)
+    assert _checkpoint(db, tenant_id).last_message_id == 5
+
+    client.add(6, days_ago=0.5)
+    client.add(7, days_ago=0.1, text='sıradan mesaj')
+    second = make_monitor()
+    _scan(second)
+
+    assert client.calls[-1]['min_id'] == 5
+    assert second.incremental_groups == 1
+    assert second.result_writer.rows_written == 1
+    assert _scanned_ids(second) == [1, 2, 3, 4, 5, 6]
+    assert _checkpoint(db, tenant_id).last_message_id == 7
+
+def test_config_change_forces_full_rescan(make_monitor, client, db, tenant_id):
+    for message_id in range(1, 4):
+        client.add(message_id, days_ago=message_id, text='bonus ve çevrim')
+    _scan(make_monitor())
+
+    rescan = make_monitor(keywords=['bonus', 'çevrim'])
+    assert rescan.get_min_id(GROUP_ID, NOW - timedelta(days=7)) == 0
+    _scan(rescan)
+
+    assert client.calls[-1]['min_id'] == 0
+    assert rescan.result_writer.rows_updated == 3
+    checkpoint = _checkpoint(db, tenant_id)
+    assert checkpoint.config_hash == rescan.config_hash
+    assert checkpoint.last_message_id == 3
+    assert db.query(ScanCheckpoint).count() == 1
+    # Yeni ayarlarla kaydedilen checkpoint bir sonraki taramada kullanılır
+    assert make_monitor().get_min_id(GROUP_ID, NOW - timedelta(days=7)) == 3
+
+def test_full_scan_ignores_checkpoint(make_monitor, client, db, tenant_id):
+    client.add(1, days_ago=1)
+    _scan(make_monitor())
+
+    full = make_monitor(full_scan=True)
+    _scan(full)
+    assert client.calls[-1]['min_id'] == 0
+    assert _checkpoint(db, tenant_id).last_message_id == 1
+
+def test_earlier_start_date_widens_coverage(make_monitor, client, db, tenant_id):
+    client.add(1, days_ago=9)
+    client.add(2, days_ago=2)
+    client.add(3, days_ago=1)
+    _scan(make_monitor(), start_days_ago=3)
+    checkpoint = _checkpoint(db, tenant_id)
+    assert checkpoint.last_message_id == 3
+    first_covered_from = checkpoint.covered_from
+
+    # Kapsanan aralıktan önceki günler taranmadı: checkpoint kullanılamaz
+    earlier = make_monitor()
+    assert earlier.get_min_id(GROUP_ID, NOW - timedelta(days=10)) == 0
+    _scan(earlier, start_days_ago=10)
+    assert client.calls[-1]['min_id'] == 0
+    assert _scanned_ids(earlier) == [1, 2, 3]
+
+    checkpoint = _checkpoint(db, tenant_id)
+    assert checkpoint.covered_from < first_covered_from
+    assert checkpoint.last_message_id == 3
+
+    # Genişleyen aralığın içinde kalan başlangıç artık artımlı taranır
+    _scan(make_monitor(), start_days_ago=5)
+    assert client.calls[-1]['min_id'] == 3
+
+def test_interrupted_group_does_not_advance_checkpoint(make_monitor, client, db, tenant_id):
+    for message_id in range(1, 4):
+        client.add(message_id, days_ago=5 - message_id)
+    _scan(make_monitor())
+
+    for message_id in range(4, 8):
+        client.add(message_id, days_ago=(8 - message_id) / 10)
+    client.fail_after = (2, ConnectionError('bağlantı koptu'))
+    interrupted = make_monitor()
+    _scan(interrupted)
+
+    # İşlenen mesajlar yazıldı ama checkpoint eski yerinde: sonraki tarama 3'ten sonrasını tekrar okur
+    assert _scanned_ids(interrupted) == [1, 2, 3, 6, 7]
+    assert _checkpoint(db, tenant_id).last_message_id == 3
+
+    resumed = make_monitor()
+    _scan(resumed)
+    assert client.calls[-1]['min_id'] == 3
+    assert _scanned_ids(resumed) == [1, 2, 3, 4, 5, 6, 7]
+    assert _checkpoint(db, tenant_id).last_message_id == 7
+
+def test_cancelled_group_does_not_save_checkpoint(make_monitor, client, db, tenant_id):
+    for message_id in range(1, 5):
+        client.add(message_id, days_ago=5 - message_id)
+    client.fail_after = (1, asyncio.CancelledError())
+    monitor = make_monitor()
+
+    with pytest.raises(asyncio.CancelledError):
+        _scan(monitor)
+    assert _checkpoint(db, tenant_id) is None
+    assert _scanned_ids(monitor) == [4]
+
+def test_flood_wait_resumes_from_last_message(make_monitor, client, db, tenant_id, monkeypatch):
+    for message_id in range(1, 7):
+        client.add(message_id, days_ago=(7 - message_id) / 10)
+    client.fail_after = (3, FloodWaitError(request=None, capture=30))
+    monitor = make_monitor()
+    pauses = []
+    monkeypatch.setattr(monitor.rate_limiter, 'pause', pauses.append)
+    _scan(monitor)
+
+    assert pauses == [31]
+    assert client.calls[-1]['offset_id'] == 4
+    assert _scanned_ids(monitor) == [1, 2, 3, 4, 5, 6]
+    assert _checkpoint(db, tenant_id).last_message_id == 6
@@ -0,0 +1,352 @@
+"""Paylaşılan tarama durumu: lease alma, heartbeat, süresi dolunca devralma, tarama process'inin lease yenilemesi ve log izleme"""
+
+import threading
+import time
+
+import pytest
+
+import scan_state
+from scan_state import DatabaseScanStateStore, RedisScanStateStore, TelegramSessionLease, start_lease_heartbeat
+
+LEASE_TTL = 0.3
+
+class FakeRedis:
+    """RedisScanStateStore'un kullandığı komutlar (PX süreleri gerçek zamanla dolar)"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.subscribers = {}  # kanal -> [FakePubSub]
+
+    def _alive(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if px:
+            self.expires[key] = time.monotonic() + px / 1000
+        return True
+
+    def get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def pexpire(self, key, px):
+        if not self._alive(key):
+            return False
+        self.expires[key] = time.monotonic() + px / 1000
+        return True
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+
+    def ltrim(self, key, start, end):
+        items = self.data.get(key, [])
+        self.data[key] = items[start:] if end == -1 else items[start:end + 1]
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+    
+    def publish(self, channel, message):
+        for pubsub in list(self.subscribers.get(channel, [])):
+            pubsub.push(message)
+    
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.channels = []
+        self.messages = []
+        self.cond = threading.Condition()
+    
+    def subscribe(self, channel):
+        self.redis.subscribers.setdefault(channel, []).append(self)
+        self.channels.append(channel)
+    
+    def push(self, message):
+        with self.cond:
+            self.messages.append({'type': 'message', 'data': message})
+            self.cond.notify_all()
+    
+    def get_message(self, timeout=0):
+        with self.cond:
+            self.cond.wait_for(lambda: self.messages, timeout)
+            return self.messages.pop(0) if self.messages else None
+    
+    def close(self):
+        for channel in self.channels:
+            self.redis.subscribers[channel].remove(self)
+
+class FakeProcess:
+    def __init__(self):
+        self.terminated = False
+
+    def terminate(self):
+        self.terminated = True
+
+@pytest.fixture(params=['database', 'redis'])
+def make_store(request, engine):
+    """Aynı backend'i paylaşan store'lar (her biri ayrı bir worker gibi farklı owner ile)"""
+    client = FakeRedis()
+
+    def make(**kwargs):
+        kwargs.setdefault('lease_ttl', LEASE_TTL)
+        kwargs.setdefault('heartbeat', 0.05)
+        kwargs.setdefault('flush_interval', 60)
+        kwargs.setdefault('poll_interval', 0.05)
+        if request.param == 'redis':
+            return RedisScanStateStore(client, **kwargs)
+        return DatabaseScanStateStore(**kwargs)
+    return make
+
+def _wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_single_scan_per_tenant_while_lease_is_alive(make_store, tenant_id):
+    first, second = make_store(), make_store()
+
+    assert first.try_start(tenant_id)
+    assert not second.try_start(tenant_id)
+    assert second.status(tenant_id)['running']
+
+def test_finish_releases_lease(make_store, tenant_id):
+    first, second = make_store(), make_store()
+    first.try_start(tenant_id)
+    first.finish(tenant_id)
+
+    assert not second.status(tenant_id)['running']
+    assert second.try_start(tenant_id)
+
+def test_expired_lease_is_taken_over(make_store, tenant_id):
+    first, second = make_store(), make_store()
+    first.try_start(tenant_id)
+    time.sleep(LEASE_TTL + 0.1)
+
+    assert not second.status(tenant_id)['running']
+    assert second.try_start(tenant_id)
+    # Eski sahip artık yazamaz
+    assert not first._write(tenant_id, [], None)
+    assert not first.renew_lease(tenant_id, first.owner)
+    assert second.renew_lease(tenant_id, second.owner)
+
+def test_heartbeat_blocks_takeover(make_store, tenant_id):
+    first, second = make_store(heartbeat=0), make_store()
+    first.try_start(tenant_id)
+    first.attach(tenant_id, FakeProcess())
+    
+    deadline = time.monotonic() + LEASE_TTL * 2
+    while time.monotonic() < deadline:
+        first._flush(tenant_id, first._runs[tenant_id])
+        time.sleep(LEASE_TTL / 3)
+
+    assert not second.try_start(tenant_id)
+
+def test_renewed_lease_blocks_takeover(make_store, tenant_id):
+    first, second = make_store(), make_store()
+    first.try_start(tenant_id)
+
+    deadline = time.monotonic() + LEASE_TTL * 2
+    while time.monotonic() < deadline:
+        assert first.renew_lease(tenant_id, first.owner)
+        time.sleep(LEASE_TTL / 3)
+
+    assert not second.try_start(tenant_id)
+
+def test_flush_terminates_scan_after_losing_lease(make_store, tenant_id):
+    first, second = make_store(heartbeat=0), make_store()
+    first.try_start(tenant_id)
+    process = FakeProcess()
+    log = first.attach(tenant_id, process)
+    log.append('[OK] tarama başladı')
+    first._flush(tenant_id, first._runs[tenant_id])
+    assert [line for _, line in second.log(tenant_id).since(0)] == ['[OK] tarama başladı']
+
+    time.sleep(LEASE_TTL + 0.1)
+    assert second.try_start(tenant_id)
+    first._flush(tenant_id, first._runs[tenant_id])
+
+    assert process.terminated
+    assert tenant_id not in first._runs
+    assert second.status(tenant_id)['running']
+
+def test_scanner_heartbeat_keeps_lease_after_worker_stops(make_store, tenant_id, monkeypatch):
+    worker, scanner_store, other = make_store(), make_store(), make_store()
+    monkeypatch.setattr(scan_state, 'create_scan_state_store', lambda: scanner_store)
+    worker.try_start(tenant_id)
+
+    # Worker lease'i yenilemiyor (ölmüş gibi), tarama process'i onun adına yeniliyor
+    stop = start_lease_heartbeat(tenant_id, owner=worker.owner)
+    try:
+        time.sleep(LEASE_TTL * 2)
+        assert not other.try_start(tenant_id)
+    finally:
+        stop.set()
+
+    assert _wait_until(lambda: other.try_start(tenant_id))
+
+def test_scanner_heartbeat_reports_lost_lease(make_store, tenant_id, monkeypatch):
+    worker, other = make_store(), make_store()
+    monkeypatch.setattr(scan_state, 'create_scan_state_store', make_store)
+    worker.try_start(tenant_id)
+    time.sleep(LEASE_TTL + 0.1)
+    assert other.try_start(tenant_id)
+
+    lost = threading.Event()
+    stop = start_lease_heartbeat(tenant_id, owner=worker.owner, on_lost=lost.set)
+    try:
+        assert lost.wait(2)
+    finally:
+        stop.set()
+
+def test_scanner_heartbeat_needs_owner(monkeypatch):
+    monkeypatch.delenv(scan_state.SCAN_STATE_OWNER_ENV, raising=False)
+    assert start_lease_heartbeat(1) is None
+
+def _session_lease(store):
+    return TelegramSessionLease(store, heartbeat=0.05, poll_interval=0.02, wait_timeout=0.1)
+
+def test_session_is_open_in_one_worker(make_store, tenant_id):
+    first, second = make_store(), make_store()
+    first_lease, second_lease = _session_lease(first), _session_lease(second)
+    first_lease.acquire(tenant_id)
+
+    with pytest.raises(RuntimeError, match='başka bir worker'):
+        second_lease.acquire(tenant_id)
+    # Bekleyen worker sahibinden bırakmasını istedi
+    assert not first_lease.renew(tenant_id)
+
+    first_lease.release(tenant_id)
+    second_lease.acquire(tenant_id)
+    assert second_lease.renew(tenant_id)
+
+def test_session_lease_is_counted_in_process(make_store, tenant_id):
+    first, second = make_store(), make_store()
+    first_lease, second_lease = _session_lease(first), _session_lease(second)
+    first_lease.acquire(tenant_id)
+    first_lease.acquire(tenant_id)
+
+    first_lease.release(tenant_id)
+    with pytest.raises(RuntimeError):
+        second_lease.acquire(tenant_id)
+    first_lease.release(tenant_id)
+    second_lease.acquire(tenant_id)
+
+def test_expired_session_lease_is_taken_over(make_store, tenant_id):
+    first, second = make_store(), make_store()
+    _session_lease(first).acquire(tenant_id)
+    time.sleep(LEASE_TTL + 0.1)
+
+    _session_lease(second).acquire(tenant_id)
+    assert not first.renew_session(tenant_id)
+
+def test_session_is_not_opened_while_scan_runs(make_store, tenant_id):
+    worker, other = make_store(), make_store()
+    worker.try_start(tenant_id)
+
+    with pytest.raises(RuntimeError, match='Tarama çalışırken'):
+        _session_lease(other).acquire(tenant_id)
+    worker.finish(tenant_id)
+    _session_lease(other).acquire(tenant_id)
+
+def test_scan_waits_for_panel_client_in_other_worker(make_store, tenant_id):
+    panel, scanner = make_store(), make_store()
+    panel_lease, scanner_lease = _session_lease(panel), _session_lease(scanner)
+    panel_lease.acquire(tenant_id)
+    assert scanner.try_start(tenant_id)
+
+    assert not scanner_lease.wait_idle(tenant_id)
+    # Panel client'ı boşta kalınca bırakır; tarama lease'i alındığından yeniden açılamaz
+    assert not panel_lease.renew(tenant_id)
+    panel_lease.release(tenant_id)
+    assert scanner_lease.wait_idle(tenant_id)
+    with pytest.raises(RuntimeError, match='Tarama çalışırken'):
+        panel_lease.acquire(tenant_id)
+
+def _start_scan(store, tenant_id, *lines):
+    store.try_start(tenant_id)
+    log = store.attach(tenant_id, FakeProcess())
+    _write_lines(store, tenant_id, log, *lines)
+    return log
+
+def _write_lines(store, tenant_id, log, *lines):
+    for line in lines:
+        log.append(line)
+    store._flush(tenant_id, store._runs[tenant_id])
+
+def test_owner_reads_its_own_log(make_store, tenant_id):
+    worker = make_store()
+    log = _start_scan(worker, tenant_id, 'satır')
+    assert worker.log(tenant_id) is log
+
+def test_waiting_reader_sees_new_lines_and_finish(make_store, tenant_id):
+    writer, reader = make_store(heartbeat=0), make_store()
+    log = _start_scan(writer, tenant_id, 'bir')
+    view = reader.log(tenant_id)
+    seq = view.last_seq
+
+    threading.Timer(0.1, _write_lines, (writer, tenant_id, log, 'iki')).start()
+    assert view.wait(seq, 2)
+    assert [line for _, line in view.since(seq)] == ['iki']
+
+    writer.finish(tenant_id)
+    assert _wait_until(lambda: view.wait(view.last_seq, 0.1) and view.finished)
+
+def test_readers_share_one_follower(make_store, tenant_id, monkeypatch):
+    writer, reader = make_store(), make_store()
+    _start_scan(writer, tenant_id, 'bir')
+    reads = []
+    read_state = reader._read_state
+    monkeypatch.setattr(reader, '_read_state', lambda tenant: reads.append(tenant) or read_state(tenant))
+
+    views = [reader.log(tenant_id) for _ in range(5)]
+    reads.clear()
+    threads = [threading.Thread(target=view.wait, args=(view.last_seq, 0.5)) for view in views]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Bağlantı başına değil, process'te tek izleyici okur (0.5 sn / 0.05 sn aralık)
+    assert len(reads) <= 15
+    assert len(reader._followers) == 1
+
+def test_redis_reader_is_woken_by_publish(engine, tenant_id):
+    client = FakeRedis()
+    writer = RedisScanStateStore(client, lease_ttl=5, heartbeat=0, flush_interval=60)
+    reader = RedisScanStateStore(client, lease_ttl=5, heartbeat=5, poll_interval=5)
+    log = _start_scan(writer, tenant_id, 'bir')
+    view = reader.log(tenant_id)
+    seq = view.last_seq
+
+    threading.Timer(0.1, _write_lines, (writer, tenant_id, log, 'iki')).start()
+    started = time.monotonic()
+    assert view.wait(seq, 3)
+    assert time.monotonic() - started < 1
+    assert [line for _, line in view.since(seq)] == ['iki']
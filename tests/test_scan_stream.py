@@ -0,0 +1,33 @@
+"""Tarama SSE stream'i: worker başına açık stream sınırı ve tarama yokken hemen kapanma"""
+
+import threading
+
+import pytest
+
+from conftest import make_user, login
+
+@pytest.fixture
+def admin(client, db, tenant_id):
+    login(client, make_user(db, 'admin', tenant_ids=[tenant_id]))
+    return client
+
+def test_stream_ends_when_no_scan_is_running(admin, tenant_id):
+    body = admin.get(f'/api/admin/{tenant_id}/scan/stream').get_data(as_text=True)
+    assert 'event: status' in body
+    assert '"running": false' in body
+
+def test_open_streams_are_capped(admin, web_panel, tenant_id, monkeypatch):
+    monkeypatch.setattr(web_panel, '_scan_stream_slots', threading.BoundedSemaphore(1))
+    url = f'/api/admin/{tenant_id}/scan/stream'
+
+    first = admin.get(url, buffered=False)
+    assert first.status_code == 200
+    refused = admin.get(url)
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After']
+
+    # Yanıt kapanınca (generator hiç okunmasa da) yer boşalır
+    first.close()
+    second = admin.get(url, buffered=False)
+    assert second.status_code == 200
+    second.close()
@@ -0,0 +1,50 @@
+"""Kelime/link istatistik API'leri: result_matches sorguları ve parametre doğrulaması"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import ResultMatch
+from conftest import make_user, login
+
+@pytest.fixture
+def admin(client, db, tenant_id):
+    login(client, make_user(db, 'admin', tenant_ids=[tenant_id]))
+    return client
+
+def _add_matches(db, tenant_id, terms, days_ago=1):
+    timestamp = datetime.utcnow() - timedelta(days=days_ago)
+    db.add_all([ResultMatch(result_id=i + 1, tenant_id=tenant_id, kind='keyword', term=term, timestamp=timestamp)
+                for i, term in enumerate(terms)])
+    db.commit()
+
+def test_top_terms(admin, db, tenant_id):
+    _add_matches(db, tenant_id, ['bonus', 'bonus', 'bet'])
+    _add_matches(db, tenant_id, ['eski'], days_ago=20)
+
+    data = admin.get(f'/api/admin/{tenant_id}/statistics/terms?days=7&limit=5').get_json()
+    assert data['terms'] == [{'term': 'bonus', 'count': 2}, {'term': 'bet', 'count': 1}]
+
+def test_term_timeseries(admin, db, tenant_id):
+    _add_matches(db, tenant_id, ['bonus', 'bonus'])
+
+    data = admin.get(f'/api/admin/{tenant_id}/statistics/terms/timeseries?term=bonus&days=3').get_json()
+    assert [point['count'] for point in data['series']] == [2]
+
+@pytest.mark.parametrize('query', [
+    'statistics/terms?days=abc',
+    'statistics/terms?limit=on',
+    'statistics/terms?days=0',
+    'statistics/terms?limit=-5',
+    'statistics/terms/timeseries?term=bonus&days=1.5',
+    'statistics/terms/timeseries?term=bonus&days=-1',
+])
+def test_invalid_numbers_are_rejected(admin, tenant_id, query):
+    response = admin.get(f'/api/admin/{tenant_id}/{query}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+def test_limit_is_capped(admin, db, tenant_id):
+    _add_matches(db, tenant_id, [f'kelime{i}' for i in range(120)])
+    data = admin.get(f'/api/admin/{tenant_id}/statistics/terms?limit=500').get_json()
+    assert len(data['terms']) == 100
@@ -0,0 +1,66 @@
+"""load_user cache'i: rol değişikliği ve silme bir sonraki request'te geçerli, last_login seyrek yazılır"""
+
+from sqlalchemy import update
+
+import auth
+from database import User
+from conftest import make_user, login
+
+USERS_API = '/api/super-admin/users'
+
+def _login_as(web_panel, user_id):
+    client = web_panel.app.test_client()
+    login(client, user_id)
+    return client
+
+def test_demoted_user_loses_super_admin_on_next_request(client, web_panel, db):
+    user_id = make_user(db, 'patron', role='super_admin')
+    login(client, user_id)
+    other = _login_as(web_panel, make_user(db, 'diger', role='super_admin'))
+    assert client.get(USERS_API).status_code == 200
+
+    assert other.put(f'{USERS_API}/{user_id}', json={'role': 'admin'}).get_json()['success']
+    assert client.get(USERS_API).status_code == 403
+
+def test_deleted_user_is_logged_out_on_next_request(client, web_panel, db, tenant_id):
+    user_id = make_user(db, 'uye', tenant_ids=[tenant_id])
+    login(client, user_id)
+    other = _login_as(web_panel, make_user(db, 'patron', role='super_admin'))
+    assert client.get(f'/api/admin/{tenant_id}/scan/status').status_code == 200
+
+    assert other.delete(f'{USERS_API}/{user_id}').get_json()['success']
+    response = client.get(f'/api/admin/{tenant_id}/scan/status')
+    assert response.status_code == 302
+    assert auth._user_cache.get(user_id) is None
+
+def test_role_change_in_other_worker(client, db):
+    user_id = make_user(db, 'patron', role='super_admin')
+    login(client, user_id)
+    assert client.get(USERS_API).status_code == 200
+
+    # Başka bir worker rolü değiştirip auth_version'ı artırdı (bu process'in cache'i temizlenmedi)
+    db.execute(update(User).where(User.id == user_id).values(role='admin', auth_version=User.auth_version + 1))
+    db.commit()
+    assert client.get(USERS_API).status_code == 403
+
+def test_cached_user_is_reused_while_version_is_unchanged(client, db):
+    user_id = make_user(db, 'patron', role='super_admin')
+    login(client, user_id)
+    client.get(USERS_API)
+    cached = auth._user_cache.get(user_id)
+
+    client.get(USERS_API)
+    assert auth._user_cache.get(user_id) is cached
+
+def test_last_login_is_written_once_per_interval(client, db):
+    user_id = make_user(db, 'patron', role='super_admin')
+    login(client, user_id)
+    client.get(USERS_API)
+    db.expire_all()
+    assert db.get(User, user_id).last_login is not None
+
+    db.execute(update(User).where(User.id == user_id).values(last_login=None))
+    db.commit()
+    client.get(USERS_API)
+    db.expire_all()
+    assert db.get(User, user_id).last_login is None
@@ -5,15 +5,39 @@ Belirli gruplarda kullanıcı adı, link ve bahsedilme durumunu izler
 """
 
 import asyncio
+import hashlib
+import json
 import re
+import signal
 import sys
 import io
 import os
 from datetime import datetime, timedelta, timezone
 from telethon import TelegramClient, events
+from telethon.errors import FloodWaitError
 from telethon.tl.types import MessageEntityMention, MessageEntityUrl
-from database import SessionLocal, Tenant, TenantConfig, Result, MessageStatistics
+from sqlalchemy import event
+from database import SessionLocal, Tenant, TenantConfig, Result, ScanCheckpoint
 from tenant_manager import get_tenant_config
+from keyword_matcher import KeywordMatcher
+from result_writer import ResultWriter, DailyStatsAggregator
+from cache_utils import TTLCache
+from rate_limiter import FloodWaitLimiter
+from scan_state import start_lease_heartbeat
+
+# İstatistik modu:
+#   'message' -> sadece taranan mesaj nesnesinden (ek istek yok)
+#   'batch'   -> taranan mesajdan + grup sonunda 100'lük get_messages ile yenileme
+#   'inline'  -> her eşleşmede ayrı get_messages (eski davranış)
+STATS_REFRESH_MODE = os.environ.get('STATS_REFRESH_MODE', 'batch')
+STATS_REFRESH_BATCH_SIZE = 100
+
+# Grup adı cache süresi (saniye); get_entity hatası kısa süre cache'lenir
+ENTITY_CACHE_TTL = int(os.environ.get('ENTITY_CACHE_TTL', 6 * 3600))
+ENTITY_CACHE_ERROR_TTL = 60
+
+# Aynı anda taranacak grup sayısı (tek TelegramClient paylaşılır)
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', 3))
 
 # Windows terminal encoding sorununu düzelt
 if sys.platform == 'win32':
@@ -27,9 +51,27 @@ if sys.platform == 'win32':
     except:
         pass
 
+def _naive_utc(value):
+    """Aware datetime'ı database'e yazmak için naive UTC'ye çevir"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _aware_utc(value):
+    """Database'den okunan naive UTC datetime'ı aware yap"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+def match_config_hash(keywords, links):
+    """Eşleşmeyi belirleyen ayarların özeti (checkpoint'ler bu ayarlarla taranan aralığı kapsar)"""
+    data = json.dumps({'keywords': sorted(set(keywords)), 'links': sorted(set(links))}, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
 class TelegramMonitorTenant:
-    def __init__(self, tenant_id):
+    def __init__(self, tenant_id, full_scan=False):
         self.tenant_id = tenant_id
+        self.full_scan = full_scan
         self.db = SessionLocal()
         
         # Tenant bilgilerini al
@@ -59,12 +101,48 @@ class TelegramMonitorTenant:
         
         session_path = self.config.session_file_path or f'tenants/{self.tenant_slug}/session.session'
         self.client = TelegramClient(session_path.replace('.session', ''), api_id, api_hash)
+        self.rate_limiter = FloodWaitLimiter()
+        self.scan_workers = SCAN_WORKERS
         
         # Arama ayarları
         self.keywords_lower = [kw.lower().strip() for kw in (self.config.search_keywords or []) if kw and kw.strip()]
         self.links_lower = [link.lower().strip() for link in (self.config.search_links or []) if link and link.strip()]
         
-        self.results = []
+        # Eşleştiricileri config başına bir kez derle
+        self.keyword_matcher = KeywordMatcher(self.keywords_lower)
+        self.link_matcher = KeywordMatcher(self.links_lower)
+        self.config_hash = match_config_hash(self.keywords_lower, self.links_lower)
+        
+        # Günlük istatistikler bellekte toplanır, grup sonunda gün başına tek upsert
+        self.daily_stats = DailyStatsAggregator(self.db, tenant_id)
+        # Sonuçlar toplu olarak upsert edilir (her eşleşmede commit yok); sadece yeni
+        # mesajlar günlük istatistiklere eklenir, tekrar taranan mesajlar sayılmaz
+        self.result_writer = ResultWriter(self.db, tenant_id, daily_stats=self.daily_stats)
+        # Taramanın toplam commit sayısı (sonuçlar, günlük istatistikler, checkpoint'ler, grup adları)
+        self.commit_count = 0
+        event.listen(self.db, 'after_commit', self._count_commit)
+        
+        # İstatistik yenileme: {group_id: {message_id: (tarih, stats)}}
+        self.stats_refresh_mode = STATS_REFRESH_MODE
+        self.pending_stats_refresh = {}
+        self.total_matches = 0
+        self.stats_requests = 0
+        
+        # Grup adı cache'i (chat_id -> isim); config'te kayıtlı isimlerle ısıtılır
+        self.group_names = TTLCache(ENTITY_CACHE_TTL)
+        # Adı alınamayan gruplar (chat_id yedek isim olarak döner, config'e yazılmaz)
+        self.group_name_fallbacks = TTLCache(ENTITY_CACHE_TTL)
+        self.entity_requests = 0
+        for group_info in (self.config.group_ids or []):
+            if isinstance(group_info, dict) and group_info.get('id') and group_info.get('name'):
+                self.group_names.set(group_info['id'], group_info['name'])
+        
+        # Grup başına kaldığı yer (group_id -> ScanCheckpoint); --full ile yok sayılır
+        self.checkpoints = {
+            checkpoint.group_id: checkpoint
+            for checkpoint in self.db.query(ScanCheckpoint).filter_by(tenant_id=tenant_id).all()
+        }
+        self.incremental_groups = 0
         
         # Debug
         if self.keywords_lower:
@@ -97,11 +175,25 @@ class TelegramMonitorTenant:
         
         scan_range = self.config.scan_time_range or '7days'
         print(f"\n[TARAMA] Gecmis mesajlar taranıyor ({scan_range})...")
-        await self.scan_history_messages()
+        try:
+            await self.scan_history_messages()
+        finally:
+            self.close()
         
         print("\n[OK] Tarama tamamlandi! Bot kapatiliyor...")
         await self.client.disconnect()
+    
+    def close(self):
+        """Bekleyen sonuçları yaz ve database bağlantısını kapat"""
+        if self.db is None:
+            return
+        self.result_writer.close()
+        try:
+            self.daily_stats.flush()
+        except Exception as e:
+            print(f"[UYARI] Günlük istatistikler yazılamadı: {e}")
         self.db.close()
+        self.db = None
     
     async def list_groups(self):
         """Katıldığınız grupları listele"""
@@ -117,10 +209,16 @@ class TelegramMonitorTenant:
                     'unread': dialog.unread_count
                 })
                 print(f"ID: {dialog.id} | İsim: {dialog.name}")
+                # Dialog listesi zaten elimizde: grup adı cache'ini doldur
+                if dialog.name:
+                    self.group_names.set(dialog.id, dialog.name)
         
         print("-" * 50)
         print(f"\nToplam {len(groups)} grup bulundu.")
         
+        # Güncel isimleri config'e yaz (sonraki taramalar sıcak cache ile başlar)
+        self.persist_group_names()
+        
         group_ids = self.config.group_ids or []
         if not group_ids:
             print("\n[UYARI] GROUP_IDS bos! Hicbir grup izlenmeyecek.")
@@ -149,8 +247,8 @@ class TelegramMonitorTenant:
         else:
             return now - timedelta(days=7)
     
-    async def get_message_statistics(self, message):
-        """Mesaj istatistiklerini al (görüntülenme, paylaşım, reaksiyonlar)"""
+    def extract_message_statistics(self, message):
+        """Mesaj nesnesindeki istatistikleri oku (görüntülenme, paylaşım, reaksiyonlar) - ağ isteği yok"""
         stats = {
             'views_count': 0,
             'forwards_count': 0,
@@ -185,10 +283,21 @@ class TelegramMonitorTenant:
                     
                     stats['reactions_count'] = total_reactions
                     stats['reactions_detail'] = reactions_detail
-            
-            # Eğer mesaj entity'si varsa, detaylı bilgi al
+        except Exception as e:
+            print(f"[UYARI] İstatistik alma hatası: {e}")
+        
+        return stats
+    
+    async def get_message_statistics(self, message):
+        """Mesaj istatistiklerini al ('inline' modda mesajı tekrar çekerek)"""
+        stats = self.extract_message_statistics(message)
+        
+        if self.stats_refresh_mode == 'inline':
             try:
-                full_message = await self.client.get_messages(message.peer_id, ids=message.id)
+                self.stats_requests += 1
+                full_message = await self.rate_limiter.call(
+                    lambda: self.client.get_messages(message.peer_id, ids=message.id)
+                )
                 if full_message:
                     if hasattr(full_message, 'views'):
                         stats['views_count'] = full_message.views or 0
@@ -196,12 +305,40 @@ class TelegramMonitorTenant:
                         stats['forwards_count'] = full_message.forwards or 0
             except:
                 pass
-                
-        except Exception as e:
-            print(f"[UYARI] İstatistik alma hatası: {e}")
         
         return stats
     
+    async def refresh_group_statistics(self, group_id):
+        """Grubun eşleşen mesajlarının istatistiklerini 100'lük get_messages çağrılarıyla yenile"""
+        pending = self.pending_stats_refresh.pop(group_id, None)
+        if not pending:
+            return
+        
+        message_ids = list(pending)
+        for i in range(0, len(message_ids), STATS_REFRESH_BATCH_SIZE):
+            chunk = message_ids[i:i + STATS_REFRESH_BATCH_SIZE]
+            try:
+                self.stats_requests += 1
+                messages = await self.rate_limiter.call(lambda: self.client.get_messages(group_id, ids=chunk))
+            except Exception as e:
+                print(f"    [UYARI] İstatistik yenileme hatası ({len(chunk)} mesaj): {e}")
+                continue
+            
+            for fresh_message in messages or []:
+                if fresh_message is None or fresh_message.id not in pending:
+                    continue
+                message_date, old_stats = pending[fresh_message.id]
+                fresh_stats = self.extract_message_statistics(fresh_message)
+                if self.result_writer.refresh_counters(group_id, fresh_message.id, fresh_stats):
+                    # Buffer'daki satır: istatistiklere flush'ta güncel değerle eklenecek
+                    continue
+                self.daily_stats.adjust(
+                    message_date,
+                    fresh_stats['views_count'] - old_stats['views_count'],
+                    fresh_stats['forwards_count'] - old_stats['forwards_count'],
+                    fresh_stats['reactions_count'] - old_stats['reactions_count']
+                )
+    
     async def analyze_message(self, message, chat_id):
         """Mesajı analiz et ve sonuçları kaydet"""
         try:
@@ -215,27 +352,19 @@ class TelegramMonitorTenant:
             
             message_text_lower = message_text.lower()
             
-            found_keywords = []
-            found_links = []
-            
-            # Anahtar kelimeleri ara
-            for keyword in self.keywords_lower:
-                if keyword and keyword in message_text_lower:
-                    found_keywords.append(keyword)
+            # Anahtar kelimeleri ara (tek geçiş)
+            found_keywords = self.keyword_matcher.find_all(message_text_lower)
             
-            # Linkleri ara
-            for link in self.links_lower:
-                if link and link in message_text_lower:
-                    found_links.append(link)
+            # Linkleri ara (tek geçiş)
+            found_links = self.link_matcher.find_all(message_text_lower)
             
             # Mesajdaki tüm linkleri çıkar
-            if message.entities:
+            if message.entities and self.link_matcher:
                 for entity in message.entities:
                     if isinstance(entity, MessageEntityUrl):
                         url = message_text[entity.offset:entity.offset + entity.length]
-                        for search_link in self.links_lower:
-                            if search_link and search_link in url.lower():
-                                found_links.append(url)
+                        for _ in self.link_matcher.find_all(url.lower()):
+                            found_links.append(url)
             
             # Eğer bir şey bulunduysa kaydet
             if found_keywords or found_links:
@@ -244,34 +373,34 @@ class TelegramMonitorTenant:
                 # İstatistikleri al
                 stats = await self.get_message_statistics(message)
                 
-                # Database'e kaydet
-                result = Result(
-                    tenant_id=self.tenant_id,
-                    timestamp=message_date,
-                    group_id=chat_id,
-                    group_name=await self.get_group_name(chat_id),
-                    message_id=message.id,
-                    sender_id=message.sender_id if hasattr(message, 'sender_id') else None,
-                    message_text=message_text,
-                    found_keywords=found_keywords,
-                    found_links=found_links,
-                    message_link=f"https://t.me/c/{str(chat_id).replace('-100', '')}/{message.id}",
-                    views_count=stats['views_count'],
-                    forwards_count=stats['forwards_count'],
-                    reactions_count=stats['reactions_count'],
-                    reactions_detail=stats['reactions_detail'],
-                    replies_count=stats['replies_count']
-                )
-                
-                self.db.add(result)
-                self.db.commit()
+                # Database'e kaydet (buffer'a ekle, toplu yazılır)
+                row = {
+                    'tenant_id': self.tenant_id,
+                    'timestamp': message_date,
+                    'group_id': chat_id,
+                    'group_name': await self.get_group_name(chat_id),
+                    'message_id': message.id,
+                    'sender_id': message.sender_id if hasattr(message, 'sender_id') else None,
+                    'message_text': message_text,
+                    'found_keywords': found_keywords,
+                    'found_links': found_links,
+                    'message_link': f"https://t.me/c/{str(chat_id).replace('-100', '')}/{message.id}",
+                    'views_count': stats['views_count'],
+                    'forwards_count': stats['forwards_count'],
+                    'reactions_count': stats['reactions_count'],
+                    'reactions_detail': stats['reactions_detail'],
+                    'replies_count': stats['replies_count']
+                }
+                self.result_writer.add(row)
+                result = Result(**row)
                 
                 # Dosyaya da kaydet (eski format uyumluluğu için)
                 await self.save_result_to_file(result, stats)
                 await self.print_result(result, stats)
                 
-                # Günlük istatistikleri güncelle
-                await self.update_daily_statistics(message_date.date(), found_keywords, found_links, stats)
+                self.total_matches += 1
+                if self.stats_refresh_mode == 'batch':
+                    self.pending_stats_refresh.setdefault(chat_id, {})[message.id] = (message_date.date(), stats)
                 
                 return True
             return False
@@ -281,58 +410,82 @@ class TelegramMonitorTenant:
             traceback.print_exc()
             return False
     
-    async def update_daily_statistics(self, date, found_keywords, found_links, stats):
-        """Günlük istatistikleri güncelle"""
+    def _count_commit(self, session):
+        """self.db üzerindeki her commit'i say (after_commit event'i)"""
+        self.commit_count += 1
+    
+    def flush_pending(self):
+        """Bekleyen sonuçları ve günlük istatistikleri yaz (hepsi yazıldıysa True)"""
+        success = True
         try:
-            # Tarihi datetime'a çevir
-            date_start = datetime.combine(date, datetime.min.time()).replace(tzinfo=timezone.utc)
-            
-            # Mevcut istatistiği al veya oluştur
-            daily_stat = self.db.query(MessageStatistics).filter_by(
-                tenant_id=self.tenant_id,
-                date=date_start
-            ).first()
-            
-            if not daily_stat:
-                daily_stat = MessageStatistics(
-                    tenant_id=self.tenant_id,
-                    date=date_start,
-                    total_messages=0,
-                    total_matches=1,
-                    total_views=stats['views_count'],
-                    total_forwards=stats['forwards_count'],
-                    total_reactions=stats['reactions_count'],
-                    keyword_stats={},
-                    link_stats={}
-                )
-                self.db.add(daily_stat)
-            else:
-                daily_stat.total_matches += 1
-                daily_stat.total_views += stats['views_count']
-                daily_stat.total_forwards += stats['forwards_count']
-                daily_stat.total_reactions += stats['reactions_count']
-            
-            # Kelime istatistiklerini güncelle
-            keyword_stats = daily_stat.keyword_stats or {}
-            for keyword in found_keywords:
-                keyword_stats[keyword] = keyword_stats.get(keyword, 0) + 1
-            
-            # Link istatistiklerini güncelle
-            link_stats = daily_stat.link_stats or {}
-            for link in found_links:
-                link_stats[link] = link_stats.get(link, 0) + 1
-            
-            daily_stat.keyword_stats = keyword_stats
-            daily_stat.link_stats = link_stats
-            daily_stat.updated_at = datetime.utcnow()
-            
+            self.result_writer.flush()
+        except Exception as e:
+            success = False
+            print(f"  [HATA] Sonuçlar yazılamadı ({self.result_writer.pending} bekliyor): {e}")
+        try:
+            self.daily_stats.flush()
+        except Exception as e:
+            success = False
+            print(f"  [UYARI] İstatistik güncelleme hatası: {e}")
+        return success
+    
+    def get_checkpoint(self, group_id, any_config=False):
+        """Grubun kayıtlı checkpoint'ini al (kelime/link ayarları değiştiyse None; any_config=True ile yine de döner)"""
+        try:
+            checkpoint = self.checkpoints.get(int(group_id))
+        except (TypeError, ValueError):
+            return None
+        if checkpoint is not None and not any_config and checkpoint.config_hash != self.config_hash:
+            return None
+        return checkpoint
+    
+    def get_min_id(self, group_id, scan_start_date):
+        """Checkpoint taranan aralığı kapsıyorsa sadece daha yeni mesajları iste (min_id)"""
+        if self.full_scan:
+            return 0
+        checkpoint = self.get_checkpoint(group_id)
+        if not checkpoint or not checkpoint.last_message_id or not checkpoint.covered_from:
+            return 0
+        # Checkpoint daha geç bir tarihten başlıyorsa aradaki boşluk taranmamıştır
+        if _aware_utc(checkpoint.covered_from) > scan_start_date:
+            return 0
+        return checkpoint.last_message_id
+    
+    def save_checkpoint(self, group_id, covered_from, covered_to, last_message_id, last_message_date):
+        """Grup tamamen tarandıktan ve sonuçlar yazıldıktan sonra checkpoint'i ilerlet"""
+        checkpoint = self.get_checkpoint(group_id)
+        
+        # Eski kapsanan aralık bu taramayla birleşiyorsa daha yüksek mesajı ve erken başlangıcı koru
+        if checkpoint and checkpoint.covered_from and _aware_utc(checkpoint.covered_from) <= covered_to:
+            if checkpoint.last_message_id and (last_message_id is None or checkpoint.last_message_id >= last_message_id):
+                last_message_id = checkpoint.last_message_id
+                last_message_date = _aware_utc(checkpoint.last_message_date)
+            covered_from = min(covered_from, _aware_utc(checkpoint.covered_from))
+        
+        if last_message_id is None:
+            # Hiç mesaj işlenmedi ve önceki kayıt yok: min_id olarak kullanılacak bir şey yok
+            return
+        
+        try:
+            if checkpoint is None:
+                # Eski ayarlarla kaydedilmiş satır varsa üzerine yaz
+                checkpoint = self.get_checkpoint(group_id, any_config=True)
+            if checkpoint is None:
+                checkpoint = ScanCheckpoint(tenant_id=self.tenant_id, group_id=int(group_id))
+                self.db.add(checkpoint)
+                self.checkpoints[checkpoint.group_id] = checkpoint
+            checkpoint.config_hash = self.config_hash
+            checkpoint.last_message_id = last_message_id
+            checkpoint.last_message_date = _naive_utc(last_message_date)
+            checkpoint.covered_from = _naive_utc(covered_from)
+            checkpoint.updated_at = datetime.utcnow()
             self.db.commit()
         except Exception as e:
-            print(f"[UYARI] İstatistik güncelleme hatası: {e}")
+            print(f"  [UYARI] {group_id} için checkpoint kaydedilemedi: {e}")
             self.db.rollback()
     
     async def scan_history_messages(self):
-        """Geçmiş mesajları tara"""
+        """Geçmiş mesajları tara (gruplar eşzamanlı worker'larla taranır)"""
         try:
             groups_to_scan = self.config.group_ids or []
             
@@ -340,104 +493,223 @@ class TelegramMonitorTenant:
                 print("⚠️  Grup seçilmedi!")
                 return
             
-            print(f"📜 {len(groups_to_scan)} seçili grupta geçmiş mesajlar taranıyor...")
+            worker_count = max(1, min(self.scan_workers, len(groups_to_scan)))
+            print(f"📜 {len(groups_to_scan)} seçili grupta geçmiş mesajlar taranıyor... ({worker_count} worker)")
             
+            queue = asyncio.Queue()
             for group_info in groups_to_scan:
+                queue.put_nowait(group_info)
+            
+            # Tarama boyunca FloodWait'i client kendi içinde uyuyarak değil, ortak limiter ile yönet
+            flood_sleep_threshold = self.client.flood_sleep_threshold
+            self.client.flood_sleep_threshold = 0
+            
+            async def worker():
+                while True:
+                    try:
+                        group_info = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await self.scan_group(group_info)
+            
+            try:
+                await asyncio.gather(*(worker() for _ in range(worker_count)))
+            finally:
+                self.client.flood_sleep_threshold = flood_sleep_threshold
+            
+            # Tarama sırasında get_entity ile öğrenilen isimleri de kaydet
+            self.persist_group_names()
+            
+            saved_requests = max(self.total_matches - self.stats_requests, 0)
+            print(f"[TAMAMLANDI] Gecmis mesaj taramasi tamamlandi! {self.result_writer.rows_written} sonuc bulundu. "
+                  f"(istatistik modu: {self.stats_refresh_mode}, {self.stats_requests} istek, {saved_requests} istek tasarruf edildi, "
+                  f"{self.entity_requests} get_entity isteği, {self.rate_limiter.flood_waits} FloodWait)\n")
+            print(f"[DB] {self.result_writer.rows_written} yeni sonuç {self.result_writer.commit_count} commit ile yazıldı, "
+                  f"{self.result_writer.rows_updated} kayıtlı sonucun sayaçları güncellendi; "
+                  f"tarama toplamı {self.commit_count} commit (istatistik, checkpoint ve grup adları dahil)")
+            if self.incremental_groups:
+                print(f"[CHECKPOINT] {self.incremental_groups} grup sadece son taramadan sonraki mesajlar için tarandı")
+        except Exception as e:
+            print(f"[HATA] Gecmis mesaj tarama hatasi: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    async def scan_group(self, group_info):
+        """Tek bir grubun geçmiş mesajlarını tara"""
+        completed = False
+        try:
+            if isinstance(group_info, dict):
+                group_id = group_info.get('id')
+                start_date_str = group_info.get('startDate')
+                end_date_str = group_info.get('endDate')
+            else:
+                group_id = group_info
+                start_date_str = None
+                end_date_str = None
+            
+            if not group_id:
+                return
+            
+            # Tarih aralığını parse et
+            scan_start_date = None
+            scan_end_date = None
+            
+            if start_date_str:
                 try:
-                    if isinstance(group_info, dict):
-                        group_id = group_info.get('id')
-                        start_date_str = group_info.get('startDate')
-                        end_date_str = group_info.get('endDate')
-                    else:
-                        group_id = group_info
-                        start_date_str = None
-                        end_date_str = None
-                    
-                    if not group_id:
-                        continue
-                    
-                    # Tarih aralığını parse et
-                    scan_start_date = None
-                    scan_end_date = None
-                    
-                    if start_date_str:
-                        try:
-                            scan_start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-                            scan_start_date = scan_start_date.replace(tzinfo=timezone.utc)
-                        except:
-                            pass
-                    
-                    if end_date_str:
-                        try:
-                            scan_end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-                            scan_end_date = scan_end_date.replace(hour=23, minute=59, second=59, tzinfo=timezone.utc)
-                        except:
-                            pass
-                    
-                    if not scan_start_date:
-                        scan_start_date = self.get_scan_date()
-                        if scan_start_date.tzinfo is None:
-                            scan_start_date = scan_start_date.replace(tzinfo=timezone.utc)
-                    
-                    if not scan_end_date:
-                        scan_end_date = datetime.now(timezone.utc)
-                    
-                    now = datetime.now(timezone.utc)
-                    if scan_start_date > now:
-                        print(f"  [UYARI] {group_id} için başlangıç tarihi gelecekte!")
-                        continue
-                    
-                    if scan_end_date > now:
-                        scan_end_date = now
-                    
-                    group_name = await self.get_group_name(group_id)
-                    date_range = f"{scan_start_date.strftime('%Y-%m-%d')} - {scan_end_date.strftime('%Y-%m-%d')}"
-                    print(f"  [TARAMA] {group_name} taranıyor... (Tarih: {date_range})")
-                    
-                    message_count = 0
-                    match_count = 0
-                    
+                    scan_start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+                    scan_start_date = scan_start_date.replace(tzinfo=timezone.utc)
+                except:
+                    pass
+            
+            if end_date_str:
+                try:
+                    scan_end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+                    scan_end_date = scan_end_date.replace(hour=23, minute=59, second=59, tzinfo=timezone.utc)
+                except:
+                    pass
+            
+            if not scan_start_date:
+                scan_start_date = self.get_scan_date()
+                if scan_start_date.tzinfo is None:
+                    scan_start_date = scan_start_date.replace(tzinfo=timezone.utc)
+            
+            if not scan_end_date:
+                scan_end_date = datetime.now(timezone.utc)
+            
+            now = datetime.now(timezone.utc)
+            if scan_start_date > now:
+                print(f"  [UYARI] {group_id} için başlangıç tarihi gelecekte!")
+                return
+            
+            if scan_end_date > now:
+                scan_end_date = now
+            
+            group_name = await self.get_group_name(group_id)
+            date_range = f"{scan_start_date.strftime('%Y-%m-%d')} - {scan_end_date.strftime('%Y-%m-%d')}"
+            
+            # Daha önce taranan mesajları tekrar okuma: sadece checkpoint'ten yenileri
+            min_id = self.get_min_id(group_id, scan_start_date)
+            if min_id:
+                self.incremental_groups += 1
+                print(f"  [TARAMA] {group_name} taranıyor... (Tarih: {date_range}, mesaj ID > {min_id})")
+            else:
+                print(f"  [TARAMA] {group_name} taranıyor... (Tarih: {date_range})")
+            
+            message_count = 0
+            match_count = 0
+            offset_id = 0
+            last_message_id = None
+            last_message_date = None
+            
+            # FloodWait gelirse ortak limiter'da bekle ve son işlenen mesajdan devam et
+            while True:
+                try:
+                    await self.rate_limiter.wait()
                     async for message in self.client.iter_messages(
                         group_id, 
                         offset_date=scan_end_date,
+                        offset_id=offset_id,
+                        min_id=min_id,
                         reverse=False
                     ):
                         if scan_start_date and message.date < scan_start_date:
                             break
                         
+                        offset_id = message.id
+                        
                         if scan_end_date and message.date > scan_end_date:
                             continue
                         
                         message_count += 1
+                        if last_message_id is None or message.id > last_message_id:
+                            last_message_id = message.id
+                            last_message_date = message.date
+                        self.result_writer.maybe_flush()
                         
                         match_found = await self.analyze_message(message, group_id)
                         if match_found:
                             match_count += 1
                         
                         if message_count % 50 == 0:
-                            print(f"    [ILERLEME] {message_count} mesaj taranıyor... ({match_count} eşleşme)")
-                    
-                    print(f"    [TAMAMLANDI] {group_name}: {message_count} mesaj tarandı, {match_count} eşleşme bulundu")
+                            print(f"    [ILERLEME] {group_name}: {message_count} mesaj taranıyor... ({match_count} eşleşme)")
                         
-                except Exception as e:
-                    print(f"  [HATA] {group_info} grubunda hata: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    continue
+                        # Sayfa boyutunda bir limiter'a uğra (başka worker FloodWait aldıysa bekle)
+                        if message_count % 100 == 0:
+                            await self.rate_limiter.wait()
+                    break
+                except FloodWaitError as e:
+                    self.rate_limiter.pause(e.seconds + 1)
             
-            print(f"[TAMAMLANDI] Gecmis mesaj taramasi tamamlandi! {len(self.results)} sonuc bulundu.\n")
+            print(f"    [TAMAMLANDI] {group_name}: {message_count} mesaj tarandı, {match_count} eşleşme bulundu")
+            
+            # İstatistikleri toplu yenile (grup başına 100'lük get_messages)
+            await self.refresh_group_statistics(group_id)
+            completed = True
+                
         except Exception as e:
-            print(f"[HATA] Gecmis mesaj tarama hatasi: {e}")
+            print(f"  [HATA] {group_info} grubunda hata: {e}")
             import traceback
             traceback.print_exc()
+        finally:
+            # Grup bitti (veya hata aldı): toplanan sonuçları ve istatistikleri yaz
+            flushed = self.flush_pending()
+            # Checkpoint sadece grup tamamlanıp her şey yazıldıysa ilerler (yarım taramada kayıp olmaz)
+            if completed and flushed:
+                self.save_checkpoint(group_id, scan_start_date, scan_end_date, last_message_id, last_message_date)
     
     async def get_group_name(self, chat_id):
-        """Grup adını al"""
+        """Grup adını al (önce cache, yoksa get_entity)"""
+        cached = self.group_names.get(chat_id)
+        if cached is None:
+            cached = self.group_name_fallbacks.get(chat_id)
+        if cached is not None:
+            return cached
+        
         try:
-            entity = await self.client.get_entity(chat_id)
-            return entity.title if hasattr(entity, 'title') else str(chat_id)
+            self.entity_requests += 1
+            entity = await self.rate_limiter.call(lambda: self.client.get_entity(chat_id))
         except:
+            # Hatalı id için her mesajda tekrar denememek adına kısa süre cache'le
+            self.group_name_fallbacks.set(chat_id, str(chat_id), ttl=ENTITY_CACHE_ERROR_TTL)
+            return str(chat_id)
+        
+        if not getattr(entity, 'title', None):
+            self.group_name_fallbacks.set(chat_id, str(chat_id))
             return str(chat_id)
+        self.group_names.set(chat_id, entity.title)
+        return entity.title
+    
+    def persist_group_names(self):
+        """Cache'teki grup adlarını TenantConfig.group_ids'e kaydet (yedek chat_id isimleri hariç)"""
+        try:
+            # Tarama sırasında panelden yapılan değişiklikleri ezmemek için güncel listeyi oku
+            self.db.refresh(self.config)
+            group_ids = self.config.group_ids or []
+            
+            updated = []
+            changed = False
+            for group_info in group_ids:
+                if isinstance(group_info, dict):
+                    group_id = group_info.get('id')
+                    name = self.group_names.get(group_id) if group_id else None
+                    if name and group_info.get('name') != name:
+                        group_info = dict(group_info, name=name)
+                        changed = True
+                else:
+                    name = self.group_names.get(group_info)
+                    if name:
+                        group_info = {'id': group_info, 'name': name}
+                        changed = True
+                updated.append(group_info)
+            
+            if changed:
+                # JSON kolonu: değişikliğin algılanması için yeni liste ata
+                self.config.group_ids = updated
+                self.db.commit()
+                print("[OK] Grup adları config'e kaydedildi.")
+        except Exception as e:
+            print(f"[UYARI] Grup adları kaydedilemedi: {e}")
+            self.db.rollback()
     
     async def save_result_to_file(self, result, stats):
         """Sonucu dosyaya kaydet (eski format uyumluluğu)"""
@@ -481,25 +753,41 @@ class TelegramMonitorTenant:
         print(f"[LINK] {result.message_link}")
         print("=" * 60 + "\n")
 
-async def main(tenant_id):
+async def main(tenant_id, full_scan=False):
     """Ana fonksiyon"""
+    monitor = None
+    # Panelden başlatıldıysa lease'i bot yeniler; lease başka process'e geçerse SIGTERM ile düzgün kapan
+    lease = start_lease_heartbeat(tenant_id, on_lost=lambda: os.kill(os.getpid(), signal.SIGTERM))
     try:
-        monitor = TelegramMonitorTenant(tenant_id)
+        monitor = TelegramMonitorTenant(tenant_id, full_scan=full_scan)
         await monitor.start()
     except Exception as e:
         print(f"❌ Hata: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if lease:
+            lease.set()
+        # Kapanışta (hata/iptal dahil) bekleyen sonuçları yaz
+        if monitor:
+            monitor.close()
+
+def _handle_sigterm(signum, frame):
+    """SIGTERM'i KeyboardInterrupt'a çevir (finally blokları çalışsın)"""
+    raise KeyboardInterrupt()
 
 if __name__ == '__main__':
     import sys
     if len(sys.argv) < 2:
-        print("Kullanım: python tg_monitor_tenant.py <tenant_id>")
+        print("Kullanım: python tg_monitor_tenant.py <tenant_id> [--full]")
         sys.exit(1)
     
     tenant_id = int(sys.argv[1])
+    # --full: checkpoint'leri yok say, tüm tarih aralığını yeniden tara
+    full_scan = '--full' in sys.argv[2:]
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     try:
-        asyncio.run(main(tenant_id))
+        asyncio.run(main(tenant_id, full_scan=full_scan))
     except KeyboardInterrupt:
         print("\n\n⏹️  Bot durduruldu.")
     except Exception as e:
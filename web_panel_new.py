@@ -3,37 +3,61 @@ Telegram Monitoring Bot - Web Panel (Multi-Tenant)
 Flask tabanlı web arayüzü - Çoklu grup desteği
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for, session, Response, stream_with_context, g
 from flask_cors import CORS
 from flask_login import login_user, logout_user, login_required, current_user
+from werkzeug.exceptions import HTTPException
 import asyncio
+import base64
+import binascii
 import json
 import os
 import subprocess
+import tempfile
 import threading
 import logging
+import logging.handlers
+import atexit
+import queue
+import random
+import time
 import traceback
 from datetime import datetime, timedelta
 from telethon import TelegramClient
-from database import init_db, create_super_admin, SessionLocal, User, Tenant, TenantConfig, Result, MessageStatistics, UserTenant
-from auth import login_manager, verify_password, require_super_admin, require_tenant_access
+from sqlalchemy import func, text, case, tuple_
+from database import init_db, create_super_admin, SessionLocal, User, Tenant, TenantConfig, Result, ResultMatch, MessageStatistics, UserTenant, ScanCheckpoint, result_search_clause, MATCH_KINDS
+from auth import login_manager, verify_password, require_super_admin, require_tenant_access, invalidate_user, invalidate_tenant_access
+from telegram_pool import telegram_pool
+from dialog_index import DialogIndex
+from cache_utils import TTLCache
+from scan_state import create_scan_state_store, TelegramSessionLease, SCAN_STATE_OWNER_ENV
 from tenant_manager import (
     create_tenant, get_tenant, get_tenant_by_slug, get_user_tenants,
     update_tenant, delete_tenant, get_tenant_config, update_tenant_config,
     add_user_to_tenant, remove_user_from_tenant, get_tenant_users
 )
 
-# Logging yapılandırması
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('app.log', encoding='utf-8')
-    ]
-)
+# Logging yapılandırması: request thread'i sadece kuyruğa yazar, konsol/dosya yazımı arka plan thread'inde
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+_log_queue = queue.Queue(-1)
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_handlers = [logging.StreamHandler(), logging.FileHandler('app.log', encoding='utf-8')]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+log_listener = logging.handlers.QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # Asıl format listener'daki handler'larda
+logging.basicConfig(level=LOG_LEVEL, handlers=[_queue_handler])
 logger = logging.getLogger(__name__)
 
+# Access log: request başına tek satır (JSON). Başarılı ve hızlı request'lerin sadece bir kısmı yazılır,
+# hatalı (>= 400) ve yavaş request'ler her zaman yazılır
+access_logger = logging.getLogger('access')
+ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', 0.1))
+ACCESS_LOG_SLOW_MS = float(os.environ.get('ACCESS_LOG_SLOW_MS', 1000))
+
 app = Flask(__name__, static_folder='.')
 app.secret_key = os.environ.get('SECRET_KEY', 'padisah-telegram-monitoring-secret-key-change-in-production')
 CORS(app)
@@ -41,31 +65,49 @@ CORS(app)
 # Request logging middleware
 @app.before_request
 def log_request_info():
-    """Her request'i logla"""
+    """Request başlangıç zamanını kaydet; header/body sadece DEBUG seviyesinde loglanır"""
+    g.request_started = time.perf_counter()
+    if not access_logger.isEnabledFor(logging.DEBUG):
+        return
     try:
-        logger.info(f"🔵 REQUEST: {request.method} {request.path}")
-        logger.info(f"   Headers: {dict(request.headers)}")
+        details = {'method': request.method, 'path': request.path, 'headers': dict(request.headers)}
         if request.is_json:
-            try:
-                logger.info(f"   JSON Body: {json.dumps(request.json, indent=2, ensure_ascii=False)}")
-            except:
-                logger.info(f"   JSON Body: (parse edilemedi)")
+            details['json'] = request.get_json(silent=True)
         elif request.form:
-            logger.info(f"   Form Data: {dict(request.form)}")
-        elif request.args:
-            logger.info(f"   Query Params: {dict(request.args)}")
-        try:
-            if current_user.is_authenticated:
-                logger.info(f"   User: {current_user.username} (ID: {current_user.id}, Role: {current_user.role})")
-        except:
-            logger.info(f"   User: (yüklenemedi)")
+            details['form'] = dict(request.form)
+        access_logger.debug(json.dumps(details, ensure_ascii=False, default=str))
     except Exception as e:
-        logger.error(f"   Logging hatası: {e}")
+        access_logger.debug(f"Request detayları loglanamadı: {e}")
 
 @app.after_request
 def log_response_info(response):
-    """Her response'u logla"""
-    logger.info(f"🟢 RESPONSE: {request.method} {request.path} - Status: {response.status_code}")
+    """Request başına tek access log satırı (süre ile birlikte, örneklemeli)"""
+    started = g.get('request_started')
+    duration_ms = (time.perf_counter() - started) * 1000 if started is not None else None
+    
+    always = response.status_code >= 400 or (duration_ms is not None and duration_ms >= ACCESS_LOG_SLOW_MS)
+    if not always and random.random() >= ACCESS_LOG_SAMPLE_RATE and not access_logger.isEnabledFor(logging.DEBUG):
+        return response
+    
+    entry = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'ms': round(duration_ms, 1) if duration_ms is not None else None,
+        'ip': request.remote_addr
+    }
+    if request.query_string:
+        entry['query'] = request.query_string.decode('utf-8', 'replace')
+    try:
+        if current_user.is_authenticated:
+            entry['user_id'] = current_user.id
+    except Exception:
+        pass
+    if not always:
+        entry['sampled'] = ACCESS_LOG_SAMPLE_RATE
+    
+    level = logging.WARNING if response.status_code >= 500 else logging.INFO
+    access_logger.log(level, json.dumps(entry, ensure_ascii=False))
     return response
 
 # Error handlers
@@ -130,6 +172,10 @@ def internal_error(error):
 @app.errorhandler(Exception)
 def handle_exception(e):
     """Genel exception handler"""
+    if isinstance(e, HTTPException):
+        # abort(401/403/405...) kendi status koduyla döner (500'e çevrilmez)
+        return e
+    
     logger.error(f"❌ EXCEPTION: {request.method} {request.path}")
     logger.error(f"   Exception Type: {type(e).__name__}")
     logger.error(f"   Exception Message: {str(e)}")
@@ -146,9 +192,11 @@ def handle_exception(e):
 login_manager.init_app(app)
 
 # Bot process tracking (tenant bazlı)
-bot_processes = {}  # {tenant_id: process}
-bot_statuses = {}  # {tenant_id: status}
-bot_logs = {}  # {tenant_id: [logs]}
+# Bot process'leri, durumları ve logları (SCAN_STATE_BACKEND: worker'lar arası paylaşım için)
+scan_state = create_scan_state_store()
+# Tenant'ın Telegram session dosyası aynı anda tek worker'da açık (panel client'ı, giriş; tarama çalışırken hiçbirinde)
+session_lease = TelegramSessionLease(scan_state)
+telegram_pool.lease = session_lease
 
 # ==================== HELPER FUNCTIONS ====================
 
@@ -207,8 +255,8 @@ def get_current_tenant_id():
     
     return tenant_id
 
-def get_telegram_client_for_tenant(tenant_id):
-    """Tenant için Telegram client oluştur"""
+def get_telegram_client_settings(tenant_id):
+    """Tenant'ın TelegramClient argümanları: (session_name, api_id, api_hash) veya None"""
     config = get_tenant_config(tenant_id)
     if not config or not config.api_id or not config.get_api_hash():
         return None
@@ -236,7 +284,14 @@ def get_telegram_client_for_tenant(tenant_id):
     if session_dir and not os.path.exists(session_dir):
         os.makedirs(session_dir, exist_ok=True)
     
-    return TelegramClient(session_name, config.api_id, config.get_api_hash())
+    return session_name, config.api_id, config.get_api_hash()
+
+def get_telegram_client_for_tenant(tenant_id):
+    """Tenant için Telegram client oluştur"""
+    settings = get_telegram_client_settings(tenant_id)
+    if not settings:
+        return None
+    return TelegramClient(*settings)
 
 # ==================== AUTHENTICATION ROUTES ====================
 
@@ -381,6 +436,25 @@ def admin_dashboard(tenant_id):
 
 # ==================== SUPER ADMIN API ROUTES ====================
 
+def get_tenant_result_summary(db, since):
+    """Tüm tenant'ların sonuç sayısı, `since` sonrası sayısı ve son sonuç zamanı (tek GROUP BY)"""
+    rows = db.query(
+        Result.tenant_id,
+        func.count(Result.id),
+        func.coalesce(func.sum(case((Result.timestamp >= since, 1), else_=0)), 0),
+        func.max(Result.timestamp)
+    ).group_by(Result.tenant_id).all()
+    return {
+        tenant_id: {
+            'result_count': int(result_count),
+            'recent_count': int(recent_count),
+            'last_activity': last_activity.isoformat() if last_activity else None
+        }
+        for tenant_id, result_count, recent_count, last_activity in rows
+    }
+
+_EMPTY_RESULT_SUMMARY = {'result_count': 0, 'recent_count': 0, 'last_activity': None}
+
 @app.route('/api/super-admin/dashboard')
 @login_required
 @require_super_admin
@@ -394,28 +468,25 @@ def super_admin_dashboard_data():
         # İstatistikler
         total_tenants = len(tenants)
         total_users = db.query(User).count()
-        total_results = db.query(Result).count()
         
-        # Son 7 günün istatistikleri
+        # Tenant bazında sonuç sayıları ve son 7 gün (tenant sayısından bağımsız tek sorgu)
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        recent_results = db.query(Result).filter(Result.timestamp >= seven_days_ago).count()
+        summary = get_tenant_result_summary(db, seven_days_ago)
+        total_results = sum(item['result_count'] for item in summary.values())
+        recent_results = sum(item['recent_count'] for item in summary.values())
         
         # Tenant bazında istatistikler
         tenant_stats = []
         for tenant in tenants:
-            # Tenant bilgilerini session içinde al
-            tenant_id = tenant.id
-            tenant_name = tenant.name
-            tenant_slug = tenant.slug
-            tenant_created_at = tenant.created_at
-            
-            tenant_result_count = db.query(Result).filter_by(tenant_id=tenant_id).count()
+            tenant_summary = summary.get(tenant.id, _EMPTY_RESULT_SUMMARY)
             tenant_stats.append({
-                'id': tenant_id,
-                'name': tenant_name,
-                'slug': tenant_slug,
-                'result_count': tenant_result_count,
-                'created_at': tenant_created_at.isoformat() if tenant_created_at else None
+                'id': tenant.id,
+                'name': tenant.name,
+                'slug': tenant.slug,
+                'result_count': tenant_summary['result_count'],
+                'recent_count': tenant_summary['recent_count'],
+                'last_activity': tenant_summary['last_activity'],
+                'created_at': tenant.created_at.isoformat() if tenant.created_at else None
             })
         
         return jsonify({
@@ -446,10 +517,11 @@ def list_tenants():
     db = SessionLocal()
     try:
         tenants = db.query(Tenant).all()
+        # Tüm tenant'ların sonuç sayıları tek sorguda
+        summary = get_tenant_result_summary(db, datetime.utcnow() - timedelta(days=7))
         tenant_list = []
         for t in tenants:
-            # Her tenant için sonuç sayısını hesapla
-            result_count = db.query(Result).filter_by(tenant_id=t.id).count()
+            tenant_summary = summary.get(t.id, _EMPTY_RESULT_SUMMARY)
             tenant_list.append({
                 'id': t.id,
                 'name': t.name,
@@ -457,7 +529,9 @@ def list_tenants():
                 'is_active': t.is_active,
                 'created_at': t.created_at.isoformat() if t.created_at else None,
                 'created_by': t.created_by,
-                'result_count': result_count
+                'result_count': tenant_summary['result_count'],
+                'recent_count': tenant_summary['recent_count'],
+                'last_activity': tenant_summary['last_activity']
             })
         return jsonify({
             'success': True,
@@ -544,6 +618,9 @@ def delete_tenant_api(tenant_id):
     """Tenant'ı sil"""
     try:
         if delete_tenant(tenant_id):
+            telegram_pool.release(tenant_id)
+            dialog_cache.pop(tenant_id)
+            scan_state.remove(tenant_id)
             return jsonify({'success': True, 'message': 'Grup silindi!'})
         else:
             return jsonify({'success': False, 'message': 'Grup bulunamadı!'})
@@ -612,6 +689,7 @@ def update_user_tenants_api(user_id):
                 db.add(user_tenant)
             
             db.commit()
+            invalidate_tenant_access(user_id)
             return jsonify({'success': True, 'message': 'Grup ilişkileri güncellendi!'})
         except Exception as e:
             db.rollback()
@@ -713,6 +791,7 @@ def update_user(user_id):
                 user.role = role
             
             db.commit()
+            invalidate_user(user_id)
             return jsonify({'success': True, 'message': 'Kullanıcı güncellendi!'})
         except Exception as e:
             db.rollback()
@@ -740,6 +819,7 @@ def delete_user(user_id):
             
             db.delete(user)
             db.commit()
+            invalidate_user(user_id)
             return jsonify({'success': True, 'message': 'Kullanıcı silindi!'})
         except Exception as e:
             db.rollback()
@@ -830,6 +910,74 @@ def delete_tenant_config_super_admin(tenant_id):
         logger.error(f"   Traceback: {traceback.format_exc()}")
         return jsonify({'success': False, 'message': f'Hata: {str(e)}'}), 500
 
+# Sonuç sayfalama: tek sayfada en fazla bu kadar satır
+MAX_RESULTS_PAGE_SIZE = 1000
+
+def _apply_result_filters(query, start_date=None, end_date=None, search=None):
+    """Sonuç sorgusuna tarih aralığı (YYYY-MM-DD) ve mesaj metni arama filtrelerini uygula"""
+    if start_date:
+        query = query.filter(Result.timestamp >= datetime.strptime(start_date, '%Y-%m-%d'))
+    if end_date:
+        query = query.filter(Result.timestamp <= datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1))
+    if search and search.strip():
+        query = query.filter(result_search_clause(query.session.get_bind(), search.strip()))
+    return query
+
+def _serialize_result(r):
+    """Result satırını API cevabı için dict'e çevir"""
+    return {
+        'id': r.id,
+        'timestamp': r.timestamp.isoformat(),
+        'group_name': r.group_name,
+        'group_id': r.group_id,
+        'message_text': r.message_text,
+        'found_keywords': r.found_keywords,
+        'found_links': r.found_links,
+        'message_link': r.message_link,
+        'views_count': r.views_count,
+        'forwards_count': r.forwards_count,
+        'reactions_count': r.reactions_count,
+        'reactions_detail': r.reactions_detail,
+        'replies_count': r.replies_count
+    }
+
+def _encode_cursor(result):
+    """Sayfanın son satırından (timestamp, id) cursor'ı üret"""
+    payload = json.dumps([result.timestamp.isoformat(), result.id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    """Cursor'ı (timestamp, id) olarak çöz, geçersizse ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, result_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(result_id)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError('Geçersiz cursor!') from e
+
+def paginate_results(db, tenant_id, limit, cursor=None, start_date=None, end_date=None, search=None):
+    """(timestamp, id) üzerinden keyset sayfalama: (sonuçlar, next_cursor)"""
+    limit = max(1, min(limit, MAX_RESULTS_PAGE_SIZE))
+    query = _apply_result_filters(db.query(Result).filter_by(tenant_id=tenant_id), start_date, end_date, search)
+    
+    if cursor:
+        # OFFSET yerine son görülen satırdan devam: sayfa 1 ve sayfa 1000 aynı maliyette
+        # Satır karşılaştırması (tenant_id, timestamp, id) index'inde aralık taramasına dönüşür;
+        # ek timestamp <= sınırı satır karşılaştırmasını index'e çeviremeyen planlayıcılar için
+        cursor_timestamp, cursor_id = _decode_cursor(cursor)
+        query = query.filter(
+            Result.timestamp <= cursor_timestamp,
+            tuple_(Result.timestamp, Result.id) < tuple_(cursor_timestamp, cursor_id)
+        )
+    
+    # Bir fazla satır çek: sonraki sayfa var mı?
+    results = query.order_by(Result.timestamp.desc(), Result.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = _encode_cursor(results[-1])
+    return results, next_cursor
+
 @app.route('/api/super-admin/tenants/<int:tenant_id>/results')
 @login_required
 @require_super_admin
@@ -839,33 +987,19 @@ def get_tenant_results(tenant_id):
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        limit = int(request.args.get('limit', MAX_RESULTS_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        search = request.args.get('q')
         
-        query = db.query(Result).filter_by(tenant_id=tenant_id)
-        
-        if start_date:
-            query = query.filter(Result.timestamp >= datetime.strptime(start_date, '%Y-%m-%d'))
-        if end_date:
-            query = query.filter(Result.timestamp <= datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1))
-        
-        results = query.order_by(Result.timestamp.desc()).limit(1000).all()
+        try:
+            results, next_cursor = paginate_results(db, tenant_id, limit, cursor, start_date, end_date, search)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
         return jsonify({
             'success': True,
-            'results': [{
-                'id': r.id,
-                'timestamp': r.timestamp.isoformat(),
-                'group_name': r.group_name,
-                'group_id': r.group_id,
-                'message_text': r.message_text,
-                'found_keywords': r.found_keywords,
-                'found_links': r.found_links,
-                'message_link': r.message_link,
-                'views_count': r.views_count,
-                'forwards_count': r.forwards_count,
-                'reactions_count': r.reactions_count,
-                'reactions_detail': r.reactions_detail,
-                'replies_count': r.replies_count
-            } for r in results]
+            'results': [_serialize_result(r) for r in results],
+            'next_cursor': next_cursor
         })
     finally:
         db.close()
@@ -936,37 +1070,50 @@ def get_results_api(tenant_id):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         limit = int(request.args.get('limit', 100))
+        cursor = request.args.get('cursor')
+        search = request.args.get('q')
         
-        query = db.query(Result).filter_by(tenant_id=tenant_id)
-        
-        if start_date:
-            query = query.filter(Result.timestamp >= datetime.strptime(start_date, '%Y-%m-%d'))
-        if end_date:
-            query = query.filter(Result.timestamp <= datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1))
-        
-        results = query.order_by(Result.timestamp.desc()).limit(limit).all()
+        try:
+            results, next_cursor = paginate_results(db, tenant_id, limit, cursor, start_date, end_date, search)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
         return jsonify({
             'success': True,
-            'results': [{
-                'id': r.id,
-                'timestamp': r.timestamp.isoformat(),
-                'group_name': r.group_name,
-                'group_id': r.group_id,
-                'message_text': r.message_text,
-                'found_keywords': r.found_keywords,
-                'found_links': r.found_links,
-                'message_link': r.message_link,
-                'views_count': r.views_count,
-                'forwards_count': r.forwards_count,
-                'reactions_count': r.reactions_count,
-                'reactions_detail': r.reactions_detail,
-                'replies_count': r.replies_count
-            } for r in results]
+            'results': [_serialize_result(r) for r in results],
+            'next_cursor': next_cursor
         })
     finally:
         db.close()
 
+# Günlük keyword_stats sözlüklerini ({"kelime": 3}) tek GROUP BY sorgusunda topla
+_KEYWORD_TOTALS_SQL = {
+    'postgresql': (
+        "SELECT kw.key, SUM((kw.value #>> '{}')::bigint) AS total "
+        "FROM message_statistics ms, json_each(ms.keyword_stats) AS kw "
+        "WHERE ms.tenant_id = :tenant_id GROUP BY kw.key"
+    ),
+    'sqlite': (
+        "SELECT kw.key, SUM(kw.value) AS total "
+        "FROM message_statistics ms, json_each(ms.keyword_stats) AS kw "
+        "WHERE ms.tenant_id = :tenant_id GROUP BY kw.key"
+    ),
+}
+
+def get_keyword_totals(db, tenant_id):
+    """Tenant'ın kelime bazında toplam eşleşme sayıları (günlük istatistiklerden)"""
+    sql = _KEYWORD_TOTALS_SQL.get(db.get_bind().dialect.name)
+    if sql:
+        rows = db.execute(text(sql), {'tenant_id': tenant_id})
+        return {key: int(total or 0) for key, total in rows}
+    
+    # JSON fonksiyonu olmayan database'ler: sadece keyword_stats kolonunu oku
+    keyword_stats = {}
+    for (stats,) in db.query(MessageStatistics.keyword_stats).filter_by(tenant_id=tenant_id):
+        for keyword, count in (stats or {}).items():
+            keyword_stats[keyword] = keyword_stats.get(keyword, 0) + count
+    return keyword_stats
+
 @app.route('/api/admin/<int:tenant_id>/statistics', methods=['GET'])
 @login_required
 @require_tenant_access('tenant_id')
@@ -983,21 +1130,15 @@ def get_statistics_api(tenant_id):
             MessageStatistics.date >= start_date
         ).order_by(MessageStatistics.date.asc()).all()
         
-        # Toplam istatistikler
-        total_results = db.query(Result).filter_by(tenant_id=tenant_id).count()
-        total_views = db.query(Result).filter_by(tenant_id=tenant_id).with_entities(
-            db.func.sum(Result.views_count)
-        ).scalar() or 0
-        total_forwards = db.query(Result).filter_by(tenant_id=tenant_id).with_entities(
-            db.func.sum(Result.forwards_count)
-        ).scalar() or 0
+        # Toplam istatistikler (günlük özetlerden tek sorgu, sonuç sayısından bağımsız)
+        total_results, total_views, total_forwards = db.query(
+            func.coalesce(func.sum(MessageStatistics.total_matches), 0),
+            func.coalesce(func.sum(MessageStatistics.total_views), 0),
+            func.coalesce(func.sum(MessageStatistics.total_forwards), 0)
+        ).filter(MessageStatistics.tenant_id == tenant_id).one()
         
         # Kelime bazında istatistikler
-        all_results = db.query(Result).filter_by(tenant_id=tenant_id).all()
-        keyword_stats = {}
-        for result in all_results:
-            for keyword in (result.found_keywords or []):
-                keyword_stats[keyword] = keyword_stats.get(keyword, 0) + 1
+        keyword_stats = get_keyword_totals(db, tenant_id)
         
         return jsonify({
             'success': True,
@@ -1011,7 +1152,7 @@ def get_statistics_api(tenant_id):
                 'link_stats': stat.link_stats
             } for stat in daily_stats],
             'totals': {
-                'total_results': total_results,
+                'total_results': int(total_results),
                 'total_views': int(total_views),
                 'total_forwards': int(total_forwards)
             },
@@ -1020,11 +1161,94 @@ def get_statistics_api(tenant_id):
     finally:
         db.close()
 
+def _int_arg(name, default, minimum=1, maximum=None):
+    """Sayısal query parametresi (geçersizse ValueError, API'ler 400 döner)"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f'Geçersiz {name}: sayı olmalı!') from None
+    if value < minimum:
+        raise ValueError(f'Geçersiz {name}: en az {minimum} olmalı!')
+    return min(value, maximum) if maximum is not None else value
+
+@app.route('/api/admin/<int:tenant_id>/statistics/terms', methods=['GET'])
+@login_required
+@require_tenant_access('tenant_id')
+def get_top_terms_api(tenant_id):
+    """Tarih aralığında en çok geçen kelimeler/linkler (kind=keyword|link)"""
+    kind = request.args.get('kind', 'keyword')
+    if kind not in MATCH_KINDS:
+        return jsonify({'success': False, 'message': 'kind keyword veya link olmalı!'}), 400
+    try:
+        days = _int_arg('days', 7)
+        limit = _int_arg('limit', 10, maximum=100)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    db = SessionLocal()
+    try:
+        start_date = datetime.utcnow() - timedelta(days=days)
+        
+        match_count = func.count(ResultMatch.id)
+        rows = db.query(ResultMatch.term, match_count).filter(
+            ResultMatch.tenant_id == tenant_id,
+            ResultMatch.kind == kind,
+            ResultMatch.timestamp >= start_date
+        ).group_by(ResultMatch.term).order_by(match_count.desc()).limit(limit).all()
+        
+        return jsonify({
+            'success': True,
+            'kind': kind,
+            'terms': [{'term': term, 'count': count} for term, count in rows]
+        })
+    finally:
+        db.close()
+
+@app.route('/api/admin/<int:tenant_id>/statistics/terms/timeseries', methods=['GET'])
+@login_required
+@require_tenant_access('tenant_id')
+def get_term_timeseries_api(tenant_id):
+    """Bir kelime/linkin günlük eşleşme sayıları (kind=keyword|link, term=...)"""
+    kind = request.args.get('kind', 'keyword')
+    term = request.args.get('term')
+    if kind not in MATCH_KINDS:
+        return jsonify({'success': False, 'message': 'kind keyword veya link olmalı!'}), 400
+    if not term:
+        return jsonify({'success': False, 'message': 'term gerekli!'}), 400
+    try:
+        days = _int_arg('days', 30)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    db = SessionLocal()
+    try:
+        start_date = datetime.utcnow() - timedelta(days=days)
+        
+        day = func.date(ResultMatch.timestamp)
+        rows = db.query(day, func.count(ResultMatch.id)).filter(
+            ResultMatch.tenant_id == tenant_id,
+            ResultMatch.kind == kind,
+            ResultMatch.term == term,
+            ResultMatch.timestamp >= start_date
+        ).group_by(day).order_by(day).all()
+        
+        return jsonify({
+            'success': True,
+            'kind': kind,
+            'term': term,
+            'series': [{'date': str(date), 'count': count} for date, count in rows]
+        })
+    finally:
+        db.close()
+
 @app.route('/api/admin/<int:tenant_id>/scan', methods=['POST'])
 @login_required
 @require_tenant_access('tenant_id')
 def start_scan_api(tenant_id):
-    """Tarama başlat"""
+    """Tarama başlat (full=1: checkpoint'leri yok say, tüm geçmişi yeniden tara)"""
     try:
         config = get_tenant_config(tenant_id)
         if not config or not config.api_id or not config.get_api_hash():
@@ -1042,39 +1266,54 @@ def start_scan_api(tenant_id):
         if not os.path.exists(session_file):
             return jsonify({'success': False, 'message': 'Telegram girişi yapılmamış!'})
         
-        # Bot zaten çalışıyor mu?
-        if tenant_id in bot_statuses and bot_statuses[tenant_id].get('running'):
+        # Bot zaten çalışıyor mu? (çalışmıyorsa tenant için taramayı ayır)
+        if not scan_state.try_start(tenant_id):
             return jsonify({'success': False, 'message': 'Bot zaten çalışıyor!'})
         
-        # Botu başlat
-        bot_process = subprocess.Popen(
-            ['python', 'tg_monitor_tenant.py', str(tenant_id)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
-        )
+        try:
+            # Tarama aynı session dosyasını kullanır: panelin açık client'ını kapat, diğer worker'lar da kapatana kadar bekle
+            telegram_pool.release(tenant_id)
+            if not session_lease.wait_idle(tenant_id):
+                scan_state.finish(tenant_id)
+                return jsonify({'success': False, 'message': 'Telegram oturumu panelde kullanımda, biraz sonra tekrar deneyin!'})
+            
+            # Botu başlat
+            # -u: satırlar tampon dolmadan gelsin (SSE ile anlık ilerleme)
+            command = ['python', '-u', 'tg_monitor_tenant.py', str(tenant_id)]
+            body = request.get_json(silent=True) or {}
+            if _is_refresh_requested(request.args.get('full', body.get('full'))):
+                command.append('--full')
+            # Paylaşılan store'da tarama process'i lease'i kendisi de yeniler (bu worker ölse bile)
+            env = dict(os.environ)
+            if scan_state.shared:
+                env[SCAN_STATE_OWNER_ENV] = scan_state.owner
+            bot_process = subprocess.Popen(
+                command,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                universal_newlines=True
+            )
+        except Exception:
+            scan_state.finish(tenant_id)
+            raise
         
-        bot_processes[tenant_id] = bot_process
-        bot_statuses[tenant_id] = {
-            'running': True,
-            'start_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        bot_logs[tenant_id] = []
+        scan_log = scan_state.attach(tenant_id, bot_process)
         
         # Logları oku
         def read_logs():
             try:
                 for line in iter(bot_process.stdout.readline, ''):
                     if line:
-                        bot_logs[tenant_id].append(line.strip())
-                        if len(bot_logs[tenant_id]) > 1000:
-                            bot_logs[tenant_id] = bot_logs[tenant_id][-500:]
-            except:
-                pass
+                        scan_log.append(line.strip())
+            except Exception as e:
+                # Okuyucu hatası: SSE/status istemcileri sessizce takılı kalmasın
+                logger.exception(f"Tenant {tenant_id} tarama logu okunamadı")
+                scan_log.append(f"[HATA] Tarama logu okunamadı: {e}")
             finally:
-                bot_statuses[tenant_id]['running'] = False
+                scan_state.finish(tenant_id)
         
         threading.Thread(target=read_logs, daemon=True).start()
         
@@ -1086,70 +1325,161 @@ def start_scan_api(tenant_id):
 @login_required
 @require_tenant_access('tenant_id')
 def get_scan_status_api(tenant_id):
-    """Tarama durumunu al"""
-    status = bot_statuses.get(tenant_id, {'running': False})
-    logs = bot_logs.get(tenant_id, [])
+    """Tarama durumunu al (after=N: sadece seq N'den sonraki loglar)"""
+    status = get_scan_status(tenant_id)
+    scan_log = scan_state.log(tenant_id)
     
-    # Process kontrolü
-    if tenant_id in bot_processes:
-        process = bot_processes[tenant_id]
-        try:
-            poll_result = process.poll()
-            if poll_result is not None:
-                status['running'] = False
-        except:
-            status['running'] = False
+    entries = []
+    if scan_log:
+        after = request.args.get('after', type=int)
+        entries = scan_log.since(after, limit=500) if after is not None else scan_log.tail(50)  # Varsayılan: son 50 log
     
     return jsonify({
         'success': True,
         'running': status.get('running', False),
         'start_time': status.get('start_time'),
-        'logs': logs[-50:]  # Son 50 log
+        'logs': [line for _, line in entries],
+        'last_seq': scan_log.last_seq if scan_log else 0,
+        'progress': scan_log.progress if scan_log else None
     })
 
+def get_scan_status(tenant_id):
+    """Bot durumu (process bittiyse running=False)"""
+    return scan_state.status(tenant_id)
+
+# SSE: bu kadar saniyede bir yorum satırı gönderilir (proxy'ler bağlantıyı kapatmasın)
+SCAN_STREAM_HEARTBEAT = float(os.environ.get('SCAN_STREAM_HEARTBEAT', 15))
+# Bağlantı koparsa istemcinin yeniden bağlanma aralığı (ms); tarama bitince sayfa stream'i kendisi kapatır
+SCAN_STREAM_RETRY_MS = 10000
+# Worker başına aynı anda açık stream sayısı: her stream bir thread tutar, kalan thread'ler diğer istekler için
+# Sınır doluysa 503 döner, sayfa durum endpoint'ini sorgulamaya geçer
+SCAN_STREAM_MAX = int(os.environ.get('SCAN_STREAM_MAX', max(1, int(os.environ.get('WEB_THREADS', 8)) // 2)))
+_scan_stream_slots = threading.BoundedSemaphore(SCAN_STREAM_MAX)
+
+def _sse_event(event, data, event_id=None):
+    """Tek bir Server-Sent Event mesajı"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    for data_line in str(data).split('\n'):
+        lines.append(f'data: {data_line}')
+    return '\n'.join(lines) + '\n\n'
+
+@app.route('/api/admin/<int:tenant_id>/scan/stream', methods=['GET'])
+@login_required
+@require_tenant_access('tenant_id')
+def stream_scan_api(tenant_id):
+    """Tarama loglarını ve ilerlemesini Server-Sent Events ile gönder (Last-Event-ID ile kaldığı yerden devam)"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_seq = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_seq = None
+    
+    if not _scan_stream_slots.acquire(blocking=False):
+        return jsonify({'success': False, 'message': 'Çok fazla açık tarama stream\'i, durum sorgusu kullanın.'}), 503, {'Retry-After': '30'}
+    
+    def generate():
+        seq = last_seq
+        scan_log = scan_state.log(tenant_id)
+        status = get_scan_status(tenant_id)
+        yield f'retry: {SCAN_STREAM_RETRY_MS}\n\n'
+        yield _sse_event('status', json.dumps({'running': status.get('running', False), 'start_time': status.get('start_time')}))
+        if scan_log is None:
+            return
+        
+        if seq is None or seq > scan_log.last_seq:
+            # İlk bağlantı (veya sunucu yeniden başladı): son 50 satırla başla
+            entries = scan_log.tail(50)
+            seq = entries[0][0] - 1 if entries else scan_log.last_seq
+        
+        progress = None
+        while True:
+            for entry_seq, line in scan_log.since(seq):
+                yield _sse_event('log', line, entry_seq)
+                seq = entry_seq
+            
+            current = scan_log.progress
+            if current != progress:
+                progress = current
+                yield _sse_event('progress', json.dumps(progress, ensure_ascii=False))
+            
+            if scan_log.finished and seq >= scan_log.last_seq:
+                yield _sse_event('status', json.dumps({'running': False, 'start_time': status.get('start_time')}))
+                return
+            
+            if not scan_log.wait(seq, SCAN_STREAM_HEARTBEAT):
+                yield ': ping\n\n'
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Generator hiç başlamasa da (istemci hemen koptu) yanıt kapanınca yer bırakılır
+    response.call_on_close(_scan_stream_slots.release)
+    return response
+
 # ==================== TELEGRAM ROUTES ====================
 
+# Tenant başına grup/kanal listesi: sayfa yüklemesi ve arama Telegram'a gitmez (refresh=1 ile yenilenir)
+DIALOG_CACHE_TTL = float(os.environ.get('DIALOG_CACHE_TTL', 600))
+dialog_cache = TTLCache(DIALOG_CACHE_TTL)
+
+def run_panel_telegram(tenant_id, settings, func):
+    """Panelin havuzdaki client'ı ile Telegram isteği (tarama çalışırken session dosyası taramaya ait: client açılmaz)"""
+    if scan_state.status(tenant_id).get('running'):
+        raise RuntimeError('Tarama çalışırken Telegram işlemi yapılamaz, tarama bitince tekrar deneyin!')
+    return telegram_pool.run(tenant_id, settings, func)
+
+def get_dialog_index(tenant_id, settings, refresh=False):
+    """Tenant'ın dialog index'ini al; cache'te yoksa, süresi dolduysa veya refresh istenirse Telegram'dan yükle
+    
+    Tarama çalışırken refresh yok sayılır: cache'teki liste döner (yoksa hata)
+    """
+    index = dialog_cache.get(tenant_id)
+    if index is not None and refresh and scan_state.status(tenant_id).get('running'):
+        refresh = False
+    if refresh:
+        index = None
+    if index is None:
+        async def fetch_dialogs(client):
+            dialogs = []
+            async for dialog in client.iter_dialogs():
+                if dialog.is_group or dialog.is_channel:
+                    dialogs.append({
+                        'id': dialog.id,
+                        'name': dialog.name or 'İsimsiz Grup',
+                        'unread': dialog.unread_count,
+                        'is_channel': dialog.is_channel
+                    })
+            return dialogs
+        
+        index = DialogIndex(run_panel_telegram(tenant_id, settings, fetch_dialogs))
+        dialog_cache.set(tenant_id, index)
+    return index
+
+def _is_refresh_requested(value):
+    """refresh/full gibi bayrak parametresi (1/true/yes) açık mı"""
+    return str(value).lower() in ('1', 'true', 'yes')
+
 @app.route('/api/admin/<int:tenant_id>/telegram/groups', methods=['GET'])
 @login_required
 @require_tenant_access('tenant_id')
 def get_telegram_groups(tenant_id):
     """Telegram gruplarını listele"""
     try:
-        client = get_telegram_client_for_tenant(tenant_id)
-        if not client:
+        settings = get_telegram_client_settings(tenant_id)
+        if not settings:
             return jsonify({'success': False, 'message': 'API bilgileri eksik!', 'groups': []})
         
-        async def fetch_groups():
-            try:
-                await client.connect()
-                if not await client.is_user_authorized():
-                    raise Exception('Telegram girişi yapılmamış!')
-                
-                groups = []
-                async for dialog in client.iter_dialogs():
-                    if dialog.is_group or dialog.is_channel:
-                        groups.append({
-                            'id': dialog.id,
-                            'name': dialog.name or 'İsimsiz Grup',
-                            'unread': dialog.unread_count,
-                            'is_channel': dialog.is_channel
-                        })
-                        if len(groups) >= 500:
-                            break
-                return groups
-            finally:
-                try:
-                    await client.disconnect()
-                except:
-                    pass
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            groups = loop.run_until_complete(fetch_groups())
-            return jsonify({'success': True, 'groups': groups})
-        finally:
-            loop.close()
+        index = get_dialog_index(tenant_id, settings, _is_refresh_requested(request.args.get('refresh')))
+        return jsonify({
+            'success': True,
+            'groups': index.dialogs[:500],
+            'cached_at': datetime.fromtimestamp(index.created_at).isoformat()
+        })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e), 'groups': []})
 
@@ -1179,6 +1509,10 @@ def telegram_login(tenant_id):
         
         session_path = config.session_file_path or f'tenants/{tenant_slug}/session.session'
         
+        # Giriş session dosyasını yeniden yazar: panelin açık client'ını kapat
+        telegram_pool.release(tenant_id)
+        dialog_cache.pop(tenant_id)
+        
         # Session dizinini oluştur
         session_dir = os.path.dirname(session_path)
         if session_dir and not os.path.exists(session_dir):
@@ -1205,7 +1539,13 @@ def telegram_login(tenant_id):
         except Exception as e:
             logger.warning(f"   ⚠️  Session dizin izni kontrolü hatası: {e}")
         
-        client = TelegramClient(session_name, config.api_id, config.get_api_hash())
+        # Session dosyası giriş bitene kadar bu worker'a ayrılır (loop'tan sonraki finally'de bırakılır)
+        session_lease.acquire(tenant_id)
+        try:
+            client = TelegramClient(session_name, config.api_id, config.get_api_hash())
+        except Exception:
+            session_lease.release(tenant_id)
+            raise
         
         async def handle_login():
             try:
@@ -1392,6 +1732,7 @@ def telegram_login(tenant_id):
         try:
             result = loop.run_until_complete(handle_login())
         finally:
+            session_lease.release(tenant_id)
             # Loop'u kapatma, sadece temizle
             try:
                 pending = asyncio.all_tasks(loop)
@@ -1418,45 +1759,13 @@ def search_telegram_groups(tenant_id):
         if not search_term:
             return jsonify({'success': False, 'message': 'Arama terimi gerekli!', 'groups': []})
         
-        client = get_telegram_client_for_tenant(tenant_id)
-        if not client:
+        settings = get_telegram_client_settings(tenant_id)
+        if not settings:
             return jsonify({'success': False, 'message': 'API bilgileri eksik!', 'groups': []})
         
-        async def search_async():
-            try:
-                await client.connect()
-                if not await client.is_user_authorized():
-                    raise Exception('Telegram girişi yapılmamış!')
-                
-                groups = []
-                search_lower = search_term.lower()
-                
-                async for dialog in client.iter_dialogs():
-                    if dialog.is_group or dialog.is_channel:
-                        dialog_name = (dialog.name or '').lower()
-                        if search_lower in dialog_name:
-                            groups.append({
-                                'id': dialog.id,
-                                'name': dialog.name or 'İsimsiz Grup',
-                                'unread': dialog.unread_count,
-                                'is_channel': dialog.is_channel
-                            })
-                            if len(groups) >= 50:
-                                break
-                return groups
-            finally:
-                try:
-                    await client.disconnect()
-                except:
-                    pass
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            groups = loop.run_until_complete(search_async())
-            return jsonify({'success': True, 'groups': groups})
-        finally:
-            loop.close()
+        # Arama bellekteki index üzerinde: her tuşta Telegram'dan dialog indirilmez
+        index = get_dialog_index(tenant_id, settings, _is_refresh_requested(data.get('refresh')))
+        return jsonify({'success': True, 'groups': index.search(search_term, limit=50)})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e), 'groups': []})
 
@@ -1475,118 +1784,265 @@ def add_group_by_username(tenant_id):
         if username.startswith('@'):
             username = username[1:]
         
-        client = get_telegram_client_for_tenant(tenant_id)
-        if not client:
+        settings = get_telegram_client_settings(tenant_id)
+        if not settings:
             return jsonify({'success': False, 'message': 'API bilgileri eksik!', 'group': None})
         
-        async def get_group_async():
-            try:
-                await client.connect()
-                if not await client.is_user_authorized():
-                    raise Exception('Telegram girişi yapılmamış!')
-                
-                entity = await client.get_entity(username)
-                return {
-                    'id': entity.id,
-                    'name': getattr(entity, 'title', username) or username,
-                    'is_channel': getattr(entity, 'broadcast', False),
-                    'username': getattr(entity, 'username', username)
-                }
-            finally:
-                try:
-                    await client.disconnect()
-                except:
-                    pass
+        async def get_group_async(client):
+            entity = await client.get_entity(username)
+            return {
+                'id': entity.id,
+                'name': getattr(entity, 'title', username) or username,
+                'is_channel': getattr(entity, 'broadcast', False),
+                'username': getattr(entity, 'username', username)
+            }
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            group = loop.run_until_complete(get_group_async())
-            return jsonify({'success': True, 'group': group})
-        finally:
-            loop.close()
+        group = run_panel_telegram(tenant_id, settings, get_group_async)
+        return jsonify({'success': True, 'group': group})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e), 'group': None})
 
+# Export: database'den bu kadar satırlık parçalarla okunur, dosya bu boyutta parçalarla gönderilir
+EXPORT_FETCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _stream_file(path, chunk_size=EXPORT_CHUNK_SIZE):
+    """Geçici dosyayı parça parça gönder, bitince (veya bağlantı koparsa) sil"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# Ham export formatlarının (csv, ndjson, parquet) kolonları: API alan adlarıyla aynı
+EXPORT_COLUMNS = (
+    'id', 'timestamp', 'group_id', 'group_name', 'message_id', 'sender_id',
+    'found_keywords', 'found_links', 'views_count', 'forwards_count', 'reactions_count',
+    'reactions_detail', 'replies_count', 'message_text', 'message_link'
+)
+# Parquet: her row group'ta bu kadar satır (kolon bazlı sıkıştırma bu blok üzerinde yapılır)
+PARQUET_ROW_GROUP_SIZE = 50000
+
+def _iter_export_rows(tenant_id, filters, columns):
+    """Sonuçları server-side cursor ile parça parça oku (kendi session'ı: stream sırasında da çalışır)"""
+    db = SessionLocal()
+    try:
+        query = db.query(*[getattr(Result, column) for column in columns]).filter(Result.tenant_id == tenant_id)
+        query = _apply_result_filters(query, **filters)
+        for row in query.order_by(Result.timestamp.desc(), Result.id.desc()).yield_per(EXPORT_FETCH_SIZE):
+            yield row
+    finally:
+        db.close()
+
+def _file_response(path, mimetype, filename):
+    """Geçici dosyayı Content-Length ile parça parça gönderen Response"""
+    return Response(
+        _stream_file(path),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(os.path.getsize(path))
+        },
+        direct_passthrough=True
+    )
+
+def _export_xlsx(tenant_id, filters, filename):
+    """Excel: write-only çalışma sayfası, geçici dosyadan parça parça gönderilir"""
+    try:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+    except ImportError:
+        return jsonify({'success': False, 'message': 'openpyxl gerekli!'}), 500
+    
+    # write_only: satırlar belleğe değil, openpyxl'in geçici XML dosyasına akar
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Telegram Sonuçları")
+    
+    widths = {'A': 20, 'B': 30, 'C': 15, 'D': 30, 'E': 30, 'F': 15,
+              'G': 15, 'H': 30, 'I': 15, 'J': 50, 'K': 40}
+    for column, width in widths.items():
+        ws.column_dimensions[column].width = width
+    
+    headers = ['Tarih', 'Grup', 'Grup ID', 'Bulunan Kelimeler', 'Bulunan Linkler',
+              'Görüntülenme', 'Paylaşım', 'Reaksiyonlar', 'Yanıtlar', 'Mesaj İçeriği', 'Mesaj Linki']
+    header_fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    
+    header_row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        header_row.append(cell)
+    ws.append(header_row)
+    
+    # Sadece gereken kolonlar, ORM nesnesi oluşturmadan
+    columns = ('timestamp', 'group_name', 'group_id', 'found_keywords', 'found_links', 'views_count',
+               'forwards_count', 'reactions_detail', 'replies_count', 'message_text', 'message_link')
+    for result in _iter_export_rows(tenant_id, filters, columns):
+        ws.append([
+            result.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            result.group_name,
+            result.group_id,
+            ', '.join(result.found_keywords or []),
+            ', '.join(result.found_links or []),
+            result.views_count,
+            result.forwards_count,
+            str(result.reactions_detail or {}),
+            result.replies_count,
+            result.message_text,
+            result.message_link
+        ])
+    
+    # Dosyayı diske yaz ve parça parça gönder (BytesIO + getvalue kopyası yok)
+    fd, path = tempfile.mkstemp(suffix='.xlsx', prefix='export_')
+    os.close(fd)
+    try:
+        wb.save(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return _file_response(path, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename)
+
+def _export_record(row):
+    """Export satırını JSON uyumlu dict'e çevir"""
+    record = dict(row._mapping)
+    record['timestamp'] = row.timestamp.isoformat() if row.timestamp else None
+    return record
+
+def _export_csv(tenant_id, filters, filename):
+    """CSV: satırlar database cursor'ından okunurken gönderilir"""
+    import csv
+    import io
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for count, row in enumerate(_iter_export_rows(tenant_id, filters, EXPORT_COLUMNS), 1):
+            record = _export_record(row)
+            # Liste/sözlük kolonları JSON olarak (kayıpsız) yazılır
+            record['found_keywords'] = json.dumps(record['found_keywords'] or [], ensure_ascii=False)
+            record['found_links'] = json.dumps(record['found_links'] or [], ensure_ascii=False)
+            record['reactions_detail'] = json.dumps(record['reactions_detail'] or {}, ensure_ascii=False)
+            writer.writerow([record[column] for column in EXPORT_COLUMNS])
+            if count % EXPORT_FETCH_SIZE == 0:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+    
+    return Response(generate(), mimetype='text/csv; charset=utf-8',
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+def _export_ndjson(tenant_id, filters, filename):
+    """NDJSON: satır başına bir JSON nesnesi, database cursor'ından okunurken gönderilir"""
+    
+    def generate():
+        lines = []
+        for row in _iter_export_rows(tenant_id, filters, EXPORT_COLUMNS):
+            lines.append(json.dumps(_export_record(row), ensure_ascii=False))
+            if len(lines) >= EXPORT_FETCH_SIZE:
+                yield ('\n'.join(lines) + '\n').encode('utf-8')
+                lines = []
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+    
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+def _export_parquet(tenant_id, filters, filename):
+    """Parquet: kolon bazlı, zstd sıkıştırmalı; row group'lar halinde geçici dosyaya yazılır"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        # İsteğe bağlı bağımlılık: sunucu hatası değil, bu kurulumda desteklenmeyen format
+        return jsonify({'success': False, 'message': 'Parquet export için pyarrow kurulu değil (pip install pyarrow). CSV veya NDJSON kullanabilirsiniz.'}), 501
+    
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('us')),
+        ('group_id', pa.int64()),
+        ('group_name', pa.string()),
+        ('message_id', pa.int64()),
+        ('sender_id', pa.int64()),
+        ('found_keywords', pa.list_(pa.string())),
+        ('found_links', pa.list_(pa.string())),
+        ('views_count', pa.int64()),
+        ('forwards_count', pa.int64()),
+        ('reactions_count', pa.int64()),
+        ('reactions_detail', pa.string()),  # JSON: {"👍": 5}
+        ('replies_count', pa.int64()),
+        ('message_text', pa.string()),
+        ('message_link', pa.string()),
+    ])
+    
+    def write_row_group(writer, columns):
+        columns['reactions_detail'] = [json.dumps(value or {}, ensure_ascii=False) for value in columns['reactions_detail']]
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+    
+    fd, path = tempfile.mkstemp(suffix='.parquet', prefix='export_')
+    os.close(fd)
+    try:
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            columns = {column: [] for column in EXPORT_COLUMNS}
+            for row in _iter_export_rows(tenant_id, filters, EXPORT_COLUMNS):
+                for column in EXPORT_COLUMNS:
+                    columns[column].append(getattr(row, column))
+                if len(columns['id']) >= PARQUET_ROW_GROUP_SIZE:
+                    write_row_group(writer, columns)
+                    columns = {column: [] for column in EXPORT_COLUMNS}
+            if columns['id']:
+                write_row_group(writer, columns)
+    except Exception:
+        os.remove(path)
+        raise
+    return _file_response(path, 'application/vnd.apache.parquet', filename)
+
+# format parametresi -> (dosya uzantısı, export fonksiyonu)
+RESULT_EXPORTERS = {
+    'xlsx': ('xlsx', _export_xlsx),
+    'csv': ('csv', _export_csv),
+    'ndjson': ('ndjson', _export_ndjson),
+    'parquet': ('parquet', _export_parquet),
+}
+
 @app.route('/api/admin/<int:tenant_id>/results/export', methods=['GET'])
 @login_required
 @require_tenant_access('tenant_id')
 def export_results(tenant_id):
-    """Sonuçları Excel formatında indir"""
+    """Sonuçları indir (format: xlsx, csv, ndjson, parquet)"""
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from io import BytesIO
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        export_format = request.args.get('format', 'xlsx').lower()
         
-        db = SessionLocal()
+        if export_format not in RESULT_EXPORTERS:
+            return jsonify({'success': False, 'message': f"Desteklenmeyen format: {export_format} (xlsx, csv, ndjson, parquet)"}), 400
+        
+        # Stream başladıktan sonra hata dönülemez: tarihleri önceden doğrula
         try:
-            start_date = request.args.get('start_date')
-            end_date = request.args.get('end_date')
-            
-            query = db.query(Result).filter_by(tenant_id=tenant_id)
-            
-            if start_date:
-                query = query.filter(Result.timestamp >= datetime.strptime(start_date, '%Y-%m-%d'))
-            if end_date:
-                query = query.filter(Result.timestamp <= datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1))
-            
-            results = query.order_by(Result.timestamp.desc()).all()
-            
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Telegram Sonuçları"
-            
-            headers = ['Tarih', 'Grup', 'Grup ID', 'Bulunan Kelimeler', 'Bulunan Linkler', 
-                      'Görüntülenme', 'Paylaşım', 'Reaksiyonlar', 'Yanıtlar', 'Mesaj İçeriği', 'Mesaj Linki']
-            header_fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
-            header_font = Font(bold=True, color="FFFFFF")
-            
-            for col_num, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col_num, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            
-            for row_num, result in enumerate(results, 2):
-                ws.cell(row=row_num, column=1, value=result.timestamp.strftime('%Y-%m-%d %H:%M:%S'))
-                ws.cell(row=row_num, column=2, value=result.group_name)
-                ws.cell(row=row_num, column=3, value=result.group_id)
-                ws.cell(row=row_num, column=4, value=', '.join(result.found_keywords or []))
-                ws.cell(row=row_num, column=5, value=', '.join(result.found_links or []))
-                ws.cell(row=row_num, column=6, value=result.views_count)
-                ws.cell(row=row_num, column=7, value=result.forwards_count)
-                ws.cell(row=row_num, column=8, value=str(result.reactions_detail or {}))
-                ws.cell(row=row_num, column=9, value=result.replies_count)
-                ws.cell(row=row_num, column=10, value=result.message_text)
-                ws.cell(row=row_num, column=11, value=result.message_link)
-            
-            ws.column_dimensions['A'].width = 20
-            ws.column_dimensions['B'].width = 30
-            ws.column_dimensions['C'].width = 15
-            ws.column_dimensions['D'].width = 30
-            ws.column_dimensions['E'].width = 30
-            ws.column_dimensions['F'].width = 15
-            ws.column_dimensions['G'].width = 15
-            ws.column_dimensions['H'].width = 30
-            ws.column_dimensions['I'].width = 15
-            ws.column_dimensions['J'].width = 50
-            ws.column_dimensions['K'].width = 40
-            
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            
-            from flask import Response
-            filename = f"telegram_sonuclari_{start_date or 'tum'}_{end_date or 'tum'}.xlsx"
-            return Response(
-                output.getvalue(),
-                mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f"attachment; filename={filename}"}
-            )
-        finally:
-            db.close()
-    except ImportError:
-        return jsonify({'success': False, 'message': 'openpyxl gerekli!'}), 500
+            for value in (start_date, end_date):
+                if value:
+                    datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Geçersiz tarih! (YYYY-MM-DD)'}), 400
+        
+        filters = {'start_date': start_date, 'end_date': end_date, 'search': request.args.get('q')}
+        extension, exporter = RESULT_EXPORTERS[export_format]
+        filename = f"telegram_sonuclari_{start_date or 'tum'}_{end_date or 'tum'}.{extension}"
+        return exporter(tenant_id, filters, filename)
     except Exception as e:
         return jsonify({'success': False, 'message': f'Hata: {str(e)}'}), 500
 
@@ -1786,7 +2242,11 @@ def clear_results_legacy():
         
         db = SessionLocal()
         try:
+            db.query(ResultMatch).filter_by(tenant_id=tenant_id).delete()
             deleted_count = db.query(Result).filter_by(tenant_id=tenant_id).delete()
+            # Özetler ve checkpoint'ler sonuçlarla tutarlı kalsın (sonraki tarama baştan başlar)
+            db.query(MessageStatistics).filter_by(tenant_id=tenant_id).delete()
+            db.query(ScanCheckpoint).filter_by(tenant_id=tenant_id).delete()
             db.commit()
             logger.info(f"   ✅ {deleted_count} sonuç silindi")
             return jsonify({'success': True, 'message': 'Sonuçlar temizlendi!'})
@@ -1849,6 +2309,10 @@ def telegram_login_legacy():
         
         session_path = config.session_file_path or f'tenants/{tenant_slug}/session.session'
         
+        # Giriş session dosyasını yeniden yazar: panelin açık client'ını kapat
+        telegram_pool.release(tenant_id)
+        dialog_cache.pop(tenant_id)
+        
         # Session dizinini oluştur
         session_dir = os.path.dirname(session_path)
         if session_dir and not os.path.exists(session_dir):
@@ -2112,9 +2576,12 @@ def telegram_login_legacy():
                 return {'success': False, 'message': f'Hata: {error_msg}'}
         
         # Event loop'u zaten yukarıda ayarladık, şimdi kullan
+        # Session dosyası giriş bitene kadar bu worker'a ayrılır
+        session_lease.acquire(tenant_id)
         try:
             result = loop.run_until_complete(handle_login())
         finally:
+            session_lease.release(tenant_id)
             try:
                 # Pending task'ları temizle
                 pending = asyncio.all_tasks(loop)
@@ -2173,6 +2640,16 @@ def get_scan_status_legacy():
         logger.error(f"   Traceback: {traceback.format_exc()}")
         return jsonify({'success': False, 'message': f'Hata: {str(e)}'}), 500
 
+@app.route('/api/scan-stream', methods=['GET'])
+@login_required
+def stream_scan_legacy():
+    """Tarama loglarını SSE ile gönder (eski format)"""
+    tenant_id = get_current_tenant_id()
+    if not tenant_id:
+        return jsonify({'success': False, 'message': 'Tenant bulunamadı!'})
+    
+    return stream_scan_api(tenant_id=tenant_id)
+
 @app.route('/api/test-telegram', methods=['POST'])
 @login_required
 def test_telegram_legacy():